@@ -10,14 +10,29 @@
 # Windows 8
 """Classifier for feature-based authorship attribution."""
 
+import functools
+import json
 import logging
-import os
+import numbers
 
-from lib.author_model import AuthorModel
-from lib.errors import CatalogError, log_exception
+from lib.author_model import AuthorModel, is_pruned, project
+from lib.errors import CatalogError, ScarceDataError, log_exception
+from lib.instrumentation import TIMER
+from lib.profile_index import InvertedIndex, PruningIndex
+from lib.storage import open_catalog
 
 
 LOG = logging.getLogger(__name__)
+# default weights of features in the distance, all others are weighted with 1
+WEIGHTS = {"<mean_word_len>": 0.05, "<stdev_word_len>": 0.05,
+           "<mean_sent_len>": 0.005, "<stdev_sent_len>": 0.005,
+           "<mtld_score>": 0.01}
+# distance metrics: the weighted manhattan distance of <AuthorIdent._simil>
+# and those of <lib.metrics.DISTANCES>, standardizing the features over the catalog
+METRICS = ("manhattan", "delta", "zscore", "cosine")
+# catalog size from which on the closest profiles of texts sharing most of their
+# features with the profiles are searched with a PruningIndex
+PRUNING_MIN_PROFILES = 20
 
 
 class AuthorIdent:
@@ -47,23 +62,51 @@ class AuthorIdent:
     Args:
         catalog(str): Path to a file containing lines of the form
             <author>\t<pretrained model json-filename> .
+            Alternatively the path to a SQLite database
+            ending on .db, .sqlite or .sqlite3 .
+        authors(Optional[Iterable]): Only load the profiles
+            of these authors from the catalog.
+        metric(str): Distance between profiles, one of <METRICS>.
+            'manhattan' weights the features with <weights>,
+            'delta' (Burrows' Delta), 'zscore' (manhattan distance)
+            and 'cosine' (Cosine Delta) compare the z-scores of the
+            features over all loaded profiles instead.
 
     Attributes:
         catalog(str): Stored catalog filename.
         catalog_content(dict): Maps author names to the filenames
-            their pretrained models are saved under.
+            their pretrained models are saved under (or to their
+            reference within a database).
         profiles(dict): Maps author names to
             their loaded author profiles.
+        storage(storage.TsvCatalog|storage.SqliteCatalog):
+            Safely reads and writes the catalog and the profiles.
+        weights(dict): Weights of the features in the distance,
+            saved with the catalog or <WEIGHTS> by default.
     """
-    def __init__(self, catalog):
+    def __init__(self, catalog, authors=None, metric="manhattan"):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', choose one of {', '.join(METRICS)}.")
         self.catalog = catalog
         self.catalog_content = dict()
         self.profiles = dict()
+        self.storage = open_catalog(catalog)
+        self.metric = metric
+        self._authors = None if authors is None else set(authors)
+        self._index = None  # built on demand for large catalogs
+        self._postings = None  # built on demand
+        self._matrix = None  # built on demand for metrics other than manhattan
+        self.weights = dict(WEIGHTS)
+        if self.storage.exists():
+            saved = self.storage.read_weights()
+            if saved is not None:
+                self.weights = saved
 
         self._read_catalog()
 
     @log_exception(LOG)
-    def train(self, author, source):
+    def train(self, author, source, max_tokens=None, sample_rate=None,
+              top_k=None, min_count=None, jobs=1, tagged=None, features=None):
         """Add new author profile to classifier.
 
         Args:
@@ -75,22 +118,71 @@ class AuthorIdent:
                 separating tokens with whitespaces and giving each
                 sentence a single line. One can use the function
                 <AuthorModel.preprocess> to perform this preprocessing.
+            max_tokens(Optional[int]): Maximum number of tokens
+                to be processed per file.
+            sample_rate(Optional[float]): Fraction of sentences
+                to be processed per file.
+            top_k(Optional[int]): Number of most frequent features
+                to keep per category (see <AuthorModel.prune>).
+            min_count(Optional[int]): Minimum count of a feature to be kept.
+            jobs(int): Number of processes extracting features.
+            tagged(Optional[str]): Directory keeping the tagged
+                texts for training again without tagging.
+            features(Optional[iterable<str>]): Feature families of
+                the profile, see <AuthorModel.train>. Texts can only be
+                classified if all profiles use the same families.
         """
-        if author in self.profiles:
+        if author in self.catalog_content:
             raise CatalogError(f"An entry for '{author}' already exists.")
         LOG.info(f"Add entry for '{author}'...")
-        profile = AuthorModel.train(source)
+        profile = AuthorModel.train(source, max_tokens=max_tokens, sample_rate=sample_rate,
+                                    jobs=jobs, tagged=tagged, features=features)
+        if top_k is not None or min_count is not None:
+            profile.prune(top_k, min_count)
+        # another process might have added the author in the meantime
+        self.catalog_content[author] = self.storage.add(author, profile)
         self.profiles[author] = profile
-        filepath = os.path.join(os.path.dirname(self.catalog), author)
-        if os.path.isfile(filepath + ".json"):
-            i = 2
-            while os.path.isfile(filepath + f"({i}).json"):
-                i += 1
-            filepath = filepath + f"({i})"
-        profile.write_json(filepath + ".json")
-        with open(self.catalog, 'a', encoding='utf-8') as file_out:
-            file_out.write(f"{author}\t{filepath +'.json'}\n")
-        self.catalog_content[author] = filepath + ".json"
+        self._profile_changed(author)
+
+    @log_exception(LOG)
+    def train_many(self, sources, max_tokens=None, sample_rate=None,
+                   top_k=None, min_count=None, jobs=1, tagged=None, features=None):
+        """Add several new author profiles to the classifier at once.
+
+        All sources are checked before any of them is tagged and the
+        features of all authors are extracted in a single run (see
+        <AuthorModel.train_many>). The profiles are then added to the
+        catalog in a single transaction, either all or none of them.
+
+        Args:
+            sources(iterable<tuple>): Pairs of author name and source
+                (see <AuthorIdent.train>), e.g. as read by <read_manifest>.
+                The sources of an author occurring several times
+                are combined into a single profile.
+            max_tokens, sample_rate, top_k, min_count, jobs, tagged, features:
+                See <AuthorIdent.train>.
+
+        Returns:
+            list<str>: Names of the added authors.
+        """
+        grouped = dict()  # maps authors to their sources
+        for author, source in sources:
+            grouped.setdefault(author, []).append(source)
+        existing = [author for author in grouped if author in self.catalog_content]
+        if existing:
+            raise CatalogError(f"Entries for {', '.join(map(repr, existing))} already exist.")
+        LOG.info(f"Add entries for {len(grouped)} authors...")
+        profiles = AuthorModel.train_many(grouped, max_tokens=max_tokens, sample_rate=sample_rate,
+                                          jobs=jobs, tagged=tagged, features=features)
+        if top_k is not None or min_count is not None:
+            for profile in profiles.values():
+                profile.prune(top_k, min_count)
+        filenames = self.storage.add_many(list(profiles.items()))
+        for (author, profile), filename in zip(profiles.items(), filenames):
+            self.catalog_content[author] = filename
+            self.profiles[author] = profile
+            self._profile_changed(author)
+        return list(profiles)
 
     @log_exception(LOG)
     def forget(self, author):
@@ -105,19 +197,12 @@ class AuthorIdent:
         if author not in self.catalog_content:
             raise CatalogError(f"No entry for '{author}' exists.")
         LOG.info(f"Delete entry for '{author}'...")
-        self.profiles.pop(author)
-        saved_model = self.catalog_content.pop(author)
-        if os.path.isfile(saved_model):
-            os.remove(saved_model)
-        else:
-            LOG.warning(f"The pretrained model '{saved_model}' "
-                        "of the deleted author couldn't be removed.")
-        with open(self.catalog, 'w', encoding='utf-8') as file_out:
-            for author_name, profile in self.catalog_content.items():
-                file_out.write(f"{author_name}\t{profile}\n")
+        self.profiles.pop(author, None)
+        self._profile_changed(author)
+        self.storage.remove(author, self.catalog_content.pop(author))
 
     @log_exception(LOG)
-    def classify(self, source):
+    def classify(self, source, max_tokens=None, sample_rate=None, jobs=1):
         """Perform authorship attribution for given txt-file.
 
         Args:
@@ -126,6 +211,11 @@ class AuthorIdent:
                 separating tokens with whitespaces and giving each
                 sentence a single line. One can use the function
                 <AuthorModel.preprocess> to perform this preprocessing.
+            max_tokens(Optional[int]): Maximum number of tokens
+                to be processed.
+            sample_rate(Optional[float]): Fraction of sentences
+                to be processed.
+            jobs(int): Number of processes extracting features.
 
         Returns:
             str: Author match based on minimal distance to profiles.
@@ -133,15 +223,95 @@ class AuthorIdent:
         if len(self.catalog_content) < 2:
             raise CatalogError(f"'{self.catalog}' is trained for less than two authors.")
         LOG.info(f"Classify '{source}'...")
-        unknown_author_pr = AuthorModel.train(source)
-        best_match = (float("inf"), None)
-        for known_author, known_author_pr in self.profiles.items():
-            diff = self._simil(known_author_pr.normalized_feature_vector(),
-                               unknown_author_pr.normalized_feature_vector())
-            LOG.info(f"Difference score with '{known_author}': {diff}")
-            if diff < best_match[0]:
-                best_match = (diff, known_author)
-        return best_match[1]
+        unknown_author_pr = AuthorModel.train(source, max_tokens=max_tokens,
+                                              sample_rate=sample_rate, jobs=jobs,
+                                              features=self._catalog_features())
+        with TIMER.stage("normalization"):
+            vector = unknown_author_pr.normalized_feature_vector()
+        with TIMER.stage("scoring"):
+            return self._rank(vector, 1)[0][1]
+
+    @log_exception(LOG)
+    def classify_early_exit(self, source, margin=0.1, chunk_size=500, patience=3):
+        """Perform authorship attribution reading only as much text as needed.
+
+        The profile of the unknown text is built up chunk by chunk
+        and compared to the catalog after every chunk. As soon as
+        the same author has been ranked first <patience> times in a row,
+        each time with a relative lead of at least <margin> over the
+        runner-up, the remaining text is skipped.
+
+        The mtld score of the intermediate profiles is only the
+        forward score (see <AuthorModel.train_stepwise>), while the
+        profiles in the catalog carry the mean of the forward and the
+        reverse score. Until the whole text has been read, the mtld
+        part of the distance is therefore an approximation.
+
+        Args:
+            source(str): Path to an utf8-encoded .txt-file.
+                The file must have already been preprocessed,
+                separating tokens with whitespaces and giving each
+                sentence a single line. One can use the function
+                <AuthorModel.preprocess> to perform this preprocessing.
+            margin(float): Required difference between the scores
+                of the runner-up and the best match, relative to
+                the score of the runner-up.
+            chunk_size(int): Number of sentences between two rankings.
+            patience(int): Number of consecutive rankings that
+                need to agree before stopping.
+
+        Returns:
+            tuple(str, float): Author match based on minimal distance
+                to profiles and the fraction of the text that was read.
+        """
+        if len(self.catalog_content) < 2:
+            raise CatalogError(f"'{self.catalog}' is trained for less than two authors.")
+        LOG.info(f"Classify '{source}' with early exit...")
+        result = None  # best match so far and the fraction of text read for it
+        streak = 0  # consecutive rankings with a sufficient lead of the same author
+        features = self._catalog_features()
+        for unknown_author_pr, consumed in AuthorModel.train_stepwise(source, chunk_size,
+                                                                      features):
+            try:
+                with TIMER.stage("normalization"):
+                    vector = unknown_author_pr.normalized_feature_vector()
+            except ScarceDataError:
+                continue
+            with TIMER.stage("scoring"):
+                (best, author), (runner_up, _) = self._rank(vector, 2)
+            if runner_up > 0 and (runner_up - best)/runner_up >= margin:
+                streak = streak + 1 if result and author == result[0] else 1
+            else:
+                streak = 0
+            result = (author, consumed)
+            if streak >= patience:
+                break
+        if result is None:
+            raise ScarceDataError(f"'{source}' contains not enough data to be classified.")
+        LOG.info(f"Classified after reading {result[1]:.2%} of '{source}'.")
+        return result
+
+    @log_exception(LOG)
+    def check(self, sources):
+        """Find the texts that can't be classified before classifying any of them.
+
+        Each source is checked cheaply on its raw tokens
+        (see <AuthorModel.check>) with the feature families of
+        the catalog, so a batch of texts doesn't fail in the middle.
+
+        Args:
+            sources(iterable<str>): Paths to preprocessed utf8-encoded txt-files.
+
+        Returns:
+            dict: Maps every rejected source to the reasons for rejecting it.
+        """
+        features = self._catalog_features()
+        rejected = dict()
+        for source in sources:
+            reasons = AuthorModel.check(source, features)
+            if reasons:
+                rejected[source] = reasons
+        return rejected
 
     @log_exception(LOG)
     def accuracy(self, input_vec):
@@ -164,17 +334,43 @@ class AuthorIdent:
                 correct += 1
         return correct/len(input_vec)
 
+    @log_exception(LOG)
+    def set_weights(self, weights):
+        """Change the weights of the features in the distance.
+
+        The weights are saved with the catalog and used
+        by every classifier loading it from now on.
+
+        Args:
+            weights(dict): Maps features to their weight, all
+                features not included are weighted with 1.
+        """
+        if not isinstance(weights, dict):
+            raise ValueError("The weights have to map features to numbers.")
+        for feature, weight in weights.items():
+            if (not isinstance(weight, numbers.Real) or isinstance(weight, bool)
+                    or not weight >= 0):
+                raise ValueError(f"The weight of '{feature}' has to be a "
+                                 f"non-negative number, not {weight!r}.")
+        self.storage.write_weights(weights)
+        self.weights = dict(weights)
+        self._index = None
+        self._postings = None
+        LOG.info(f"Saved the feature weights with the catalog '{self.catalog}'.")
+
     def destroy(self):
-        """Delete the catalog and all pretrained models linked to it."""
+        """Delete the catalog and all pretrained models linked to it, loaded or not."""
         LOG.info(f"Delete catalog '{self.catalog}'...")
-        # type cast so a new object is created
-        # the original object is modified while iterating
-        for author in list(self.catalog_content.keys()):
-            self.forget(author)
-        if os.path.isfile(self.catalog):
-            os.remove(self.catalog)
-        else:
-            LOG.warning(f"Catalog file '{self.catalog}' could not be deleted.")
+        # all entries of the catalog, not only the loaded ones (see <authors>)
+        for _, line in self.storage.read():
+            if len(line) != 2:
+                continue
+            author, file = line
+            if author in self.catalog_content:
+                self.forget(author)
+            else:
+                self.storage.remove(author, file)
+        self.storage.destroy()
 
 #################
 # private methods
@@ -183,38 +379,192 @@ class AuthorIdent:
     @log_exception(LOG)
     def _read_catalog(self):
         """Load saved classifier."""
-        if os.path.isfile(self.catalog):
+        if self.storage.exists():
             LOG.info(f"Load existing classifier with the catalog '{self.catalog}'...")
-            with open(self.catalog, 'r', encoding='utf-8') as file_in:
-                for ln, line in enumerate(file_in, 1):
-                    line = line.rstrip().split('\t')
-                    if len(line) == 2:
-                        author, file = line
-                        try:
-                            profile = AuthorModel.read_json(file)
-                        except FileNotFoundError:
-                            LOG.warning(f"Ignored line {ln}; could not open the file "
-                                        f"'{file}' supposed to contain the pretrained model.")
-                        else:
-                            LOG.info(f"Trained for '{author}'.")
-                            self.profiles[author] = profile
-                            self.catalog_content[author] = file
+            for location, line in self.storage.read():
+                if len(line) == 2:
+                    author, file = line
+                    if self._authors is not None and author not in self._authors:
+                        continue
+                    try:
+                        profile = self.storage.load(file, AuthorModel)
+                    except FileNotFoundError:
+                        LOG.warning(f"Ignored {location}; could not open the file "
+                                    f"'{file}' supposed to contain the pretrained model.")
                     else:
-                        LOG.warning(f"Ignored line {ln}; missing column.")
-                        LOG.info(f"Correct line format: <author_name>\t<saved_profile_file> .")
+                        LOG.info(f"Trained for '{author}'.")
+                        self.profiles[author] = profile
+                        self.catalog_content[author] = file
+                else:
+                    LOG.warning(f"Ignored {location}; missing column.")
+                    LOG.info(f"Correct line format: <author_name>\t<saved_profile_file> .")
+            self._check_mtld([author for author, profile in self.profiles.items()
+                              if profile.mtld_variant == "forward"])
         else:
             raise FileNotFoundError(f"The catalog '{self.catalog}' does not exist.")
 
+    def _check_mtld(self, forward):
+        """Warn about profiles only carrying the forward mtld score.
+
+        Texts to classify are scored in both directions, so their
+        mtld score isn't comparable to the one of these profiles.
+
+        Args:
+            forward(list<str>): Authors whose profiles were trained
+                by an earlier version (see <AuthorModel.mtld_variant>).
+        """
+        if forward:
+            LOG.warning(f"{len(forward)} profiles of '{self.catalog}' only carry the forward "
+                        "mtld score, while texts are scored in both directions. Retrain "
+                        "them for comparable scores.")
+            LOG.info(f"Profiles with the forward mtld score: {', '.join(forward)}")
+
+    def _catalog_features(self):
+        """Feature families shared by all profiles of the catalog."""
+        families = set(self._profile_features())
+        if len(families) > 1:
+            raise CatalogError(f"The profiles of '{self.catalog}' consist of different "
+                               "feature families and can't be compared.")
+        return families.pop() if families else None
+
+    def _profile_features(self):
+        """Feature families of every loaded profile."""
+        return [profile.features for profile in self.profiles.values()]
+
+    def _profile_changed(self, author):
+        """Update the search structures after a profile has been added or removed."""
+        structures = [s for s in (self._postings, self._index, self._matrix) if s is not None]
+        if author in self.profiles and structures:
+            vector = self.profiles[author].normalized_feature_vector()
+            for structure in structures:
+                structure.add(author, vector)
+        elif author not in self.profiles:
+            for structure in structures:
+                structure.remove(author)
+
+    def _rank(self, unknown_vector, k=None):
+        """Sort all known authors by their distance to a feature vector.
+
+        Args:
+            unknown_vector(dict): Normalized feature vector.
+            k(Optional[int]): Only return the k best matches.
+
+        Returns:
+            list<tuple>: Pairs of difference score and author name
+                in ascending order of the difference score.
+        """
+        if self.metric != "manhattan":
+            if self._matrix is None:
+                from lib.metrics import ProfileMatrix
+                self._matrix = ProfileMatrix()
+                for known_author, known_author_pr in self.profiles.items():
+                    self._matrix.add(known_author, known_author_pr.normalized_feature_vector())
+            distances = self._matrix.distances(unknown_vector, self.metric)
+            # stable sort keeps the catalog order for equal scores
+            ranking = sorted(zip(distances.tolist(), self._matrix.vectors), key=lambda x: x[0])
+            for diff, known_author in ranking:
+                LOG.info(f"Difference score with '{known_author}': {diff}")
+            return ranking[:k]
+        distance = functools.partial(self._simil, weights=self.weights)
+        if self._postings is None:
+            self._postings = InvertedIndex(distance, self.weights)
+            for known_author, known_author_pr in self.profiles.items():
+                self._postings.add(known_author, known_author_pr.normalized_feature_vector())
+        if any(map(is_pruned, self._postings.vectors.values())):
+            ranking = self._rank_projected(self._postings.vectors, unknown_vector, k,
+                                           self.weights)
+        elif (k is not None and len(self.profiles) >= PRUNING_MIN_PROFILES
+                and not self._postings.is_sparse(unknown_vector)):
+            if self._index is None:
+                self._index = PruningIndex(distance, self.weights)
+                for known_author, vector in self._postings.vectors.items():
+                    self._index.add(known_author, vector)
+            ranking = self._index.rank(unknown_vector, k)
+        else:
+            # both indexes keep the catalog order for equal scores
+            ranking = self._postings.rank(unknown_vector, k)
+        for diff, known_author in ranking:
+            LOG.info(f"Difference score with '{known_author}': {diff}")
+        return ranking
+
+    @staticmethod
+    def _rank_projected(vectors, unknown_vector, k=None, weights=None):
+        """Rank profiles some of which are pruned by comparing the vector to each of them.
+
+        The vector is compared to every pruned profile on the features
+        kept by it (see <lib.author_model.project>). The indexes only
+        know a single version of the vector and can't be used.
+
+        Args:
+            vectors(dict): Maps author names to their normalized feature vectors.
+            unknown_vector(dict): Normalized feature vector.
+            k(Optional[int]): Only return the k best matches.
+            weights(Optional[dict]): Weights of the features, see <_simil>.
+
+        Returns:
+            list<tuple>: See <_rank>.
+        """
+        ranking = [(AuthorIdent._simil(vector, project(unknown_vector, vector), weights=weights),
+                    known_author) for known_author, vector in vectors.items()]
+        # stable sort keeps the catalog order for equal scores
+        ranking.sort(key=lambda x: x[0])
+        return ranking[:k]
+
     @staticmethod
-    def _simil(known_author, unknown_author):
-        """Calculate similarity of two author profiles."""
-        weights = {"<mean_word_len>": 0.05, "<stdev_word_len>": 0.05,
-                   "<mean_sent_len>": 0.005, "<stdev_sent_len>": 0.005,
-                   "<mtld_score>": 0.01}
+    def _simil(known_author, unknown_author, bound=float("inf"), weights=None):
+        """Calculate similarity of two author profiles.
+
+        The calculation is stopped early and a partial score
+        returned as soon as the score exceeds <bound>.
+        The features are weighted with <weights>,
+        by default with <WEIGHTS>.
+        """
+        if weights is None:
+            weights = WEIGHTS
         diff = 0
         for feature_kn, value in known_author.items():
             diff += abs(value-unknown_author.get(feature_kn, 0)) * weights.get(feature_kn, 1)
+            if diff > bound:
+                return diff
         for feature_unk, value in unknown_author.items():
             if feature_unk not in known_author:
                 diff += value*weights.get(feature_unk, 1)
+                if diff > bound:
+                    return diff
         return diff
+
+
+def read_manifest(path):
+    """Read the authors and sources listed in a training manifest.
+
+    A manifest ending on .jsonl holds one json object per line
+    with the keys "author" and "source", any other manifest lines
+    of the form <author>\t<source> like a catalog. Empty lines
+    are skipped, an author may occur on several lines.
+    Relative sources are resolved from the working directory.
+
+    Args:
+        path(str): Filename of the manifest.
+
+    Returns:
+        list<tuple>: Pairs of author name and source.
+    """
+    sources = []
+    with open(path, 'r', encoding='utf-8') as file_in:
+        for ln, line in enumerate(file_in, 1):
+            if not line.strip():
+                continue
+            if path.endswith(".jsonl"):
+                try:
+                    entry = json.loads(line)
+                    sources.append((entry["author"], entry["source"]))
+                except (ValueError, TypeError, KeyError):
+                    raise ValueError(f"Line {ln} of '{path}' is no json object "
+                                     "with the keys 'author' and 'source'.")
+            else:
+                columns = line.rstrip('\r\n').split('\t')
+                if len(columns) != 2:
+                    raise ValueError(f"Line {ln} of '{path}' is not of the form "
+                                     "<author>\\t<source> .")
+                sources.append(tuple(columns))
+    return sources
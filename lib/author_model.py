@@ -10,25 +10,50 @@
 # Windows 8
 """Representation of author profiles as feature matrices."""
 
-from collections import namedtuple
+from array import array
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import json
 import logging
 import os
+import random
 
-from nltk import pos_tag
-from nltk.corpus import wordnet
-from nltk.stem import WordNetLemmatizer
-from nltk.tokenize import word_tokenize, sent_tokenize
-from tqdm import tqdm
-
+from lib import preflight
 from lib.distribution import Distribution, IntegerDistribution
-from lib.errors import ScarceDataError, log_exception
-from lib.mtld import mtld
+from lib.errors import RejectedInputError, ScarceDataError, log_exception
+from lib.instrumentation import TIMER
+from lib.mtld import Mtld
+from lib.progress import Progress, get_progress, set_progress
+from lib.storage import atomic_write
+from lib.tagged_corpus import TaggedCorpus
 
 
 LOG = logging.getLogger(__name__)  # module logger
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 FREQ_WRDS = os.path.join(ROOT, "data", "most_common_words.csv")
+PUNCTUATION = {'.', ';', ',', '?', '!'}
+# feature families a profile can consist of, named after the attributes
+FEATURES = ("word_len", "sent_len", "pos_trigram", "freq_word", "punctuation", "mtld")
+# first letter of nltk tags mapped to wordnet.ADJ, wordnet.NOUN, wordnet.VERB and wordnet.ADV
+WORDNET_TAGS = {"J": "a", "N": "n", "V": "v", "R": "r"}
+# keys summarizing the features dropped by <AuthorModel.prune> per category
+OTHER = {"pos_trigram_distr": "[<other>]",
+         "freq_word_distr": "<other_word>",
+         "punctuation_distr": "<other_punct>"}
+_LEMMATIZER = None  # created on first use, see <AuthorModel._get_lemma>
+# maximum number of sentences whose tags and lemmas are kept for
+# texts repeating them (headers, chapter headings, short dialogue lines)
+TAG_CACHE_SIZE = 2**14
+# maps token tuples to whether they were lemmatized and their items, least recently used first
+_TAG_CACHE = OrderedDict()
+# hits and misses of <_TAG_CACHE>, counted whether or not TIMER is enabled
+_TAG_CACHE_STATS = Counter()
+# struct to represent a single item
+Item = namedtuple('Item', ['text', 'lemma', 'tag', 'freq_wrd', 'punct'])
+# files are only split for parallel extraction into chunks of at least this many bytes
+MIN_CHUNK_SIZE = 2**20
+# sample size added up in the metadata of a profile, see <AuthorModel._sample_lines>
+SAMPLE_SIZES = ("sampled_sentences", "sampled_tokens", "total_sentences", "total_tokens")
 
 
 class AuthorModel:
@@ -49,6 +74,10 @@ class AuthorModel:
             over all the tokens in the training set.
         punctuation_distr(distribution.Distribution)
         mtld(float): Lexical Diversity Score.
+        meta(dict): Information about how the profile was
+            trained, e.g. the size of the sample it is based on,
+            the feature families if not all of them are used or
+            how the mtld score was computed (see <mtld_variant>).
     """
     def __init__(self):
         self.word_len_distr = IntegerDistribution()
@@ -57,12 +86,18 @@ class AuthorModel:
         self.freq_word_distr = Distribution()
         self.punctuation_distr = Distribution()
         self.mtld = 0
+        self.meta = dict()
 
     @classmethod
     @log_exception(LOG)
-    def train(cls, source):
+    def train(cls, source, max_tokens=None, sample_rate=None, seed=0, jobs=1, tagged=None,
+              features=None):
         """Calculate a feature matrix from text samples.
 
+        By default every sentence is processed. Specifying
+        <max_tokens> or <sample_rate> restricts the extraction
+        to a sample of sentences evenly spread over each file.
+
         Args:
             source(str): Path to an utf8-encoded txt-file.
                 Alternatively one can also pass a directory
@@ -73,24 +108,224 @@ class AuthorModel:
                 a single line. One can use the function
                 <AuthorModel.preprocess> to perform
                 this preprocessing.
+            max_tokens(Optional[int]): Maximum number of tokens
+                to be processed per file.
+            sample_rate(Optional[float]): Fraction of sentences
+                to be processed per file.
+            seed(int): Seed for choosing the sample, the
+                same seed always results in the same sample.
+            jobs(int): Number of processes extracting features.
+                Large files are split into chunks of lines processed
+                in parallel, the result is the same as with one process.
+            tagged(Optional[str]): Directory keeping the tagged
+                version of every file (see <lib.tagged_corpus>).
+                Files tagged before are not tagged again, the
+                others are tagged by a single process and added.
+            features(Optional[iterable<str>]): Feature families
+                to extract (see <FEATURES>), all by default. Pos
+                tagging is skipped if neither pos trigrams nor
+                frequent words are extracted, lemmatization if
+                frequent words aren't.
 
         Returns:
             AuthorModel: New author profile.
+
+        Raises:
+            RejectedInputError: If <AuthorModel.check> finds the
+                source inappropriate, before any tagging is done.
         """
-        if os.path.isfile(source):
-            files = [source]
-        elif os.path.isdir(source):
-            files = [os.path.join(source, file) for file in os.listdir(source)
-                     if os.path.isfile(os.path.join(source, file))]
-            if files == []:
-                raise FileNotFoundError("Method 'train' requires the directory to contain files.")
-        else:
-            LOG.info(f"Current working directory: {os.getcwd()}")
-            raise FileNotFoundError(f"Passed argument '{source}' matches no file or directory.")
+        files = cls._source_files(source)
+        cls._check_options(max_tokens, sample_rate, jobs)
         profile = AuthorModel()
-        profile._extract_features(files)
+        profile._select_features(features)
+        reasons = cls._check_files(files, profile.features)
+        if reasons:
+            raise RejectedInputError({source: reasons})
+        profile._extract_features(files, max_tokens, sample_rate, seed, jobs, tagged)
         return profile
 
+    @classmethod
+    def check(cls, source, features=None):
+        """Find out cheaply whether features can be extracted from a source.
+
+        Only the raw lines and their whitespace separated tokens
+        are looked at (see <lib.preflight>), which takes a fraction
+        of the time of tagging them.
+
+        Args:
+            source(str): Path to a preprocessed utf8-encoded
+                txt-file or a directory of such files.
+            features(Optional[iterable<str>]): Feature families
+                to extract (see <FEATURES>), all by default.
+
+        Returns:
+            list<str>: Reasons against training on the source,
+                empty if there are none.
+        """
+        return cls._check_files(cls._source_files(source),
+                                FEATURES if features is None else tuple(features))
+
+    @classmethod
+    @log_exception(LOG)
+    def train_many(cls, sources, max_tokens=None, sample_rate=None, seed=0, jobs=1,
+                   tagged=None, features=None):
+        """Calculate several feature matrices in a single run.
+
+        The files of all profiles are checked first (see
+        <AuthorModel.check>), so an inappropriate source stops
+        the run before anything is tagged. With several jobs the
+        files of all profiles are handed to a single pool of worker
+        processes, each of them processing whole files, and the
+        counts of every file are added to the profile it belongs to.
+        Every profile is the same as if trained on its own.
+
+        Args:
+            sources(dict): Maps labels, e.g. author names, to a list
+                of paths (files or directories) to train on.
+            max_tokens(Optional[int]): Maximum number of tokens
+                to be processed per file.
+            sample_rate(Optional[float]): Fraction of sentences
+                to be processed per file.
+            seed(int): Seed for choosing the sample.
+            jobs(int): Number of processes extracting features.
+            tagged(Optional[str]): Directory keeping the tagged
+                version of every file, see <AuthorModel.train>.
+            features(Optional[iterable<str>]): Feature families
+                to extract (see <FEATURES>), all by default.
+
+        Returns:
+            dict: Maps the labels to their new profiles.
+
+        Raises:
+            RejectedInputError: Mapping every label with inappropriate
+                sources to the reasons, before any tagging is done.
+        """
+        cls._check_options(max_tokens, sample_rate, jobs)
+        files = dict()
+        profiles = dict()
+        for label, paths in sources.items():
+            files[label] = [file for path in paths for file in cls._source_files(path)]
+            if files[label] == []:
+                raise ValueError(f"No sources to train '{label}' on.")
+            profiles[label] = AuthorModel()
+            profiles[label]._select_features(features)
+        rejected = dict()
+        for label, profile in profiles.items():
+            reasons = cls._check_files(files[label], profile.features)
+            if reasons:
+                rejected[label] = reasons
+        if rejected:
+            raise RejectedInputError(rejected)
+        if jobs == 1:
+            for label, profile in profiles.items():
+                profile._extract_features(files[label], max_tokens, sample_rate, seed,
+                                          tagged=tagged)
+            return profiles
+        before = Counter(_TAG_CACHE_STATS)
+        pool = ProcessPoolExecutor(jobs, initializer=_start_worker, initargs=(TIMER.enabled,))
+        futures = dict()  # maps labels to the results of their files
+        try:
+            for label, profile in profiles.items():
+                futures[label] = [pool.submit(_extract_whole_file, (file, max_tokens, sample_rate,
+                                                                     seed, profile.features,
+                                                                     tagged))
+                                  for file in files[label]]
+            with get_progress().task(sum(map(len, files.values())), "files",
+                                     unit="file") as task:
+                for label, profile in profiles.items():
+                    for future in futures[label]:
+                        part, measurements = future.result()
+                        _merge_measurements(measurements)
+                        profile._add(part)
+                        task.update()
+                    profile.mtld /= len(files[label])
+                    if "mtld" in profile.features:
+                        profile.meta["mtld"] = "bidirectional"
+                    if max_tokens is not None or sample_rate is not None:
+                        profile.meta["seed"] = seed
+        finally:
+            # files not started yet are dropped if one of them failed
+            for results in futures.values():
+                for future in results:
+                    future.cancel()
+            pool.shutdown()
+        _log_tag_cache(before)
+        return profiles
+
+    @classmethod
+    def train_stepwise(cls, source, chunk_size=500, features=None):
+        """Calculate a feature matrix chunk by chunk.
+
+        Instead of returning a single profile after the whole text
+        has been processed, the profile is handed out after every
+        <chunk_size> sentences, so callers can stop reading as soon
+        as the profile is informative enough. Replaying the reverse
+        MTLD pass over all tokens read so far after every chunk would
+        make the early exit quadratic in the text length, so the mtld
+        score of these profiles is the forward score only. Once the
+        whole text has been read, the profile is handed out a last
+        time with the bidirectional score.
+
+        Args:
+            source(str): Path to a preprocessed utf8-encoded txt-file.
+            chunk_size(int): Number of sentences between two
+                consecutive profile updates.
+            features(Optional[iterable<str>]): Feature families
+                to extract (see <FEATURES>), all by default.
+
+        Yields:
+            tuple(AuthorModel, float): The profile trained on the
+                text consumed so far and the fraction of the file
+                (in bytes) this text makes up. The same profile
+                object is updated in place between two yields.
+        """
+        if not os.path.isfile(source):
+            LOG.info(f"Current working directory: {os.getcwd()}")
+            raise FileNotFoundError(f"Passed argument '{source}' matches no file.")
+        if chunk_size < 1:
+            raise ValueError("Method 'train_stepwise' requires a positive chunk size.")
+        file_size = max(1, os.stat(source).st_size)
+        profile = AuthorModel()
+        profile._select_features(features)
+        with_mtld = "mtld" in profile.features
+        lexical = Mtld()
+        collect = []  # collects up to three pos tags
+        consumed = 0  # bytes read so far
+        pending = False  # whether the last yield doesn't reflect the whole text yet
+        try:
+            for i, (sent, line_size) in enumerate(
+                    cls._nlp(source, with_size=True, **profile._nlp_steps()), 1):
+                with TIMER.stage("counting", len(sent)):
+                    profile._count(sent, collect)
+                if with_mtld:
+                    with TIMER.stage("mtld", len(sent)):
+                        lexical.update(word.text for word in sent)
+                consumed += line_size
+                pending = True
+                if i % chunk_size == 0:
+                    try:
+                        if with_mtld:
+                            with TIMER.stage("mtld"):
+                                profile.mtld = lexical.forward_score()
+                                profile.meta["mtld"] = "forward"
+                    except ScarceDataError:
+                        continue  # no repeating words yet
+                    # the estimated mtld score still has to be replaced at the end
+                    pending = with_mtld
+                    yield profile, min(1.0, consumed/file_size)
+            if pending:
+                try:
+                    if with_mtld:
+                        with TIMER.stage("mtld"):
+                            profile.mtld = lexical.score()
+                            profile.meta["mtld"] = "bidirectional"
+                except ScarceDataError as exc:
+                    raise ScarceDataError(
+                        f"File '{source}' inappropriate for feature extraction.") from exc
+                yield profile, 1.0
+        finally:
+            lexical.close()
+
     @classmethod
     @log_exception(LOG)
     def read_json(cls, source):
@@ -100,7 +335,8 @@ class AuthorModel:
             source(str): File created by the function
                 <AuthorModel.write_json> containing
                 one array consisting of five objects
-                and one number.
+                and one number, optionally followed
+                by an object with the profile metadata.
 
         Returns:
             AuthorModel: Loaded author profile.
@@ -109,37 +345,73 @@ class AuthorModel:
             LOG.info(f"Current working directory: {os.getcwd()}")
             raise FileNotFoundError(f"Passed argument '{source}' matches no file.")
 
-        profile = AuthorModel()
         with open(source, 'r', encoding='utf-8') as file_in:
             data = json.load(file_in, object_hook=cls._objectkeys_to_ints)
-            if isinstance(data, list) and len(data) == 6:
-                profile.word_len_distr = IntegerDistribution(data[0])
-                profile.sent_len_distr = IntegerDistribution(data[1])
-                profile.pos_trigram_distr = Distribution(data[2])
-                profile.freq_word_distr = Distribution(data[3])
-                profile.punctuation_distr = Distribution(data[4])
-                if isinstance(data[5], (float, int)):
-                    profile.mtld = data[5]
-                else:
-                    raise TypeError("The loaded array has to contain a number at last position.")
+        return cls.from_list(data)
+
+    @classmethod
+    def from_list(cls, data):
+        """Create an author profile from its serialized form.
+
+        Args:
+            data(list): Five dicts of feature counts and one number,
+                optionally followed by a dict with the profile metadata,
+                as returned by <AuthorModel.to_list>.
+
+        Returns:
+            AuthorModel: Loaded author profile.
+        """
+        profile = AuthorModel()
+        if isinstance(data, list) and len(data) in {6, 7}:
+            profile.word_len_distr = IntegerDistribution(data[0])
+            profile.sent_len_distr = IntegerDistribution(data[1])
+            profile.pos_trigram_distr = Distribution(data[2])
+            profile.freq_word_distr = Distribution(data[3])
+            profile.punctuation_distr = Distribution(data[4])
+            if isinstance(data[5], (float, int)):
+                profile.mtld = data[5]
             else:
-                raise ValueError("Wrong format; make sure to load a JSON-array of length six.")
+                raise TypeError("The loaded array has to contain a number at last position.")
+            if len(data) == 7:
+                if isinstance(data[6], dict):
+                    profile.meta = data[6]
+                else:
+                    raise TypeError("The loaded array has to contain "
+                                    "an object after the number.")
+        else:
+            raise ValueError("Wrong format; make sure to load a JSON-array of length six.")
         return profile
 
+    def to_list(self):
+        """Serialize the instance attributes.
+
+        Returns:
+            list: Five dicts of feature counts and the mtld score
+                following the order used in <AuthorModel.__init__>,
+                followed by the metadata if there is any. The dicts
+                are not copied and must not be modified.
+        """
+        content = [self.word_len_distr.distr, self.sent_len_distr.distr,
+                   self.pos_trigram_distr.distr, self.freq_word_distr.distr,
+                   self.punctuation_distr.distr, self.mtld]
+        if self.meta:
+            content.append(self.meta)
+        return content
+
     def write_json(self, goal):
         """Save instance attributes in a json-file.
 
         Saved as an array of five objects and one number
         following the order used in <AuthorModel.__init__>.
+        Metadata is appended as a sixth object if there is any.
+        The file is replaced atomically, so it is never left
+        half-written.
 
         Args:
             goal(str): Location/name for the file.
         """
-        with open(goal, 'w', encoding='utf-8') as file_out:
-            content = [self.word_len_distr, self.sent_len_distr,
-                       self.pos_trigram_distr, self.freq_word_distr,
-                       self.punctuation_distr, self.mtld]
-            json.dump(content, file_out, indent=4, default=lambda x: getattr(x, 'distr'))
+        with atomic_write(goal) as file_out:
+            json.dump(self.to_list(), file_out, indent=4)
 
     @classmethod
     @log_exception(LOG)
@@ -158,14 +430,18 @@ class AuthorModel:
         """
         LOG.info(f"Preprocessing '{source}'...")
         if os.path.isfile(source):
+            from nltk.tokenize import word_tokenize, sent_tokenize
             with open(source, 'r', encoding='utf-8') as file_in, \
                  open(goal, 'w', encoding='utf-8') as file_out:
                 text = ''  # not ideal saving the text as whole
                 for line in file_in:
                     text += line.rstrip() + ' '
-                sents = sent_tokenize(text)
+                with TIMER.stage("tokenization"):
+                    sents = sent_tokenize(text)
                 for s in sents:
-                    tokens = word_tokenize(s)
+                    with TIMER.stage("tokenization") as stage:
+                        tokens = word_tokenize(s)
+                        stage.add_tokens(len(tokens))
                     file_out.write(' '.join(tokens) + '\n')
         elif os.path.isdir(source):
             if not os.path.isdir(goal):
@@ -177,7 +453,57 @@ class AuthorModel:
             LOG.info(f"Current working directory: {os.getcwd()}")
             raise FileNotFoundError(f"Passed argument '{source}' matches no file or directory.")
 
-    @log_exception(LOG)
+    def prune(self, top_k=None, min_count=None):
+        """Drop rare features to shrink the profile.
+
+        Only the string-keyed categories (pos trigrams, frequent
+        words and punctuation) are pruned. The counts of dropped
+        features are added up under a category-specific key
+        (see <OTHER>), so the total of each distribution and thus
+        the relative frequency of all kept features stay the same.
+        Texts are compared to a pruned profile on its kept
+        features only, see <project>.
+
+        Args:
+            top_k(Optional[int]): Number of most frequent
+                features to keep per category.
+            min_count(Optional[int]): Minimum count of a
+                feature to be kept.
+        """
+        for attr, other in OTHER.items():
+            distr = getattr(self, attr)
+            # ties are broken alphabetically for the result to be reproducible
+            features = sorted((f for f in distr if f != other), key=lambda f: (-distr[f], f))
+            if top_k is not None:
+                features = features[:top_k]
+            if min_count is not None:
+                features = [f for f in features if distr[f] >= min_count]
+            keep = set(features)
+            mass = 0
+            for feature in [f for f in distr if f != other and f not in keep]:
+                mass += distr[feature]
+                del distr[feature]
+            if mass:
+                distr[other] += mass
+        self.meta["pruning"] = {"top_k": top_k, "min_count": min_count}
+
+    @property
+    def features(self):
+        """Feature families the profile consists of, see <FEATURES>."""
+        return tuple(self.meta.get("features", FEATURES))
+
+    @property
+    def mtld_variant(self):
+        """How the mtld score was computed, None if the profile has none.
+
+        Profiles trained by earlier versions only carry the score
+        of the forward pass ("forward"), newer ones the mean of
+        the forward and the reverse pass ("bidirectional").
+        """
+        if "mtld" not in self.features:
+            return None
+        return self.meta.get("mtld", "forward")
+
     def normalized_feature_vector(self):
         """Normalized class attributes with additional statistics.
 
@@ -190,111 +516,472 @@ class AuthorModel:
         relative frequency of sentences of length e.g. 5
         is renamed <s5>.
 
+        Only the feature families of the profile are included.
+
         Returns:
             dict: Unfolded feature matrix to a feature vector.
         """
-        # word_len_distr, freq_word_distr are checked implicitely via pos_trigram_distr
-        if (self.pos_trigram_distr.total < 2
-                or self.word_len_distr.total < 1
-                or self.punctuation_distr.total < 1):
+        features = self.features
+        if (("pos_trigram" in features and self.pos_trigram_distr.total < 2)
+                or ("word_len" in features and self.word_len_distr.total < 1)
+                or ("sent_len" in features and self.sent_len_distr.total < 1)
+                or ("freq_word" in features and self.freq_word_distr.total < 1)
+                or ("punctuation" in features and self.punctuation_distr.total < 1)):
             raise ScarceDataError("Not enough input data.\n"
                                   "At least two sentences, three consecutive words and\n"
                                   "one punctuation mark ('.', ';', ',', '?', '!')\n"
                                   "have to be included in the data.")
         vector = dict()
-        vector.update({f"<w{key}>": value for key, value
-                       in self.word_len_distr.prob_dist().items()})
-        vector["<mean_word_len>"] = self.word_len_distr.mean()
-        vector["<stdev_word_len>"] = self.word_len_distr.stdev(m=vector["<mean_word_len>"])
-        vector.update({f"<s{key}>": value for key, value
-                       in self.sent_len_distr.prob_dist().items()})
-        vector["<mean_sent_len>"] = self.sent_len_distr.mean()
-        vector["<stdev_sent_len>"] = self.sent_len_distr.stdev(m=vector["<mean_sent_len>"])
-        vector.update(self.pos_trigram_distr.prob_dist())
-        vector.update(self.freq_word_distr.prob_dist())
-        vector.update(self.punctuation_distr.prob_dist())
-        vector["<mtld_score>"] = self.mtld
+        if "word_len" in features:
+            vector.update({f"<w{key}>": value for key, value
+                           in self.word_len_distr.prob_dist().items()})
+            vector["<mean_word_len>"] = self.word_len_distr.mean()
+            vector["<stdev_word_len>"] = self.word_len_distr.stdev(m=vector["<mean_word_len>"])
+        if "sent_len" in features:
+            vector.update({f"<s{key}>": value for key, value
+                           in self.sent_len_distr.prob_dist().items()})
+            vector["<mean_sent_len>"] = self.sent_len_distr.mean()
+            vector["<stdev_sent_len>"] = self.sent_len_distr.stdev(m=vector["<mean_sent_len>"])
+        if "pos_trigram" in features:
+            vector.update(self.pos_trigram_distr.prob_dist())
+        if "freq_word" in features:
+            vector.update(self.freq_word_distr.prob_dist())
+        if "punctuation" in features:
+            vector.update(self.punctuation_distr.prob_dist())
+        if "mtld" in features:
+            vector["<mtld_score>"] = self.mtld
         return vector
 
 #################
 # private methods
 #################
 
-    @log_exception(LOG)
-    def _extract_features(self, files):
+    @staticmethod
+    def _source_files(source):
+        """Files of a source passed to <AuthorModel.train>."""
+        if os.path.isfile(source):
+            return [source]
+        if os.path.isdir(source):
+            files = [os.path.join(source, file) for file in os.listdir(source)
+                     if os.path.isfile(os.path.join(source, file))]
+            if files == []:
+                raise FileNotFoundError("Method 'train' requires the directory to contain files.")
+            return files
+        LOG.info(f"Current working directory: {os.getcwd()}")
+        raise FileNotFoundError(f"Passed argument '{source}' matches no file or directory.")
+
+    @staticmethod
+    def _check_options(max_tokens, sample_rate, jobs):
+        """Validate the options of <AuthorModel.train>."""
+        if max_tokens is not None and max_tokens < 1:
+            raise ValueError("Method 'train' requires 'max_tokens' to be positive.")
+        if sample_rate is not None and not 0 < sample_rate <= 1:
+            raise ValueError("Method 'train' requires 'sample_rate' to be in (0, 1].")
+        if jobs < 1:
+            raise ValueError("Method 'train' requires at least one job.")
+
+    @staticmethod
+    def _check_files(files, features):
+        """Reasons against extracting features of files, see <lib.preflight>."""
+        with TIMER.stage("preflight"):
+            return preflight.problems([(file, preflight.scan(file, PUNCTUATION))
+                                       for file in files], features)
+
+    def _extract_features(self, files, max_tokens=None, sample_rate=None, seed=0, jobs=1,
+                          tagged=None):
         """Build up feature vectors."""
-        for file in tqdm(files, leave=False):
-            try:
-                self.mtld += mtld(self._get_words(file))
-            except ScarceDataError as exc:
-                raise ScarceDataError(
-                    f"File '{file}' inappropriate for feature extraction.") from exc
+        sampled = max_tokens is not None or sample_rate is not None
+        corpus = None if tagged is None else TaggedCorpus(tagged)
+        before = Counter(_TAG_CACHE_STATS)
+        pool = ProcessPoolExecutor(jobs, initializer=_start_worker,
+                                   initargs=(TIMER.enabled,)) if jobs > 1 else None
+        try:
+            with get_progress().task(len(files), "files", unit="file") as task:
+                for file in files:
+                    self._extract_file(file, max_tokens, sample_rate, seed, pool, jobs, corpus)
+                    task.update()
+        finally:
+            # waits for chunks already handed out, unlike Pool.terminate,
+            # which can deadlock if a worker failed
+            if pool is not None:
+                pool.shutdown()
+        _log_tag_cache(before)
+        self.mtld /= len(files)
+        if "mtld" in self.features:
+            self.meta["mtld"] = "bidirectional"
+        if sampled:
+            self.meta["seed"] = seed
+
+    def _extract_file(self, file, max_tokens=None, sample_rate=None, seed=0, pool=None, jobs=1,
+                      corpus=None):
+        """Add the features of a single file."""
+        lines = None
+        if max_tokens is not None or sample_rate is not None:
+            lines = self._sample_lines(file, max_tokens, sample_rate, seed)
+        # a profile without mtld doesn't need the second pass over the tokens
+        lexical = Mtld() if "mtld" in self.features else None
+        text = None if corpus is None else corpus.get(file)
+        # only whole files are saved in the tagged corpus, tagged by a single process
+        record = (corpus is not None and text is None and lines is None
+                  and self._nlp_steps() == {"tag": True, "lemmatize": True})
+        ranges = []
+        if pool is not None and text is None and not record:
+            ranges = self._chunk_ranges(file, jobs)
+        if text is not None:
+            self._count_tagged(text, lines, lexical)
+        elif len(ranges) > 1:
+            self._extract_chunks(file, ranges, lines, pool, lexical)
+        else:
+            sents = self._nlp(file, lines=lines, **self._nlp_steps())
+            if record:
+                sents = corpus.record(file, sents)
             collect = []  # collects up to three pos tags
-            for sent in self._nlp(file):
-                self.sent_len_distr[len(sent)] += 1
-                for word in sent:
-                    if word.punct:
-                        self.punctuation_distr[word.text] += 1
-                    else:
-                        self.word_len_distr[len(word.text)] += 1
-                    if word.freq_wrd:
-                        self.freq_word_distr[word.lemma] += 1
+            for sent in sents:
+                with TIMER.stage("counting", len(sent)):
+                    self._count(sent, collect)
+                if lexical is not None:
+                    with TIMER.stage("mtld", len(sent)):
+                        lexical.update(word.text for word in sent)
+        if lexical is None:
+            return
+        try:
+            with TIMER.stage("mtld"):
+                self.mtld += lexical.score()
+        except ScarceDataError as exc:
+            raise ScarceDataError(
+                f"File '{file}' inappropriate for feature extraction.") from exc
+        finally:
+            lexical.close()
+
+    def _extract_chunks(self, file, ranges, lines, pool, lexical):
+        """Add the features of a file split into chunks by worker processes.
+
+        The pos trigrams crossing the border of two chunks are
+        added from the first and last two tags of each chunk.
+        MTLD segments can't be split up, but as they only depend
+        on the tokens, not on their tags, MTLD is computed by
+        the main process while the workers are tagging.
+        """
+        jobs = [(file, start, end, None if lines is None else lines[first:], self.features)
+                for start, end, first in ranges]
+        results = pool.map(_extract_chunk, jobs)
+        if lexical is not None:
+            with TIMER.stage("mtld"), open(file, 'rb') as file_in:
+                for i, raw_line in enumerate(file_in):
+                    if lines is None or lines[i]:
+                        lexical.update(raw_line.decode('utf-8').split())
+        tail = []  # last two pos tags of the chunks merged so far
+        with get_progress().task(os.stat(file).st_size, file, unit="B") as task:
+            for (start, end, _), (part, head, last, measurements) in zip(ranges, results):
+                _merge_measurements(measurements)
+                with TIMER.stage("counting"):
+                    self._merge(part)
+                    if "pos_trigram" in self.features:
+                        window = tail + head
+                        for i in range(len(tail)):
+                            if i + 3 <= len(window):
+                                self.pos_trigram_distr[str(window[i:i+3])] += 1
+                        tail = (tail + last)[-2:]
+                task.update(end - start)
+
+    def _count_tagged(self, text, lines, lexical):
+        """Add the features of a text tagged before.
+
+        Instead of looking at one word after the other, the
+        ids are counted and every distinct id is only looked
+        at once, which gives the same result as <_count>.
+        """
+        offsets, words = text.offsets, text.words
+        if lines is None:
+            tokens, tags, lemmas = text.tokens, text.tags, text.lemmas
+            lengths = [offsets[i+1] - offsets[i] for i in range(len(text))]
+        else:
+            tokens, tags, lemmas = array('L'), array('L'), array('L')
+            lengths = []
+            for i in range(len(text)):
+                if lines[i]:
+                    start, end = offsets[i], offsets[i+1]
+                    tokens.extend(text.tokens[start:end])
+                    tags.extend(text.tags[start:end])
+                    lemmas.extend(text.lemmas[start:end])
+                    lengths.append(end - start)
+        freq_wrds = self._read_freq_words()
+        features = self.features
+        with TIMER.stage("counting", len(tokens)):
+            if "sent_len" in features:
+                for length, count in Counter(lengths).items():
+                    self.sent_len_distr[length] += count
+            for token, count in Counter(tokens).items():
+                if words[token] in PUNCTUATION:
+                    if "punctuation" in features:
+                        self.punctuation_distr[words[token]] += count
+                elif "word_len" in features:
+                    self.word_len_distr[len(words[token])] += count
+            if "freq_word" in features:
+                for lemma, count in Counter(lemmas).items():
+                    if words[lemma] in freq_wrds:
+                        self.freq_word_distr[words[lemma]] += count
                     else:
-                        self.freq_word_distr["<none>"] += 1
-                    collect.append(word.tag)
-                    if len(collect) == 3:
-                        self.pos_trigram_distr[str(collect)] += 1
-                        del collect[0]
-        self.mtld /= len(files)
+                        self.freq_word_distr["<none>"] += count
+            if "pos_trigram" in features:
+                # like in <_count> trigrams cross the borders of sentences
+                for trigram, count in Counter(zip(tags, tags[1:], tags[2:])).items():
+                    self.pos_trigram_distr[str([words[tag] for tag in trigram])] += count
+        if lexical is not None:
+            with TIMER.stage("mtld", len(tokens)):
+                lexical.update(map(words.__getitem__, tokens))
 
     @staticmethod
-    def _get_words(filename):
-        """Generate words of a file."""
-        with open(filename, 'r', encoding='utf-8') as file_in:
+    def _chunk_ranges(filename, chunks):
+        """Split a file into byte ranges of about the same size.
+
+        Every range ends with a line break (or the end of the file),
+        there are fewer ranges than <chunks> if they would be
+        smaller than <MIN_CHUNK_SIZE>.
+
+        Returns:
+            list<tuple(int, int, int)>: Start and (exclusive) end of
+                each range and the number of the line it starts with.
+        """
+        size = os.stat(filename).st_size
+        chunks = max(1, min(chunks, size//MIN_CHUNK_SIZE))
+        ranges = []
+        start, first = 0, 0
+        with open(filename, 'rb') as file_in:
+            for k in range(1, chunks + 1):
+                end = size
+                if k < chunks:
+                    # move on to the line break ending the line the border falls into
+                    file_in.seek(max(start, k*size//chunks - 1))
+                    file_in.readline()
+                    end = file_in.tell()
+                if end <= start:
+                    continue
+                ranges.append((start, end, first))
+                file_in.seek(start)
+                for block in iter(lambda: file_in.read(min(2**20, end - file_in.tell())), b''):
+                    first += block.count(b'\n')
+                start = end
+        return ranges
+
+    def _select_features(self, features):
+        """Restrict the profile to some feature families."""
+        if features is None:
+            return
+        features = set(features)
+        unknown = features.difference(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown feature families: {', '.join(sorted(unknown))}.")
+        if not features:
+            raise ValueError("A profile needs at least one feature family.")
+        if features != set(FEATURES):
+            self.meta["features"] = [f for f in FEATURES if f in features]
+
+    def _nlp_steps(self):
+        """Steps of <_nlp> needed for the feature families of the profile."""
+        features = self.features
+        return {"tag": "pos_trigram" in features or "freq_word" in features,
+                "lemmatize": "freq_word" in features}
+
+    def _merge(self, other):
+        """Add the feature counts of another profile (except for mtld)."""
+        self.word_len_distr.update(other.word_len_distr.distr)
+        self.sent_len_distr.update(other.sent_len_distr.distr)
+        self.pos_trigram_distr.update(other.pos_trigram_distr.distr)
+        self.freq_word_distr.update(other.freq_word_distr.distr)
+        self.punctuation_distr.update(other.punctuation_distr.distr)
+
+    def _add(self, other):
+        """Add another profile built from a single file, including its mtld and sample size."""
+        self._merge(other)
+        self.mtld += other.mtld
+        for key in SAMPLE_SIZES:
+            if key in other.meta:
+                self.meta[key] = self.meta.get(key, 0) + other.meta[key]
+
+    def _subtract(self, other):
+        """Remove the counts, mtld and sample size of a profile added with <_add>."""
+        for distr, part in ((self.word_len_distr, other.word_len_distr),
+                            (self.sent_len_distr, other.sent_len_distr),
+                            (self.pos_trigram_distr, other.pos_trigram_distr),
+                            (self.freq_word_distr, other.freq_word_distr),
+                            (self.punctuation_distr, other.punctuation_distr)):
+            for key, count in part.items():
+                if distr[key] == count:
+                    del distr[key]  # as if it had never been observed
+                else:
+                    distr[key] -= count
+        self.mtld -= other.mtld
+        for key in SAMPLE_SIZES:
+            if key in other.meta:
+                self.meta[key] -= other.meta[key]
+
+    def _sample_lines(self, filename, max_tokens=None, sample_rate=None, seed=0):
+        """Choose the lines of a file to extract features from.
+
+        Lines are picked by systematic sampling: with a sampling rate
+        of e.g. 0.25 every fourth line is taken, starting from a
+        position determined by the seed. If <max_tokens> is exceeded
+        nonetheless, the last picked lines are dropped.
+
+        The sample size is added up in <AuthorModel.meta>.
+
+        Returns:
+            Optional[bytearray]: Flag for every line of the file
+                whether it is part of the sample. None if all lines are.
+        """
+        line_lens = array('L')  # number of tokens per line
+        # read in binary mode to split lines exactly like <AuthorModel._nlp>
+        with open(filename, 'rb') as file_in:
             for line in file_in:
-                for token in line.split():
-                    yield token
+                line_lens.append(len(line.decode('utf-8').split()))
+        total = sum(line_lens)
+        rate = 1.0 if sample_rate is None else sample_rate
+        if max_tokens is not None and total > 0:
+            rate = min(rate, max_tokens/total)
+        if rate >= 1.0:
+            lines = None
+            sents, tokens = len(line_lens), total
+        else:
+            offset = random.Random(seed).random()
+            lines = bytearray(len(line_lens))
+            sents, tokens = 0, 0
+            for i, line_len in enumerate(line_lens):
+                # a line is picked whenever the sampling position passes an integer
+                if int((i + 1 + offset)*rate) > int((i + offset)*rate):
+                    if max_tokens is not None and tokens + line_len > max_tokens:
+                        break
+                    lines[i] = 1
+                    sents += 1
+                    tokens += line_len
+        for key, value in zip(SAMPLE_SIZES, (sents, tokens, len(line_lens), total)):
+            self.meta[key] = self.meta.get(key, 0) + value
+        return lines
+
+    def _count(self, sent, collect):
+        """Add the counts of a single sentence to the feature vectors."""
+        features = self.features
+        word_len, punctuation = "word_len" in features, "punctuation" in features
+        freq_word, pos_trigram = "freq_word" in features, "pos_trigram" in features
+        if "sent_len" in features:
+            self.sent_len_distr[len(sent)] += 1
+        for word in sent:
+            if word.punct:
+                if punctuation:
+                    self.punctuation_distr[word.text] += 1
+            elif word_len:
+                self.word_len_distr[len(word.text)] += 1
+            if freq_word:
+                if word.freq_wrd:
+                    self.freq_word_distr[word.lemma] += 1
+                else:
+                    self.freq_word_distr["<none>"] += 1
+            if pos_trigram:
+                collect.append(word.tag)
+                if len(collect) == 3:
+                    self.pos_trigram_distr[str(collect)] += 1
+                    del collect[0]
 
     @staticmethod
-    def _nlp(filename):
+    def _nlp(filename, with_size=False, lines=None, start=0, end=None, tag=True,
+             lemmatize=True):
         """
         Yields the sentences of a file one at a time and
         as a sequence of tokens with additional information.
+        If <with_size> is set, each sentence is paired with
+        the number of bytes its line (including the line
+        break) takes up in the file.
+        If <lines> is given, only the flagged lines are processed.
+        If <start> and <end> are given, only the lines in this
+        byte range are processed, <lines> then starts with the
+        first line of the range.
+        Without <tag> the tags and lemmas of all items are None,
+        without <lemmatize> only the lemmas are.
         """
-        # read in frequent words of interest
-        with open(FREQ_WRDS, 'r', encoding='utf-8') as file_in:
-            freq_wrd_lst = [wrd.rstrip() for wrd in file_in]
-        # create struct to represent a single item
-        Item = namedtuple('Item', ['text', 'lemma', 'tag', 'freq_wrd', 'punct'])
+        if tag:
+            # nltk is imported on first use, as importing it takes
+            # longer than running any command without feature extraction
+            from nltk import pos_tag
+        freq_wrds = AuthorModel._read_freq_words()
 
         # emulation of the spacy nlp pipeline
-        with tqdm(total=os.stat(filename).st_size, leave=False) as pbar:
-            with open(filename, 'r', encoding='utf-8') as file_in:
-                for line in file_in:
-                    pbar.update(len(line.encode('utf-8')) + 1)
-                    items = []
-                    for token, tag in pos_tag(line.split()):
-                        lemma = AuthorModel._get_lemma(token, tag)
-                        freq_wrd = False
-                        if lemma in freq_wrd_lst:
-                            freq_wrd = True
-                        punct = False
-                        if token in {'.', ';', ',', '?', '!'}:
-                            punct = True
-                        items.append(Item(token, lemma, tag, freq_wrd, punct))
-                    yield items
+        if end is None:
+            end = os.stat(filename).st_size
+        hits, misses = 0, 0  # of the tagging cache
+        try:
+            with get_progress().task(end - start, filename, unit="B") as task:
+                # read in binary mode, so the size of a line is known without encoding it again
+                with open(filename, 'rb') as file_in:
+                    file_in.seek(start)
+                    for i, raw_line in enumerate(TIMER.iterate(file_in, "read")):
+                        if start >= end:
+                            break
+                        start += len(raw_line)
+                        task.update(len(raw_line))
+                        if lines is not None and not lines[i]:
+                            continue
+                        line = raw_line.decode('utf-8')
+                        with TIMER.stage("tokenization") as stage:
+                            tokens = tuple(line.split())
+                            stage.add_tokens(len(tokens))
+                        # sentences are tagged independently of each other,
+                        # so a repeated sentence is always tagged the same way
+                        lemmatized, items = _TAG_CACHE.get(tokens, (False, None))
+                        if not tag:
+                            items = [Item(token, None, None, False, token in PUNCTUATION)
+                                     for token in tokens]
+                        elif items is not None and (lemmatized or not lemmatize):
+                            _TAG_CACHE.move_to_end(tokens)
+                            hits += 1
+                        else:
+                            misses += 1
+                            with TIMER.stage("pos_tagging", len(tokens)):
+                                tagged = pos_tag(list(tokens))
+                            items = []
+                            with TIMER.stage("lemmatization", len(tokens)):
+                                for token, pos in tagged:
+                                    lemma = None
+                                    if lemmatize:
+                                        lemma = AuthorModel._get_lemma(token, pos)
+                                    freq_wrd = False
+                                    if lemma in freq_wrds:
+                                        freq_wrd = True
+                                    punct = False
+                                    if token in PUNCTUATION:
+                                        punct = True
+                                    items.append(Item(token, lemma, pos, freq_wrd, punct))
+                            if TAG_CACHE_SIZE > 0:
+                                _TAG_CACHE[tokens] = (lemmatize, items)
+                                _TAG_CACHE.move_to_end(tokens)
+                                while len(_TAG_CACHE) > TAG_CACHE_SIZE:
+                                    _TAG_CACHE.popitem(last=False)
+                        if with_size:
+                            yield list(items), len(raw_line)
+                        else:
+                            yield list(items)
+        finally:
+            TIMER.cache("tagging", hits=hits, misses=misses)
+            _TAG_CACHE_STATS.update(hits=hits, misses=misses)
+
+    @staticmethod
+    def _read_freq_words():
+        """Read in frequent words of interest."""
+        with open(FREQ_WRDS, 'r', encoding='utf-8') as file_in:
+            return {wrd.rstrip() for wrd in file_in}
 
     @staticmethod
-    def _get_lemma(word, nltk_pos_tag, lemmatizer=WordNetLemmatizer()):
+    def _get_lemma(word, nltk_pos_tag, lemmatizer=None):
         """Lemmatize a word."""
+        global _LEMMATIZER
+        if lemmatizer is None:
+            if _LEMMATIZER is None:
+                from nltk.stem import WordNetLemmatizer
+                _LEMMATIZER = WordNetLemmatizer()
+            lemmatizer = _LEMMATIZER
         # as the lemmatizer works on the wordnet tag set while the
         # default pos tagger follows the nltk tag set, first a translation
         # from nltk tags to wordnet tags has to take place
-        tag_dict = {"J": wordnet.ADJ,
-                    "N": wordnet.NOUN,
-                    "V": wordnet.VERB,
-                    "R": wordnet.ADV}
-        pos = tag_dict.get(nltk_pos_tag[0])
+        pos = WORDNET_TAGS.get(nltk_pos_tag[0])
         if pos is None:
             return word.lower()
         return lemmatizer.lemmatize(word.lower(), pos)
@@ -308,3 +995,141 @@ class AuthorModel:
         if isinstance(other, AuthorModel):
             return self.__dict__ == other.__dict__
         return False
+
+
+def is_pruned(vector):
+    """Whether a normalized feature vector belongs to a pruned profile."""
+    return any(other in vector for other in OTHER.values())
+
+
+def project(unknown_vector, known_vector):
+    """Map the feature vector of a text onto the features kept by a pruned profile.
+
+    A pruned profile sums up the relative frequency of its dropped
+    features under the <OTHER> key of their category. Features of
+    the text missing in such a category of the profile are added up
+    the same way, otherwise the text would differ from the profile
+    in its dropped features twice: once by lacking the <OTHER> key
+    and once by the features themselves.
+
+    Args:
+        unknown_vector(dict): Normalized feature vector of a text.
+        known_vector(dict): Normalized feature vector of a profile.
+
+    Returns:
+        dict: Feature vector of the text, the same object
+            if the profile wasn't pruned.
+    """
+    pruned = {attr: other for attr, other in OTHER.items() if other in known_vector}
+    if not pruned:
+        return unknown_vector
+    projected = dict()
+    for feature, value in unknown_vector.items():
+        if feature not in known_vector:
+            attr = _category(feature)
+            if attr in pruned:
+                feature = pruned[attr]
+        projected[feature] = projected.get(feature, 0) + value
+    return projected
+
+
+def _category(feature):
+    """Distribution a feature of a normalized feature vector stems from.
+
+    Returns:
+        Optional[str]: Attribute name of the distribution, None
+            for features that are never pruned (lengths, statistics).
+    """
+    if feature.startswith("["):
+        return "pos_trigram_distr"
+    if feature in PUNCTUATION or feature == OTHER["punctuation_distr"]:
+        return "punctuation_distr"
+    # frequent words are lemmas, apart from the keys for all other words
+    if not feature.startswith("<") or feature in ("<none>", OTHER["freq_word_distr"]):
+        return "freq_word_distr"
+    return None
+
+
+def _extract_chunk(job):
+    """Count the features of a range of lines in a worker process.
+
+    Args:
+        job(tuple): Filename, start and end of the byte range,
+            the flags of the sampled lines (or None) and the
+            feature families to extract.
+
+    Returns:
+        tuple(AuthorModel, list, list, tuple): Profile without mtld,
+            the first and last two pos tags of the range and
+            the measurements of the worker (see <_measurements>).
+    """
+    filename, start, end, lines, features = job
+    # only measurements of this job are sent back
+    TIMER.reset()
+    _TAG_CACHE_STATS.clear()
+    profile = AuthorModel()
+    profile._select_features(features)
+    collect = []  # collects up to three pos tags
+    head = []
+    for sent in AuthorModel._nlp(filename, lines=lines, start=start, end=end,
+                                 **profile._nlp_steps()):
+        if len(head) < 2:
+            head.extend(word.tag for word in sent[:2 - len(head)])
+        with TIMER.stage("counting", len(sent)):
+            profile._count(sent, collect)
+    return profile, head, collect, _measurements()
+
+
+def _extract_whole_file(job):
+    """Count the features of a whole file in a worker process.
+
+    Args:
+        job(tuple): Filename, <max_tokens>, <sample_rate> and
+            <seed> of the sample, the feature families to extract
+            and the directory of tagged texts (or None).
+
+    Returns:
+        tuple(AuthorModel, tuple): Profile of the file, including
+            its mtld, and the measurements of the worker.
+    """
+    filename, max_tokens, sample_rate, seed, features, tagged = job
+    # only measurements of this job are sent back
+    TIMER.reset()
+    _TAG_CACHE_STATS.clear()
+    profile = AuthorModel()
+    profile._select_features(features)
+    corpus = None if tagged is None else TaggedCorpus(tagged)
+    profile._extract_file(filename, max_tokens, sample_rate, seed, corpus=corpus)
+    return profile, _measurements()
+
+
+def _start_worker(timed):
+    """Prepare a worker process extracting features.
+
+    Workers don't report progress, the main process does for them.
+    Their stages are measured if the main process measures its own,
+    the measurements are sent back together with every result.
+    """
+    set_progress(Progress())
+    TIMER.enabled = timed
+
+
+def _measurements():
+    """Timings and tagging cache statistics of a worker process."""
+    return TIMER.collect(), dict(_TAG_CACHE_STATS)
+
+
+def _merge_measurements(measurements):
+    """Add the measurements of a worker process to the ones of this process."""
+    timings, tag_cache = measurements
+    TIMER.merge(timings)
+    _TAG_CACHE_STATS.update(tag_cache)
+
+
+def _log_tag_cache(before):
+    """Log the hit rate of the tagging cache since <before> was copied from <_TAG_CACHE_STATS>."""
+    hits = _TAG_CACHE_STATS["hits"] - before["hits"]
+    lookups = hits + _TAG_CACHE_STATS["misses"] - before["misses"]
+    if lookups:
+        LOG.info(f"Tagging cache: {hits} of {lookups} sentences "
+                 f"tagged before ({hits/lookups:.2%}).")
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Cross-validation of the classifier without training profiles per fold.
+
+The features of a profile are counts added up over its files, its
+MTLD score is the mean over its files. The profile of an author
+without some of their files is therefore their full profile minus
+the counts of these files. Every file is processed a single time,
+the profiles of all folds are derived by subtraction and each
+held-out file is classified with its own profile, which is the
+one <AuthorIdent.classify> would extract from it.
+"""
+
+from collections import namedtuple
+import copy
+import logging
+import random
+
+from lib.author_ident import WEIGHTS
+from lib.author_model import AuthorModel
+from lib.errors import ScarceDataError
+from lib.feature_matrix import FeatureMatrix, feature_columns, manhattan
+
+
+LOG = logging.getLogger(__name__)
+# classification of a held-out file
+Prediction = namedtuple('Prediction', ['fold', 'file', 'gold', 'prediction'])
+
+
+def assign_folds(labels, folds, seed=0):
+    """Distribute files over folds, the files of each author as evenly as possible.
+
+    Args:
+        labels(list<str>): Author of every file.
+        folds(int): Number of folds, at most the number of files.
+            With as many folds as files every file makes
+            up a fold of its own (leave-one-out).
+        seed(int): Seed for shuffling the files of each author.
+
+    Returns:
+        list<int>: Fold of every file.
+    """
+    if not 1 < folds <= len(labels):
+        raise ValueError(f"{len(labels)} files can't be split into {folds} folds.")
+    order = list(range(len(labels)))
+    random.Random(seed).shuffle(order)
+    # stable sort, the files of an author stay shuffled
+    order.sort(key=lambda i: labels[i])
+    fold_of = [0]*len(labels)
+    for position, i in enumerate(order):
+        fold_of[i] = position % folds
+    return fold_of
+
+
+def cross_validate(sources, folds=10, seed=0, weights=None, max_tokens=None,
+                   sample_rate=None, jobs=1, tagged=None, features=None):
+    """Classify every file with profiles trained on the files of the other folds.
+
+    Args:
+        sources(iterable<tuple>): Pairs of author name and source
+            (a file or a directory), e.g. as read by <read_manifest>.
+        folds(Optional[int]): Number of folds, None for leave-one-out.
+        seed(int): Seed for distributing the files over the folds.
+        weights(Optional[dict]): Weights of the features in the distance,
+            <lib.author_ident.WEIGHTS> by default.
+        max_tokens(Optional[int]): Maximum number of tokens
+            to be processed per file.
+        sample_rate(Optional[float]): Fraction of sentences
+            to be processed per file.
+        jobs(int): Number of processes extracting features.
+        tagged(Optional[str]): Directory keeping the tagged texts.
+        features(Optional[iterable<str>]): Feature families to extract.
+
+    Returns:
+        list<Prediction>: Classification of every file, ordered by fold.
+            Files of authors left without a profile by their fold
+            (e.g. an author's only file in leave-one-out) are skipped.
+    """
+    weights = WEIGHTS if weights is None else weights
+    keys = list(dict.fromkeys((author, file) for author, source in sources
+                              for file in AuthorModel._source_files(source)))
+    # every file is checked and processed on its own, as it is classified on its own
+    parts = AuthorModel.train_many({key: [key[1]] for key in keys}, max_tokens=max_tokens,
+                                   sample_rate=sample_rate, jobs=jobs, tagged=tagged,
+                                   features=features)
+    files = dict()  # maps authors to their files
+    totals = dict()  # maps authors to the counts of all their files
+    for (author, file), part in parts.items():
+        files.setdefault(author, []).append((author, file))
+        if author in totals:
+            totals[author]._add(part)
+        else:
+            totals[author] = copy.deepcopy(part)
+    full = dict()  # vectors of the authors with all of their files, computed on demand
+    fold_of = assign_folds([author for author, _ in keys],
+                           len(keys) if folds is None else folds, seed)
+    predictions = []
+    for fold in range(max(fold_of) + 1):
+        held_out = [key for key, f in zip(keys, fold_of) if f == fold]
+        held_out_set = set(held_out)
+        candidates, vectors = [], []
+        for author, total in totals.items():
+            try:
+                vector = _vector(author, total, files[author], held_out_set, parts, full)
+            except ScarceDataError:
+                LOG.warning(f"Fold {fold} leaves not enough data for a profile of '{author}'.")
+                continue
+            if vector is not None:
+                candidates.append(author)
+                vectors.append(vector)
+        if len(candidates) < 2:
+            raise ValueError(f"Fold {fold} leaves less than two authors to choose from.")
+        # a file whose author has no profile would always be counted as misclassified
+        for author, file in held_out:
+            if author not in candidates:
+                LOG.warning(f"Skipped '{file}'; fold {fold} leaves no profile of '{author}'.")
+        held_out = [key for key in held_out if key[0] in candidates]
+        if not held_out:
+            continue
+        unknown = [parts[key].normalized_feature_vector() for key in held_out]
+        columns = feature_columns(vectors + unknown)
+        known = FeatureMatrix(vectors, columns)
+        distances = manhattan(known, FeatureMatrix(unknown, columns), known.weights(weights))
+        for (author, file), distance in zip(held_out, distances):
+            # the first of several equally close authors, like <AuthorIdent._rank>
+            predictions.append(Prediction(fold, file, author,
+                                          candidates[int(distance.argmin())]))
+        LOG.info(f"Fold {fold}: {fold_accuracy(predictions, fold):.2%} of "
+                 f"{len(held_out)} files classified correctly.")
+    if not predictions:
+        raise ValueError("No file has an author with a profile trained on the other folds.")
+    return predictions
+
+
+def _vector(author, total, files, held_out, parts, full):
+    """Feature vector of an author trained on all files not held out.
+
+    Returns:
+        Optional[dict]: None if all files of the author are held out.
+    """
+    if held_out.isdisjoint(files):
+        if author not in full:
+            profile = copy.deepcopy(total)
+            profile.mtld /= len(files)
+            full[author] = profile.normalized_feature_vector()
+        return full[author]
+    rest = [parts[key] for key in files if key not in held_out]
+    if not rest:
+        return None
+    profile = copy.deepcopy(total)
+    for key in files:
+        if key in held_out:
+            profile._subtract(parts[key])
+    # the mean of the remaining scores, as <AuthorModel.train> would calculate it
+    profile.mtld = sum(part.mtld for part in rest)/len(rest)
+    return profile.normalized_feature_vector()
+
+
+def fold_accuracy(predictions, fold=None):
+    """Fraction of correctly classified files.
+
+    Args:
+        predictions(list<Prediction>): As returned by <cross_validate>.
+        fold(Optional[int]): Only take the files of this fold into account.
+
+    Returns:
+        float
+    """
+    chosen = [p for p in predictions if fold is None or p.fold == fold]
+    if chosen == []:
+        raise ValueError("Accuracy of an empty test set can't be calculated.")
+    return sum(p.gold == p.prediction for p in chosen)/len(chosen)
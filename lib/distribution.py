@@ -13,10 +13,7 @@
 from collections.abc import MutableMapping, Mapping, Iterable
 import logging
 
-import matplotlib.pyplot as plt
-import numpy as np
-
-from lib.errors import ScarceDataError, log_exception
+from lib.errors import ScarceDataError
 
 
 LOG = logging.getLogger(__name__)  # module logger
@@ -57,7 +54,6 @@ class Distribution(MutableMapping):
         """
         return self._total
 
-    @log_exception(LOG)
     def prob_dist(self, iterable=None):
         """Calculate probability distribution over all observations.
 
@@ -76,7 +72,6 @@ class Distribution(MutableMapping):
             iterable = self.keys()
         return {k: self[k]/self._total for k in iterable}
 
-    @log_exception(LOG)
     def plot(self, title, iterable=None):
         """
         Plot samples from the probability distribution over
@@ -88,34 +83,10 @@ class Distribution(MutableMapping):
             iterable(Optional[]): Specify to only include a subset
                 of observations. If not specified all are plotted.
         """
-        if not iterable:
-            iterable = self.keys()
-            if not iterable:
-                raise ScarceDataError("Method 'plot' needs at least one data point.")
-        else:
-            # because we need to iterate more than once
-            if iter(iterable) is iterable:
-                iterable = list(iterable)
-        # organize data
-        probs = self.prob_dist(iterable)
-        slices = sorted(iterable, key=lambda x: probs[x], reverse=True)
-        sizes = [probs[slc] for slc in slices]
-        # filter scarce data points
-        for i in range(len(slices)):
-            if sizes[i] < 0.02:
-                slices = slices[:i] + ['<other>']
-                sizes = sizes[:i] + [sum(sizes[i:])]
-                break
-        # plot settings
-        fig, ax = plt.subplots()
-        ax.pie(sizes, labels=["{:.2%}".format(size) for size in sizes],
-               shadow=False, startangle=90)
-        ax.axis('equal')
-        plt.title(title)
-        plt.legend(slices, loc=3)
-        plt.show()
-
-    @log_exception(LOG)
+        # matplotlib takes long to import and is only needed for plotting
+        from lib.plot import pie_chart
+        pie_chart(self, title, iterable)
+
     def update(self, iterable):
         if isinstance(iterable, Mapping):
             if any(map(lambda x: not isinstance(x, int) or x < 0, iterable.values())):
@@ -174,7 +145,6 @@ class IntegerDistribution(Distribution):
         _distr(dict): The mapping.
         _total(int): Total number of items in the distribution.
     """
-    @log_exception(LOG)
     def mean(self):
         """Sample arithmetic mean (average).
 
@@ -186,7 +156,6 @@ class IntegerDistribution(Distribution):
             raise ScarceDataError("Method 'mean' needs at least one data point.")
         return sum(map(lambda x: x[0]*x[1], self.items()))/self._total
 
-    @log_exception(LOG)
     def var(self, m=None):
         """Corrected sample variance.
 
@@ -203,7 +172,6 @@ class IntegerDistribution(Distribution):
             m = self.mean()
         return sum(map(lambda x: self[x]*(x - m)**2, self))/(self._total - 1)
 
-    @log_exception(LOG)
     def stdev(self, m=None):
         """Corrected sample standard deviation.
 
@@ -216,7 +184,6 @@ class IntegerDistribution(Distribution):
         """
         return self.var(m)**0.5
 
-    @log_exception(LOG)
     def plot(self, title, label, start=None, end=None, steps=None, iterable=None):
         """
         Plot samples from the probability distribution over
@@ -232,44 +199,10 @@ class IntegerDistribution(Distribution):
             iterable(Optional[]): Specify to only include a subset
                 of observations. If not specified all are plotted.
         """
-        if not iterable:
-            iterable = self.keys()
-            if not iterable:
-                raise ScarceDataError("Method 'plot' requires at least one data point.")
-        else:
-            # because we need to iterate more than once
-            if iter(iterable) is iterable:
-                iterable = list(iterable)
-        # create plot
-        fig, ax = plt.subplots()
-        # organize data
-        bars = sorted(iterable)
-        if start is None:
-            start = bars[0]
-        if end is None:
-            end = bars[-1]
-        if steps is None:
-            steps = max(1, (start + end)//10)
-        bars = [bar for bar in bars if start <= bar <= end]
-        heights = [self.prob_dist(iterable)[k] for k in bars]
-        # set axis settings
-        ax.set_axisbelow(True)
-        ax.set_title(title)
-        ax.set_xticks(np.arange(start, end + 1, steps))
-        ax.set_ylabel('relative frequency')
-        # remove top and right borders
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        # add major gridlines in the background
-        ax.grid(color='white', linestyle='-', linewidth=2, alpha=0.5)
-        ax.set_facecolor((0.95, 0.95, 0.95))
-        # draw bars
-        ax.bar(bars, heights, color='mediumseagreen', label=label, alpha=0.60)
-        ax.plot(bars, heights, color='mediumseagreen')
-        ax.legend()
-        plt.show()
-
-    @log_exception(LOG)
+        # matplotlib takes long to import and is only needed for plotting
+        from lib.plot import bar_chart
+        bar_chart(self, title, label, start, end, steps, iterable)
+
     def update(self, iterable):
         if any(map(lambda x: not isinstance(x, int), iterable)):
             raise TypeError("Keys of IntegerDistribution need to be integers.")
@@ -10,6 +10,7 @@
 """Exception related decorators and classes."""
 
 import functools
+import reprlib
 
 
 class ScarceDataError(Exception):
@@ -20,6 +21,50 @@ class CatalogError(Exception):
     pass
 
 
+class RejectedInputError(ScarceDataError):
+    """Texts rejected before their features were extracted.
+
+    Args:
+        rejected(dict): Maps every rejected source to the
+            reasons for rejecting it.
+    """
+    def __init__(self, rejected):
+        super().__init__(rejected)
+        self.rejected = rejected
+
+    def __str__(self):
+        lines = [f"{len(self.rejected)} source(s) inappropriate for feature extraction:"]
+        for source, reasons in self.rejected.items():
+            lines.append(f"'{source}': {' '.join(reasons)}")
+        return "\n".join(lines)
+
+
+class _Summary(reprlib.Repr):
+    """Bounded repr, objects of other than builtin types are only named.
+
+    The repr of e.g. a Distribution or an AuthorModel
+    could easily take up megabytes.
+    """
+    BUILTINS = {str, bytes, int, float, bool, type(None), list, tuple, dict, set, frozenset}
+
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 2
+        self.maxstring = 80
+        self.maxother = 80
+
+    def repr1(self, x, level):
+        if type(x) in self.BUILTINS:
+            return super().repr1(x, level)
+        try:
+            return f"<{type(x).__name__} of length {len(x)}>"
+        except TypeError:
+            return f"<{type(x).__name__}>"
+
+
+summarize = _Summary().repr
+
+
 def log_exception(logger):
     """
     A decorator that takes note of all exceptions thrown by
@@ -27,6 +72,13 @@ def log_exception(logger):
     including positional and keyword arguments together with
     the traceback.
 
+    Arguments are summarized in a bounded form (see <summarize>)
+    and every exception is logged only once, by the innermost
+    decorated function it passes. The decorator is therefore
+    meant for the entry points of the project (e.g. training,
+    classification, the commandline) and not for methods called
+    in loops.
+
     Args:
         logger(logging.Logger)
     """
@@ -34,14 +86,17 @@ def log_exception(logger):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                value = func(*args, **kwargs)
-            except:
-                pos_args = [repr(a) for a in args]
-                key_args = [f"{n}={a!r}" for n, a in kwargs.items()]
-                msg = f"Calling {func.__name__}({', '.join(pos_args + key_args)})..."
-                logger.error(msg, exc_info=True)
+                return func(*args, **kwargs)
+            except Exception as exc:
+                if not getattr(exc, "_logged", False):
+                    pos_args = [summarize(a) for a in args]
+                    key_args = [f"{n}={summarize(a)}" for n, a in kwargs.items()]
+                    msg = f"Calling {func.__name__}({', '.join(pos_args + key_args)})..."
+                    logger.error(msg, exc_info=True)
+                    try:
+                        exc._logged = True
+                    except AttributeError:  # exceptions without __dict__
+                        pass
                 raise
-            else:
-                return value
         return wrapper
     return _log
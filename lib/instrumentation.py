@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Time spent in the single stages of feature extraction and classification."""
+
+import json
+import os
+import time
+
+
+# environment variable naming a file the timings are saved to, enables the timer if set
+ENV_VAR = "AUTHORSHIP_TIMINGS"
+
+
+class _NullStage:
+    """Stand-in for a measurement while the timer is disabled."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def add_tokens(self, tokens):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """Measurement of a single execution of a stage."""
+    __slots__ = ("stats", "tokens", "wall", "cpu")
+
+    def __init__(self, stats, tokens):
+        self.stats = stats
+        self.tokens = tokens
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += time.perf_counter() - self.wall
+        stats[2] += time.process_time() - self.cpu
+        stats[3] += self.tokens
+
+    def add_tokens(self, tokens):
+        """Count tokens only known once the stage is running."""
+        self.tokens += tokens
+
+
+class StageTimer:
+    """Collects wall and CPU time, tokens and cache hits per stage.
+
+    Code to be measured is wrapped in <StageTimer.stage>. While the
+    timer is disabled this returns a shared object doing nothing,
+    so measuring costs hardly anything unless it is switched on.
+    Stages may be nested, the time of a stage includes the time
+    of all stages inside of it.
+
+    Args:
+        enabled(bool): Whether to start measuring right away.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._stages = dict()  # maps stage names to [calls, wall, cpu, tokens]
+        self._caches = dict()  # maps cache names to [hits, misses]
+
+    def stage(self, name, tokens=0):
+        """Measure a stage as context manager.
+
+        Args:
+            name(str): Name of the stage, e.g. 'pos_tagging'.
+            tokens(int): Number of tokens processed by the stage.
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        stats = self._stages.get(name)
+        if stats is None:
+            stats = self._stages[name] = [0, 0.0, 0.0, 0]
+        return _Stage(stats, tokens)
+
+    def iterate(self, iterable, name):
+        """Measure the time an iterable takes to produce its items.
+
+        Returns:
+            Iterable: The iterable itself while the timer is disabled.
+        """
+        if not self.enabled:
+            return iterable
+        return self._iterate(iterable, name)
+
+    def cache(self, name, hits=0, misses=0):
+        """Count hits and misses of a cache."""
+        if self.enabled:
+            stats = self._caches.setdefault(name, [0, 0])
+            stats[0] += hits
+            stats[1] += misses
+
+    def reset(self):
+        """Forget all measurements."""
+        self._stages.clear()
+        self._caches.clear()
+
+    def collect(self):
+        """Hand out the measurements so far and start over.
+
+        Used by worker processes, whose timer is a copy of the
+        one of the main process, to send their measurements back.
+
+        Returns:
+            tuple(dict, dict): Measurements to be passed to <merge>.
+        """
+        measurements = (self._stages, self._caches)
+        self._stages, self._caches = dict(), dict()
+        return measurements
+
+    def merge(self, measurements):
+        """Add the measurements collected by another timer (see <collect>)."""
+        stages, caches = measurements
+        for name, stats in stages.items():
+            own = self._stages.setdefault(name, [0, 0.0, 0.0, 0])
+            for i, value in enumerate(stats):
+                own[i] += value
+        for name, stats in caches.items():
+            own = self._caches.setdefault(name, [0, 0])
+            for i, value in enumerate(stats):
+                own[i] += value
+
+    def report(self):
+        """Summarize the measurements.
+
+        Returns:
+            dict: Statistics per stage and per cache.
+        """
+        stages = dict()
+        for name, (calls, wall, cpu, tokens) in self._stages.items():
+            stages[name] = {"calls": calls, "wall_seconds": wall, "cpu_seconds": cpu,
+                            "tokens": tokens,
+                            "tokens_per_second": tokens/wall if wall > 0 else None}
+        caches = dict()
+        for name, (hits, misses) in self._caches.items():
+            caches[name] = {"hits": hits, "misses": misses,
+                            "hit_rate": hits/(hits + misses) if hits + misses else None}
+        return {"stages": stages, "caches": caches}
+
+    def to_json(self):
+        """The report as json-string."""
+        return json.dumps(self.report(), indent=4)
+
+    def to_prometheus(self):
+        """The report in the text format read by Prometheus."""
+        lines = []
+        metrics = [("stage_calls_total", "Number of executions per stage.", 0),
+                   ("stage_wall_seconds_total", "Wall-clock time spent per stage.", 1),
+                   ("stage_cpu_seconds_total", "CPU time spent per stage.", 2),
+                   ("stage_tokens_total", "Tokens processed per stage.", 3)]
+        for metric, description, i in metrics:
+            lines.append(f"# HELP authorship_{metric} {description}")
+            lines.append(f"# TYPE authorship_{metric} counter")
+            for name, stats in self._stages.items():
+                lines.append(f'authorship_{metric}{{stage="{name}"}} {stats[i]}')
+        metrics = [("cache_hits_total", "Cache hits.", 0),
+                   ("cache_misses_total", "Cache misses.", 1)]
+        for metric, description, i in metrics:
+            lines.append(f"# HELP authorship_{metric} {description}")
+            lines.append(f"# TYPE authorship_{metric} counter")
+            for name, stats in self._caches.items():
+                lines.append(f'authorship_{metric}{{cache="{name}"}} {stats[i]}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, goal):
+        """Save the report, as json if <goal> ends on .json and for Prometheus otherwise."""
+        with open(goal, 'w', encoding='utf-8') as file_out:
+            if goal.lower().endswith(".json"):
+                file_out.write(self.to_json())
+            else:
+                file_out.write(self.to_prometheus())
+
+#################
+# private methods
+#################
+
+    def _iterate(self, iterable, name):
+        """Generator behind <StageTimer.iterate>."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+# timer shared by the whole project
+TIMER = StageTimer(enabled=bool(os.environ.get(ENV_VAR)))
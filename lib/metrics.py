@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Distance metrics standardizing the features over the whole catalog.
+
+Burrows' Delta and its variants don't compare the relative frequencies
+of two profiles directly but their z-scores, i.e. how far each frequency
+lies from the mean of all profiles of the catalog in standard deviations.
+<ProfileMatrix> keeps the sums needed for these statistics up to date
+while profiles are added and removed, and holds the z-scores of all
+profiles as a matrix, so the distance of a text to every profile is
+computed by a single numpy call.
+
+The sums are not saved with the catalog. Building the matrix needs the
+feature vector of every loaded profile anyway, and the sums are collected
+in the same pass over these vectors. They also only hold for the profiles
+actually loaded, which can be a subset of the catalog.
+"""
+
+import heapq
+
+import numpy as np
+
+from lib.author_model import is_pruned, project
+from lib.feature_matrix import FeatureMatrix
+from lib.profile_index import STATISTICS
+
+
+# number of most frequent features Burrows' Delta is computed on
+DELTA_FEATURES = 150
+
+
+def delta(profiles, unknown):
+    """Burrows' Delta, the mean absolute difference of the z-scores.
+
+    Args:
+        profiles(numpy.ndarray): z-scores of the profiles, one per row.
+        unknown(numpy.ndarray): z-scores of a text. Alternatively
+            one row per profile, compared to this profile only.
+
+    Returns:
+        numpy.ndarray: Distance to every profile.
+    """
+    return np.abs(profiles - unknown).mean(axis=1)
+
+
+def zscore_manhattan(profiles, unknown):
+    """Manhattan distance of the z-scores. See <delta> for the arguments."""
+    return np.abs(profiles - unknown).sum(axis=1)
+
+
+def cosine(profiles, unknown):
+    """Cosine distance of the z-scores (Cosine Delta). See <delta> for the arguments.
+
+    The distance of a vector of zeros is 1.
+    """
+    norms = np.linalg.norm(profiles, axis=1) * np.linalg.norm(unknown, axis=-1)
+    products = (profiles * unknown).sum(axis=1)
+    return 1 - np.divide(products, norms, out=np.zeros_like(products), where=norms > 0)
+
+
+# maps metric names to the distance function and whether only the most frequent
+# features are compared
+DISTANCES = {"delta": (delta, True), "zscore": (zscore_manhattan, False),
+             "cosine": (cosine, False)}
+
+
+class ProfileMatrix:
+    """z-scores of the profiles of a catalog as rows of a matrix.
+
+    Means and standard deviations are taken over all profiles, a
+    feature missing in a profile counts as 0. Features that don't
+    vary between the profiles are ignored by all metrics.
+    A text is compared to a pruned profile on the features kept
+    by it (see <lib.author_model.project>).
+
+    Attributes:
+        vectors(dict): Maps author names to their normalized
+            feature vectors, in the order of the matrix rows.
+    """
+    def __init__(self):
+        self.vectors = dict()
+        self._sums = dict()  # summed up value of every feature over all profiles
+        self._squares = dict()  # summed up squared value of every feature
+        self._counts = dict()  # number of profiles including every feature
+        self._pruned = set()  # authors whose profiles are pruned
+        self._matrix = None  # columns, statistics and z-scores, None if outdated
+
+    def add(self, author, vector):
+        """Add a profile, replacing an earlier one of the author."""
+        self.remove(author)
+        self.vectors[author] = vector
+        if is_pruned(vector):
+            self._pruned.add(author)
+        for feature, value in vector.items():
+            self._sums[feature] = self._sums.get(feature, 0) + value
+            self._squares[feature] = self._squares.get(feature, 0) + value*value
+            self._counts[feature] = self._counts.get(feature, 0) + 1
+        self._matrix = None
+
+    def remove(self, author):
+        """Remove the profile of an author if it is included."""
+        if author in self.vectors:
+            self._pruned.discard(author)
+            for feature, value in self.vectors.pop(author).items():
+                self._counts[feature] -= 1
+                if self._counts[feature] == 0:
+                    del self._sums[feature], self._squares[feature], self._counts[feature]
+                else:
+                    self._sums[feature] -= value
+                    self._squares[feature] -= value*value
+            self._matrix = None
+
+    def statistics(self):
+        """Mean and sample standard deviation of every feature.
+
+        Returns:
+            tuple: List of the features and two arrays
+                with the mean and standard deviation of each.
+        """
+        features = list(self._sums)
+        n = len(self.vectors)
+        if n == 0:
+            return features, np.zeros(0), np.zeros(0)
+        mean = np.array([self._sums[feature] for feature in features]) / n
+        squares = np.array([self._squares[feature] for feature in features])
+        # rounding errors of the running sums might make the variance slightly negative
+        variance = np.maximum(squares/n - mean**2, 0) * (n/(n-1) if n > 1 else 0)
+        return features, mean, np.sqrt(variance)
+
+    def distances(self, unknown_vector, metric):
+        """Distance of a feature vector to every profile.
+
+        Args:
+            unknown_vector(dict): Normalized feature vector.
+            metric(str): One of <DISTANCES>.
+
+        Returns:
+            numpy.ndarray: Distance to every profile,
+                in the order of <vectors>.
+        """
+        function, most_frequent = DISTANCES[metric]
+        columns, mean, deviation, profiles, frequent = self._build()
+        if self._pruned:
+            # one version of the text per profile
+            unknown = np.array([self._row(project(unknown_vector, vector), columns)
+                                for vector in self.vectors.values()]).reshape(-1, len(columns))
+        else:
+            unknown = self._row(unknown_vector, columns)
+        unknown = self._standardize(unknown, mean, deviation)
+        if most_frequent:
+            return function(profiles[:, frequent], unknown[..., frequent])
+        return function(profiles, unknown)
+
+#################
+# private methods
+#################
+
+    def _build(self):
+        """Compute the statistics and z-scores once after every change."""
+        if self._matrix is None:
+            features, mean, deviation = self.statistics()
+            columns = {feature: i for i, feature in enumerate(features)}
+            values = FeatureMatrix(list(self.vectors.values()), columns).values
+            frequent = heapq.nlargest(DELTA_FEATURES,
+                                      (i for feature, i in columns.items()
+                                       if feature not in STATISTICS),
+                                      key=mean.__getitem__)
+            self._matrix = (columns, mean, deviation,
+                            self._standardize(values, mean, deviation), np.array(frequent, int))
+        return self._matrix
+
+    @staticmethod
+    def _row(vector, columns):
+        """Values of a feature vector in the given columns, dropping other features."""
+        row = np.zeros(len(columns))
+        for feature, value in vector.items():
+            if feature in columns:
+                row[columns[feature]] = value
+        return row
+
+    @staticmethod
+    def _standardize(values, mean, deviation):
+        """z-scores of some values, 0 for features without deviation."""
+        return np.divide(values - mean, deviation, out=np.zeros_like(values),
+                         where=deviation > 0)
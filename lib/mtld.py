@@ -10,7 +10,10 @@
 # Windows 8
 """Implementation of lexical diversity measure mtld."""
 
+from array import array
+from itertools import islice
 import logging
+import tempfile
 from types import GeneratorType
 
 from lib.errors import ScarceDataError
@@ -19,38 +22,172 @@ from lib.errors import ScarceDataError
 LOG = logging.getLogger(__name__)
 
 
-def _ttr(types, tokens):
-    """(= type-token ratio (Templin, 1957))"""
-    return types/tokens
-
-
-def _mtld(seq, ttr_threshold=0.72, reverse=False):
-    seq_len = 0  # number of tokens in the whole sequence
-    seg_count = 0  # segments with a ttr of lower 0.72
-    seq_ttr = 1.0  # ttr of previous segment
-    token_count = 0  # (not unique) words in the current segment
-    types = set()  # different words in the current segment
-    for word in {True: reversed, False: lambda s: s}[reverse](seq):
-        seq_len += 1
-        token_count += 1
-        types.add(word)
-        seq_ttr = _ttr(len(types), token_count)
-        # start new segment if ttr drops below 0.72
-        if seq_ttr <= ttr_threshold:
-            seg_count += 1
-            token_count = 0
-            types.clear()
-    # collect incomplete segment by approximating how close it was to being completed
-    if seq_ttr > ttr_threshold:
-        seg_count += ((1.0 - seq_ttr)/(1.0 - ttr_threshold))
-    if seg_count == 0:  # if there was only a single occurence of every word
-        raise ScarceDataError("Can't calculate MTLD score of a sequence with no repeating words.")
-    if seq_len < 100:
-        LOG.warning("MTLD scores for sequences shorter than 200 words are not reliable.")
-    return seq_len/seg_count
-
-
-def mtld(seq):
+class _Factors:
+    """State of a single MTLD pass over a sequence of token ids.
+
+    Instead of collecting the types of the current segment in a set,
+    the last segment each id was seen in is stamped into an array.
+    Completing a segment thus only requires to increment the segment
+    number instead of clearing the set.
+    """
+    def __init__(self, ttr_threshold=0.72):
+        self.ttr_threshold = ttr_threshold
+        self.seq_len = 0  # number of tokens in the whole sequence
+        self.seg_count = 0  # segments with a ttr of lower 0.72
+        self.token_count = 0  # (not unique) words in the current segment
+        self.type_count = 0  # different words in the current segment
+        self.segment = 1  # number of the current segment
+        self.seen = array('L')  # maps ids to the last segment they were seen in
+
+    def feed(self, ids):
+        """Continue the pass with the next part of the sequence."""
+        seen = self.seen
+        if ids and max(ids) >= len(seen):
+            seen.extend(bytes(max(ids) + 1 - len(seen)))  # zero-initialized
+        ttr_threshold = self.ttr_threshold
+        segment = self.segment
+        seg_count = self.seg_count
+        token_count = self.token_count
+        type_count = self.type_count
+        for word in ids:
+            token_count += 1
+            if seen[word] != segment:
+                seen[word] = segment
+                type_count += 1
+            # start new segment if ttr drops below 0.72
+            # (= type-token ratio (Templin, 1957))
+            if type_count/token_count <= ttr_threshold:
+                seg_count += 1
+                segment += 1
+                token_count = 0
+                type_count = 0
+        self.seq_len += len(ids)
+        self.segment = segment
+        self.seg_count = seg_count
+        self.token_count = token_count
+        self.type_count = type_count
+
+    def score(self):
+        """Finish the pass."""
+        seg_count = self.seg_count
+        # collect incomplete segment by approximating how close it was to being completed
+        if self.token_count > 0:
+            seq_ttr = self.type_count/self.token_count
+            seg_count += ((1.0 - seq_ttr)/(1.0 - self.ttr_threshold))
+        if seg_count == 0:  # if there was only a single occurence of every word
+            raise ScarceDataError("Can't calculate MTLD score of a sequence with no repeating words.")
+        if self.seq_len < 100:
+            LOG.warning("MTLD scores for sequences shorter than 200 words are not reliable.")
+        return self.seq_len/seg_count
+
+
+def _thresholds(ttr_threshold):
+    """Turn a single threshold or a sequence of thresholds into a tuple."""
+    if isinstance(ttr_threshold, (int, float)):
+        return (ttr_threshold,)
+    return tuple(ttr_threshold)
+
+
+class Mtld:
+    """Accumulator computing the MTLD score of a token stream.
+
+    Tokens are added one at a time or in batches, the forward pass
+    is computed on the fly. For the reverse pass the tokens are kept
+    as integer ids, which are moved to a temporary file chunk by chunk
+    once more than <chunk_size> of them have been collected.
+    Memory consumption therefore only depends on the vocabulary size
+    and not on the length of the stream.
+
+    Args:
+        ttr_threshold(float): TTR below which a segment is completed.
+            Pass a sequence of thresholds to compute the score for each
+            of them in a single pass over the stream.
+        chunk_size(int): Number of token ids held in memory.
+    """
+    def __init__(self, ttr_threshold=0.72, chunk_size=2**16):
+        self.ttr_threshold = ttr_threshold
+        self.chunk_size = chunk_size
+        self._vocab = dict()  # maps tokens to ids
+        self._chunk = array('L')  # ids not yet spilled
+        self._spilled = 0  # number of chunks in the temporary file
+        self._spill = None
+        self._forward = [_Factors(t) for t in _thresholds(ttr_threshold)]
+
+    def add(self, token):
+        """Append a single token to the stream."""
+        self.update((token,))
+
+    def update(self, tokens):
+        """Append several tokens to the stream."""
+        vocab = self._vocab
+        tokens = iter(tokens)
+        while True:
+            ids = [vocab.setdefault(token, len(vocab))
+                   for token in islice(tokens, self.chunk_size)]
+            if not ids:
+                break
+            for factors in self._forward:
+                factors.feed(ids)
+            self._chunk.extend(ids)
+            if len(self._chunk) >= self.chunk_size:
+                if self._spill is None:
+                    self._spill = tempfile.TemporaryFile()
+                self._chunk[:self.chunk_size].tofile(self._spill)
+                del self._chunk[:self.chunk_size]
+                self._spilled += 1
+
+    def forward_score(self):
+        """Forward MTLD score of the stream so far.
+
+        Unlike <score> it doesn't replay the tokens in reverse and
+        is therefore cheap enough to be called after every batch.
+
+        Returns:
+            float: Forward MTLD score. A list of scores, one per threshold,
+                if several thresholds were given.
+        """
+        scores = [factors.score() for factors in self._forward]
+        if isinstance(self.ttr_threshold, (int, float)):
+            return scores[0]
+        return scores
+
+    def score(self):
+        """Mean of the forward and the reverse MTLD score of the stream so far.
+
+        Tokens can still be added afterwards.
+
+        Returns:
+            float: MTLD score. A list of scores, one per threshold,
+                if several thresholds were given.
+        """
+        forward = [factors.score() for factors in self._forward]
+        reverse = [_Factors(t) for t in _thresholds(self.ttr_threshold)]
+        for factors in reverse:
+            factors.feed(self._chunk[::-1])
+        chunk = array('L')
+        for i in reversed(range(self._spilled)):
+            self._spill.seek(i*self.chunk_size*chunk.itemsize)
+            chunk.fromfile(self._spill, self.chunk_size)
+            chunk.reverse()
+            for factors in reverse:
+                factors.feed(chunk)
+            del chunk[:]
+        if self._spill is not None:
+            self._spill.seek(0, 2)  # further chunks are appended
+        scores = [(f + r.score())/2 for f, r in zip(forward, reverse)]
+        if isinstance(self.ttr_threshold, (int, float)):
+            return scores[0]
+        return scores
+
+    def close(self):
+        """Remove the temporary file."""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+            self._spilled = 0
+
+
+def mtld(seq, ttr_threshold=0.72):
     """(= measure of textual lexical diversity (McCarthy, 2005))
 
     Text length measured in words is divided by a segment count.
@@ -62,14 +199,24 @@ def mtld(seq):
     are computed and their mean is returned as the final MTLD value.
 
     Args:
-        seq (list): Text as a list of tokens.
+        seq (list): Text as a list of tokens. Alternatively a generator
+            of tokens, which is consumed without keeping its tokens in memory.
+        ttr_threshold(float): TTR below which a segment is completed.
+            Pass a sequence of thresholds to compute the score for each
+            of them in a single pass.
 
     Returns:
-        int: MTLD score.
+        float: MTLD score. A list of scores, one per threshold,
+            if several thresholds were given.
     """
-    if isinstance(seq, list):
-        return (_mtld(seq) + _mtld(seq, reverse=True))/2
-    if isinstance(seq, GeneratorType):
-        return _mtld(seq)  # getting the reverse of an iterator is computationally difficult
-    raise ValueError("The Input should be a list or generator. "
-                     "Try using split if your input was a string.")
+    if not isinstance(seq, (list, GeneratorType)):
+        raise ValueError("The Input should be a list or generator. "
+                         "Try using split if your input was a string.")
+    # a list is held in memory anyway, so there is no need to spill its ids
+    chunk_size = len(seq) + 1 if isinstance(seq, list) else 2**16
+    accumulator = Mtld(ttr_threshold, chunk_size)
+    try:
+        accumulator.update(seq)
+        return accumulator.score()
+    finally:
+        accumulator.close()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Visualizations of frequency distributions.
+
+Kept apart from distribution.py as importing matplotlib
+takes longer than running most commands of the project.
+"""
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from lib.errors import ScarceDataError
+
+
+def pie_chart(distribution, title, iterable=None):
+    """See <Distribution.plot>."""
+    if not iterable:
+        iterable = distribution.keys()
+        if not iterable:
+            raise ScarceDataError("Method 'plot' needs at least one data point.")
+    else:
+        # because we need to iterate more than once
+        if iter(iterable) is iterable:
+            iterable = list(iterable)
+    # organize data
+    probs = distribution.prob_dist(iterable)
+    slices = sorted(iterable, key=lambda x: probs[x], reverse=True)
+    sizes = [probs[slc] for slc in slices]
+    # filter scarce data points
+    for i in range(len(slices)):
+        if sizes[i] < 0.02:
+            slices = slices[:i] + ['<other>']
+            sizes = sizes[:i] + [sum(sizes[i:])]
+            break
+    # plot settings
+    fig, ax = plt.subplots()
+    ax.pie(sizes, labels=["{:.2%}".format(size) for size in sizes],
+           shadow=False, startangle=90)
+    ax.axis('equal')
+    plt.title(title)
+    plt.legend(slices, loc=3)
+    plt.show()
+
+
+def bar_chart(distribution, title, label, start=None, end=None, steps=None, iterable=None):
+    """See <IntegerDistribution.plot>."""
+    if not iterable:
+        iterable = distribution.keys()
+        if not iterable:
+            raise ScarceDataError("Method 'plot' requires at least one data point.")
+    else:
+        # because we need to iterate more than once
+        if iter(iterable) is iterable:
+            iterable = list(iterable)
+    # create plot
+    fig, ax = plt.subplots()
+    # organize data
+    bars = sorted(iterable)
+    if start is None:
+        start = bars[0]
+    if end is None:
+        end = bars[-1]
+    if steps is None:
+        steps = max(1, (start + end)//10)
+    bars = [bar for bar in bars if start <= bar <= end]
+    heights = [distribution.prob_dist(iterable)[k] for k in bars]
+    # set axis settings
+    ax.set_axisbelow(True)
+    ax.set_title(title)
+    ax.set_xticks(np.arange(start, end + 1, steps))
+    ax.set_ylabel('relative frequency')
+    # remove top and right borders
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    # add major gridlines in the background
+    ax.grid(color='white', linestyle='-', linewidth=2, alpha=0.5)
+    ax.set_facecolor((0.95, 0.95, 0.95))
+    # draw bars
+    ax.bar(bars, heights, color='mediumseagreen', label=label, alpha=0.60)
+    ax.plot(bars, heights, color='mediumseagreen')
+    ax.legend()
+    plt.show()
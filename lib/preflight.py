@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Cheap checks of preprocessed texts before their features are extracted.
+
+Whether the features of a text can be normalized is otherwise only
+known once the whole text has been tagged and lemmatized. As the
+tokens of a preprocessed text are separated with whitespaces, all
+that matters for these checks (number of sentences and tokens,
+punctuation marks and repeated words) can already be counted on
+the raw lines. A text rejected here would fail the same way after
+its feature extraction, texts passing may still fail if only a
+sample of their sentences is used.
+"""
+
+from collections import namedtuple
+
+
+# counts of a single text, <invalid_line> is the first line that is no valid utf-8
+TextStats = namedtuple('TextStats', ['sentences', 'tokens', 'words', 'punctuation',
+                                     'repeated', 'invalid_line'])
+
+
+def scan(filename, punctuation):
+    """Count the sentences and tokens of a preprocessed text.
+
+    The file is split into lines and tokens exactly
+    like <AuthorModel._nlp> does, but nothing else is done.
+
+    Args:
+        filename(str): Path to a preprocessed utf8-encoded txt-file.
+        punctuation(set<str>): Tokens counting as punctuation marks.
+
+    Returns:
+        TextStats: Counts of the text, reading stops at
+            the first line that is no valid utf-8.
+    """
+    sentences, tokens, marks = 0, 0, 0
+    seen = set()  # tokens so far, only kept until the first repetition
+    repeated = False
+    invalid_line = None
+    with open(filename, 'rb') as file_in:
+        for i, raw_line in enumerate(file_in, 1):
+            try:
+                line = raw_line.decode('utf-8')
+            except UnicodeDecodeError:
+                invalid_line = i
+                break
+            words = line.split()
+            sentences += 1
+            tokens += len(words)
+            marks += sum(1 for word in words if word in punctuation)
+            if not repeated:
+                before = len(seen)
+                seen.update(words)
+                repeated = len(seen) - before < len(words)
+                if repeated:
+                    seen = None
+    return TextStats(sentences, tokens, tokens - marks, marks, repeated, invalid_line)
+
+
+def problems(stats, features):
+    """Reasons why the features of some texts can't be extracted.
+
+    Every text has to have an MTLD score on its own,
+    all other features are counted over all texts together.
+
+    Args:
+        stats(list<tuple>): Pairs of a filename and
+            its <TextStats> for all texts of a profile.
+        features(iterable<str>): Feature families to be
+            extracted, see <lib.author_model.FEATURES>.
+
+    Returns:
+        list<str>: Empty if nothing speaks against the texts.
+    """
+    reasons = []
+    for filename, text in stats:
+        if text.invalid_line is not None:
+            reasons.append(f"'{filename}' is no valid utf-8 (line {text.invalid_line}).")
+        elif "mtld" in features and not text.repeated:
+            reasons.append(f"'{filename}' repeats no token, its MTLD score can't be calculated.")
+    if reasons:
+        return reasons
+    if "sent_len" in features and sum(text.sentences for _, text in stats) < 1:
+        reasons.append("No sentences.")
+    if "freq_word" in features and sum(text.tokens for _, text in stats) < 1:
+        reasons.append("No tokens.")
+    if "word_len" in features and sum(text.words for _, text in stats) < 1:
+        reasons.append("No words apart from punctuation marks.")
+    if "punctuation" in features and sum(text.punctuation for _, text in stats) < 1:
+        reasons.append("No punctuation mark.")
+    # pos trigrams don't span files, a file of n tokens has n-2 of them
+    if ("pos_trigram" in features
+            and sum(max(0, text.tokens - 2) for _, text in stats) < 2):
+        reasons.append("Less than two pos trigrams (at least four consecutive tokens).")
+    return reasons
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""Indexes for the search of the closest author profiles."""
+
+import bisect
+import heapq
+import logging
+
+
+LOG = logging.getLogger(__name__)
+
+# summary features every lower bound is computed on
+STATISTICS = ["<mean_word_len>", "<stdev_word_len>", "<mean_sent_len>",
+              "<stdev_sent_len>", "<mtld_score>"]
+
+
+class PruningIndex:
+    """Finds the closest profiles without comparing to all of them.
+
+    The weighted L1 distance is a sum of non-negative terms, one per
+    feature. Summing up the terms of only a few features therefore
+    yields a lower bound of the distance. These lower bounds are cheap
+    to compute for all profiles; profiles are then compared in the order
+    of their lower bounds and the search stops as soon as the lower
+    bound exceeds the distance of the k-th best match found so far.
+    The exact comparison of a profile is also cut short once its
+    distance grows larger than that of the k-th best match.
+    The result is the same as comparing to every profile.
+
+    Args:
+        distance(callable): Function computing the distance between
+            a known and an unknown feature vector. It has to accept a
+            third argument <bound> and may return any value larger
+            than <bound> as soon as the distance exceeds it.
+        weights(dict): Weights of the features used by <distance>,
+            defaulting to 1 for all features not included.
+        summary_size(int): Number of features the lower bounds are
+            computed on in addition to the summary statistics.
+
+    Attributes:
+        vectors(dict): Maps author names to their normalized feature vectors.
+    """
+    def __init__(self, distance, weights, summary_size=32):
+        self.distance = distance
+        self.weights = weights
+        self.summary_size = summary_size
+        self.vectors = dict()
+        self._order = dict()  # maps author names to their insertion position
+        self._mass = dict()  # summed up value of every feature over all profiles
+        self._heavy = None  # features with the highest mass, None if outdated
+        self._counter = 0
+
+    def add(self, author, vector):
+        """Add a profile to the index."""
+        self.remove(author)
+        self.vectors[author] = vector
+        self._order[author] = self._counter
+        self._counter += 1
+        for feature, value in vector.items():
+            self._mass[feature] = self._mass.get(feature, 0) + value
+        self._heavy = None
+
+    def remove(self, author):
+        """Remove a profile from the index if it is included."""
+        if author in self.vectors:
+            for feature, value in self.vectors.pop(author).items():
+                self._mass[feature] -= value
+            del self._order[author]
+            self._heavy = None
+
+    def rank(self, unknown_vector, k=1):
+        """Find the k profiles closest to a feature vector.
+
+        Args:
+            unknown_vector(dict): Normalized feature vector.
+            k(int): Number of matches to find.
+
+        Returns:
+            list<tuple>: Pairs of difference score and author name
+                in ascending order of the difference score. Equal
+                scores are ordered by insertion into the index.
+        """
+        summary = self._summary(unknown_vector)
+        weights = self.weights
+        candidates = []
+        for author, vector in self.vectors.items():
+            bound = 0
+            for feature in summary:
+                bound += (abs(vector.get(feature, 0) - unknown_vector.get(feature, 0))
+                          * weights.get(feature, 1))
+            candidates.append((bound, self._order[author], author))
+        candidates.sort()
+        best = []  # triples of distance, insertion position and author name
+        compared = 0
+        for bound, order, author in candidates:
+            if len(best) == k:
+                kth = best[-1][0]
+                # tolerance as the bound sums up the terms in a different order
+                if bound > kth + 1e-9*max(1.0, kth):
+                    break
+            else:
+                kth = float("inf")
+            diff = self.distance(self.vectors[author], unknown_vector, kth)
+            compared += 1
+            if diff <= kth:
+                bisect.insort(best, (diff, order, author))
+                del best[k:]
+        LOG.info(f"Compared to {compared} out of {len(candidates)} profiles.")
+        return [(diff, author) for diff, _, author in best]
+
+#################
+# private methods
+#################
+
+    def _summary(self, unknown_vector):
+        """Choose the features to compute lower bounds on.
+
+        Features with a high mass either in the unknown vector or
+        in the profiles are expected to contribute the most to
+        the distance.
+        """
+        if self._heavy is None:
+            self._heavy = heapq.nlargest(self.summary_size,
+                                         (f for f in self._mass if f not in STATISTICS),
+                                         key=self._mass.get)
+        summary = set(STATISTICS)
+        summary.update(self._heavy)
+        summary.update(heapq.nlargest(self.summary_size,
+                                      (f for f in unknown_vector if f not in STATISTICS),
+                                      key=unknown_vector.get))
+        return summary
+
+
+class InvertedIndex:
+    """Finds the closest profiles visiting only the features of a text.
+
+    The weighted L1 distance of a profile to a text splits into the
+    features of the text and all other features, where the text is 0:
+        sum over f in text of w_f*|profile_f - text_f|
+        + mass(profile) - sum over f in text of w_f*profile_f ,
+    mass(profile) being the weighted sum of all values of the profile.
+    Features of the text missing in a profile add w_f*text_f to the
+    distance of every profile alike. Keeping the mass of every profile
+    and the postings of every feature (the profiles including it
+    together with their value), only those profiles are visited that
+    share a feature with the text, so the cost depends on the number
+    of features of the text and not on the size of the profiles.
+    Since these sums are subject to rounding errors, the profiles
+    closest to the text are compared once more with <distance>.
+    The result is the same as comparing to every profile.
+
+    Args:
+        distance(callable): Function computing the distance between
+            a known and an unknown feature vector.
+        weights(dict): Weights of the features used by <distance>,
+            defaulting to 1 for all features not included.
+
+    Attributes:
+        vectors(dict): Maps author names to their normalized feature vectors.
+        postings(dict): Maps features to dicts mapping author
+            names to the value of the feature in their profile.
+        mass(dict): Maps author names to the weighted sum of the values
+            of their profile, in the order of insertion into the index.
+        size(int): Number of values in all postings.
+    """
+    # share of all values a text may visit to still count as sparse
+    SPARSE_SHARE = 0.5
+
+    def __init__(self, distance, weights):
+        self.distance = distance
+        self.weights = weights
+        self.vectors = dict()
+        self.postings = dict()
+        self.mass = dict()
+        self.size = 0
+
+    def add(self, author, vector):
+        """Add a profile to the index."""
+        self.remove(author)
+        weights = self.weights
+        mass = 0
+        for feature, value in vector.items():
+            self.postings.setdefault(feature, dict())[author] = value
+            mass += weights.get(feature, 1)*value
+        self.vectors[author] = vector
+        self.mass[author] = mass
+        self.size += len(vector)
+
+    def remove(self, author):
+        """Remove a profile from the index if it is included."""
+        if author in self.vectors:
+            vector = self.vectors.pop(author)
+            for feature in vector:
+                del self.postings[feature][author]
+                if not self.postings[feature]:
+                    del self.postings[feature]
+            del self.mass[author]
+            self.size -= len(vector)
+
+    def is_sparse(self, unknown_vector):
+        """Whether a feature vector visits only a small share of the postings.
+
+        Texts sharing most of their features with the profiles visit
+        nearly all values of the index, which a <PruningIndex>
+        might avoid. The test itself only looks up every feature.
+        """
+        visited = sum(len(self.postings.get(feature, ())) for feature in unknown_vector)
+        return visited <= self.SPARSE_SHARE*self.size
+
+    def rank(self, unknown_vector, k=None):
+        """Sort the profiles by their distance to a feature vector.
+
+        Args:
+            unknown_vector(dict): Normalized feature vector.
+            k(Optional[int]): Only return the k best matches, all
+                profiles are compared with <distance> otherwise.
+
+        Returns:
+            list<tuple>: Pairs of difference score and author name
+                in ascending order of the difference score. Equal
+                scores are ordered by insertion into the index.
+        """
+        weights = self.weights
+        estimates = dict(self.mass)
+        missing = 0  # added to every estimate
+        for feature, value in unknown_vector.items():
+            weight = weights.get(feature, 1)
+            missing += weight*value
+            for author, known in self.postings.get(feature, {}).items():
+                # replaces the terms assumed by mass and missing by the actual one
+                estimates[author] += weight*(abs(known - value) - known - value)
+        candidates = list(estimates)
+        if k is not None and k < len(candidates):
+            kth = heapq.nsmallest(k, estimates.values())[-1]
+            # tolerance for the rounding errors of the estimates
+            limit = kth + 1e-9*max(1.0, abs(kth + missing))
+            candidates = [author for author in candidates if estimates[author] <= limit]
+        LOG.info(f"Compared to {len(candidates)} out of {len(estimates)} profiles.")
+        ranking = [(self.distance(self.vectors[author], unknown_vector), author)
+                   for author in candidates]
+        # stable sort keeps the insertion order for equal scores
+        ranking.sort(key=lambda x: x[0])
+        return ranking[:k]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Progress reports of long running tasks.
+
+By default progress is not reported at all. The commandline
+shows progress bars by setting a <TqdmProgress>, services can
+receive the reports with a <CallbackProgress>:
+    >>> set_progress(CallbackProgress(print, interval=5.0))
+"""
+
+import time
+
+
+class _Task:
+    """Progress of a single task, ignoring all updates."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, n=1):
+        """Report that another <n> units of the task are done."""
+
+    def close(self):
+        """Report that the task is finished."""
+
+
+_NULL_TASK = _Task()
+
+
+class Progress:
+    """Receives progress reports and ignores them."""
+    def task(self, total, description=None, unit="it"):
+        """Start reporting the progress of a task.
+
+        Args:
+            total(int): Number of units the task consists of.
+            description(Optional[str]): Name of the task.
+            unit(str): Unit of <total>, e.g. 'B' for bytes.
+
+        Returns:
+            Context manager with the methods update and close.
+        """
+        return _NULL_TASK
+
+
+class TqdmProgress(Progress):
+    """Shows progress as tqdm progress bars on the commandline."""
+    def task(self, total, description=None, unit="it"):
+        from tqdm import tqdm
+        return tqdm(total=total, desc=description, unit=unit,
+                    unit_scale=unit == "B", leave=False)
+
+
+class _CallbackTask(_Task):
+    """Task passing its progress to a function."""
+    def __init__(self, callback, interval, total, description):
+        self.callback = callback
+        self.interval = interval
+        self.total = total
+        self.description = description
+        self.done = 0
+        self._last = time.monotonic()
+
+    def update(self, n=1):
+        self.done += n
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.callback(self.description, self.done, self.total)
+
+    def close(self):
+        self.callback(self.description, self.done, self.total)
+
+
+class CallbackProgress(Progress):
+    """Passes progress to a function.
+
+    Args:
+        callback(callable): Called with the description of a task,
+            the number of units done and the total number of units.
+        interval(float): Minimum number of seconds between two calls
+            for the same task. The function is always called once
+            the task is finished.
+    """
+    def __init__(self, callback, interval=1.0):
+        self.callback = callback
+        self.interval = interval
+
+    def task(self, total, description=None, unit="it"):
+        return _CallbackTask(self.callback, self.interval, total, description)
+
+
+_progress = Progress()
+
+
+def get_progress():
+    """The receiver of all progress reports."""
+    return _progress
+
+
+def set_progress(progress):
+    """Replace the receiver of all progress reports.
+
+    Args:
+        progress(Progress): E.g. TqdmProgress() for progress bars.
+    """
+    global _progress
+    _progress = progress
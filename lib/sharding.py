@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""Classifier distributing its author profiles over worker processes."""
+
+import functools
+import logging
+import multiprocessing
+import os
+
+from lib.author_ident import AuthorIdent
+from lib.author_model import AuthorModel, is_pruned
+from lib.errors import CatalogError, log_exception
+from lib.profile_index import InvertedIndex, PruningIndex
+from lib.storage import open_catalog
+
+
+LOG = logging.getLogger(__name__)
+
+
+class ShardedAuthorIdent(AuthorIdent):
+    """Collects author profiles in a catalog served by several processes.
+
+    The profiles of the catalog are partitioned into shards, each
+    of them loaded and scored by its own worker process. To classify
+    a text its feature vector is sent to all shards at once and the
+    best matches of every shard are merged afterwards.
+    The main process never loads the profiles itself, so the
+    catalog size is limited by the memory of all worker processes
+    together and scoring runs on as many cores as there are shards.
+
+    Workers are started on initialization and should be stopped
+    by calling <ShardedAuthorIdent.close> or by using the
+    classifier as a context manager.
+
+    Args:
+        catalog(str): Path to a file containing lines of the form
+            <author>\t<pretrained model json-filename> .
+            Alternatively the path to a SQLite database
+            ending on .db, .sqlite or .sqlite3 .
+        shards(Optional[int]): Number of worker processes.
+            Defaults to the number of cores.
+        authors(Optional[Iterable]): Only load the profiles
+            of these authors from the catalog.
+
+    Attributes:
+        catalog(str): Stored catalog filename.
+        catalog_content(dict): Maps author names to the filenames
+            their pretrained models are saved under (or to their
+            reference within a database).
+        profiles(dict): Always empty, the profiles are
+            held by the worker processes.
+        shards(int): Number of worker processes.
+    """
+    def __init__(self, catalog, shards=None, authors=None):
+        self.shards = shards or os.cpu_count() or 1
+        self._workers = []  # pairs of process and connection
+        self._owner = dict()  # maps author names to the index of their shard
+        self._order = dict()  # maps author names to their position in the catalog
+        self._features = dict()  # maps author names to the feature families of their profile
+        super().__init__(catalog, authors=authors)
+
+    @log_exception(LOG)
+    def train(self, author, source, max_tokens=None, sample_rate=None,
+              top_k=None, min_count=None, jobs=1, tagged=None, features=None):
+        """Add new author profile to the least occupied shard.
+
+        See <AuthorIdent.train>.
+        """
+        super().train(author, source, max_tokens=max_tokens, sample_rate=sample_rate,
+                      top_k=top_k, min_count=min_count, jobs=jobs, tagged=tagged,
+                      features=features)
+        self._hand_out(author)
+
+    @log_exception(LOG)
+    def train_many(self, sources, max_tokens=None, sample_rate=None,
+                   top_k=None, min_count=None, jobs=1, tagged=None, features=None):
+        """Add several new author profiles, each to the least occupied shard.
+
+        See <AuthorIdent.train_many>.
+        """
+        authors = super().train_many(sources, max_tokens=max_tokens, sample_rate=sample_rate,
+                                     top_k=top_k, min_count=min_count, jobs=jobs,
+                                     tagged=tagged, features=features)
+        error = None
+        for author in authors:
+            try:
+                self._hand_out(author)
+            except Exception as exc:
+                error = error or exc
+        if error is not None:
+            raise error
+        return authors
+
+    @log_exception(LOG)
+    def forget(self, author):
+        """Remove author profile from its shard.
+
+        See <AuthorIdent.forget>.
+        """
+        super().forget(author)
+        self._request(self._owner.pop(author), "remove", author)
+        self._order.pop(author)
+        self._features.pop(author)
+
+    @log_exception(LOG)
+    def set_weights(self, weights):
+        """Change the weights of the features in the distance on all shards.
+
+        See <AuthorIdent.set_weights>.
+        """
+        super().set_weights(weights)
+        for _, connection in self._workers:
+            connection.send(("weights", self.weights))
+        self._gather(range(self.shards))
+
+    def close(self):
+        """Stop all worker processes."""
+        for process, connection in self._workers:
+            connection.send(("stop",))
+            process.join()
+            connection.close()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#################
+# private methods
+#################
+
+    @log_exception(LOG)
+    def _read_catalog(self):
+        """Start worker processes loading the catalog's profiles."""
+        if not self.storage.exists():
+            raise FileNotFoundError(f"The catalog '{self.catalog}' does not exist.")
+        LOG.info(f"Load existing classifier with the catalog '{self.catalog}' "
+                 f"into {self.shards} shards...")
+        locations = dict()  # maps author names to their location in the catalog
+        for location, line in self.storage.read():
+            if len(line) != 2:
+                LOG.warning(f"Ignored {location}; missing column.")
+                LOG.info(f"Correct line format: <author_name>\t<saved_profile_file> .")
+            elif self._authors is None or line[0] in self._authors:
+                author, file = line
+                self.catalog_content[author] = file
+                locations[author] = location
+        entries = [[] for _ in range(self.shards)]
+        for i, (author, file) in enumerate(self.catalog_content.items()):
+            entries[i % self.shards].append((author, file))
+            self._owner[author] = i % self.shards
+            self._order[author] = i
+        for shard_entries in entries:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(worker_connection,
+                                                                   self.catalog,
+                                                                   shard_entries,
+                                                                   self.weights),
+                                              daemon=True)
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+        try:
+            # wait until all profiles are loaded
+            forward = []
+            for missing, features, shard_forward in self._gather(range(self.shards)):
+                self._features.update(features)
+                forward.extend(shard_forward)
+                for author in missing:
+                    LOG.warning(f"Ignored {locations[author]}; could not open the file "
+                                f"'{self.catalog_content.pop(author)}' supposed to "
+                                "contain the pretrained model.")
+                    del self._owner[author]
+                    del self._order[author]
+                    self._features.pop(author, None)
+        except CatalogError:
+            self.close()
+            raise
+        for author in self.catalog_content:
+            LOG.info(f"Trained for '{author}'.")
+        self._check_mtld(sorted(forward, key=self._order.get))
+
+    def _hand_out(self, author):
+        """Move a newly trained profile to the shard holding the fewest profiles.
+
+        If the shard can't take the profile, it is removed from
+        the catalog again, so no author is listed that no shard serves.
+        """
+        profile = self.profiles.pop(author)
+        shard = min(range(self.shards), key=list(self._owner.values()).count)
+        try:
+            self._request(shard, "add", author, profile.normalized_feature_vector())
+        except Exception:
+            LOG.error(f"Shard {shard} could not take the profile of '{author}'; "
+                      "removed it from the catalog again.")
+            AuthorIdent.forget(self, author)
+            raise
+        self._features[author] = profile.features
+        self._owner[author] = shard
+        self._order[author] = max(self._order.values(), default=-1) + 1
+
+    def _profile_features(self):
+        """Feature families of every profile held by the shards."""
+        return list(self._features.values())
+
+    def _rank(self, unknown_vector, k=None):
+        """Sort all known authors by their distance to a feature vector.
+
+        Args:
+            unknown_vector(dict): Normalized feature vector.
+            k(Optional[int]): Only return the k best matches.
+
+        Returns:
+            list<tuple>: Pairs of difference score and author name
+                in ascending order of the difference score.
+        """
+        # scatter
+        for _, connection in self._workers:
+            connection.send(("rank", unknown_vector, k))
+        # gather
+        ranking = []
+        for shard_ranking in self._gather(range(self.shards)):
+            ranking.extend(shard_ranking)
+        ranking.sort(key=lambda x: (x[0], self._order[x[1]]))
+        for diff, known_author in ranking[:k]:
+            LOG.info(f"Difference score with '{known_author}': {diff}")
+        return ranking[:k]
+
+    def _request(self, shard, *task):
+        """Send a task to a shard and wait for its completion."""
+        self._workers[shard][1].send(task)
+        return self._gather([shard])[0]
+
+    def _gather(self, shards):
+        """Wait for the answers of several shards.
+
+        The answers of all shards are read before an error is raised,
+        otherwise a later task would receive the outdated answer
+        of a shard still waiting in its pipe.
+
+        Returns:
+            list: Answer of every shard.
+        """
+        answers = [self._workers[shard][1].recv() for shard in shards]
+        for shard, (status, answer) in zip(shards, answers):
+            if status == "error":
+                raise CatalogError(f"Shard {shard} failed.") from answer
+        return [answer for _, answer in answers]
+
+
+def _serve(connection, catalog, entries, weights):
+    """Worker process holding the profiles of a single shard.
+
+    Once loaded, the names of the authors whose profiles could
+    not be found, the feature families of all other profiles and
+    the authors whose profiles only carry the forward mtld score
+    are sent back.
+
+    Args:
+        connection(multiprocessing.connection.Connection):
+            Receives tasks and sends back results.
+        catalog(str): Filename of the catalog.
+        entries(list<tuple>): Pairs of author name and
+            filename of the pretrained model.
+        weights(dict): Weights of the features in the distance.
+    """
+    # both keep the catalog order for ties
+    postings, index = _indexes(weights)
+    missing = []
+    features = dict()
+    forward = []
+    try:
+        storage = open_catalog(catalog)
+        for author, file in entries:
+            try:
+                profile = storage.load(file, AuthorModel)
+            except FileNotFoundError:
+                missing.append(author)
+            else:
+                vector = profile.normalized_feature_vector()
+                postings.add(author, vector)
+                index.add(author, vector)
+                features[author] = profile.features
+                if profile.mtld_variant == "forward":
+                    forward.append(author)
+    except Exception as exc:
+        connection.send(("error", exc))
+    else:
+        connection.send(("ok", (missing, features, forward)))
+    while True:
+        task, *args = connection.recv()
+        if task == "stop":
+            break
+        try:
+            if task == "rank":
+                unknown_vector, k = args
+                if any(map(is_pruned, postings.vectors.values())):
+                    ranking = AuthorIdent._rank_projected(postings.vectors, unknown_vector,
+                                                          k, weights)
+                elif k is None or postings.is_sparse(unknown_vector):
+                    ranking = postings.rank(unknown_vector, k)
+                else:
+                    ranking = index.rank(unknown_vector, k)
+                connection.send(("ok", ranking))
+            elif task == "add":
+                postings.add(*args)
+                index.add(*args)
+                connection.send(("ok", None))
+            elif task == "remove":
+                postings.remove(*args)
+                index.remove(*args)
+                connection.send(("ok", None))
+            elif task == "weights":
+                vectors = postings.vectors
+                weights, = args
+                postings, index = _indexes(weights)
+                for author, vector in vectors.items():
+                    postings.add(author, vector)
+                    index.add(author, vector)
+                connection.send(("ok", None))
+        except Exception as exc:
+            connection.send(("error", exc))
+    connection.close()
+
+
+def _indexes(weights):
+    """Empty InvertedIndex and PruningIndex comparing profiles with the given weights."""
+    distance = functools.partial(AuthorIdent._simil, weights=weights)
+    return InvertedIndex(distance, weights), PruningIndex(distance, weights)
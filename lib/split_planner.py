@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Assignment of books to the parts of a corpus split.
+
+The books of every author are split into parts (e.g. validation,
+test and training) whose sizes come as close as possible to the
+requested ratios. The resulting plan is saved as manifest, so
+the books can be processed independently of planning, e.g. in
+parallel or resumed after an interruption.
+"""
+
+import bisect
+import json
+
+from lib.storage import atomic_write
+
+
+# part receiving all books not assigned to any other part
+REMAINDER = "training"
+
+
+def best_slice(sizes, goal):
+    """Find the consecutive values whose sum is closest to a goal.
+
+    For every end of the slice, the best start is searched for by
+    bisection in the prefix sums, which takes O(n log n) instead of
+    trying every pair of start and end.
+
+    Args:
+        sizes(list<int>): Non-negative values.
+        goal(float): Value the sum should get close to.
+
+    Returns:
+        tuple(int, int): Start and (exclusive) end of the slice,
+            the first one if several slices are equally close.
+    """
+    prefix = [0]
+    for size in sizes:
+        prefix.append(prefix[-1] + size)
+    best = (float("inf"), None, None)
+    for end in range(1, len(prefix)):
+        target = prefix[end] - goal  # the prefix sum the start would ideally have
+        candidates = []
+        after = bisect.bisect_left(prefix, target, 0, end)
+        if after < end:
+            candidates.append(after)
+        if after > 0:
+            # the first start with the largest prefix sum below the target
+            candidates.append(bisect.bisect_left(prefix, prefix[after - 1], 0, end))
+        for start in candidates:
+            best = min(best, (abs(prefix[end] - prefix[start] - goal), start, end))
+    return best[1:]
+
+
+def best_subset(sizes, goal, resolution=0.001):
+    """Find values (not necessarily consecutive) whose sum is close to a goal.
+
+    Approximation of the subset sum problem: all reachable sums are
+    built up value by value, keeping only one sum per interval of
+    width resolution*goal, so there are never more than 2/resolution
+    sums to extend. Every step can lose at most the width of an
+    interval; in practice the result is rarely more than a single
+    interval away from the best subset.
+
+    Args:
+        sizes(list<int>): Non-negative values.
+        goal(float): Value the sum should get close to.
+        resolution(float): Width of the intervals relative to the goal.
+
+    Returns:
+        list<int>: Indices of the chosen values, at least one.
+    """
+    # large values first, small ones are better suited to fill the remaining gap
+    values = sorted(((i, size) for i, size in enumerate(sizes) if size > 0),
+                    key=lambda x: -x[1])
+    if not values:
+        return [0] if sizes else []
+    width = max(resolution*goal, 1e-9)
+    limit = 2*goal  # sums above cannot be closer to the goal than the empty sum
+    sums = {0: (0, 0)}  # maps intervals to a sum inside of them and its bitmask of indices
+    for i, size in values:
+        for s, mask in list(sums.values()):
+            s += size
+            if s <= limit:
+                sums.setdefault(int(s//width), (s, mask | 1 << i))
+    chosen = [(abs(s - goal), s, mask) for s, mask in sums.values() if mask]
+    if not chosen:  # every single value is larger than twice the goal
+        return [min(range(len(sizes)), key=lambda i: abs(sizes[i] - goal))]
+    mask = min(chosen)[2]
+    return [i for i in range(len(sizes)) if mask >> i & 1]
+
+
+def plan_split(sizes, ratios, subset_sum=False):
+    """Assign books to the parts of a split.
+
+    Parts are filled in the given order, books assigned to a
+    part are not available for the following ones. All books
+    left over are assigned to the part <REMAINDER>.
+
+    Args:
+        sizes(list<int>): Sizes of the books.
+        ratios(list<tuple>): Pairs of part name and fraction
+            of the total size it should get.
+        subset_sum(bool): Whether parts may consist of any books
+            instead of consecutive ones, which usually gets
+            closer to the requested ratios.
+
+    Returns:
+        list<str>: Name of the part for every book.
+    """
+    parts = [REMAINDER]*len(sizes)
+    total = sum(sizes)
+    for name, ratio in ratios:
+        if ratio <= 0:
+            continue
+        # assigned books can't be used to get any closer to the goal
+        free = [0 if parts[i] != REMAINDER else size for i, size in enumerate(sizes)]
+        if subset_sum:
+            chosen = best_subset(free, total*ratio)
+        else:
+            chosen = range(*best_slice(free, total*ratio))
+        for i in chosen:
+            if parts[i] == REMAINDER:
+                parts[i] = name
+    return parts
+
+
+def write_manifest(goal, manifest):
+    """Save a split plan.
+
+    Args:
+        goal(str): Location/name for the json-file.
+        manifest(dict): The plan, containing a list of entries
+            with the keys 'author', 'book' and 'part' under 'books'.
+    """
+    with atomic_write(goal) as file_out:
+        json.dump(manifest, file_out, indent=4)
+
+
+def read_manifest(source):
+    """Load a split plan saved by <write_manifest>."""
+    with open(source, 'r', encoding='utf-8') as file_in:
+        manifest = json.load(file_in)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("books"), list):
+        raise ValueError(f"'{source}' is no split manifest.")
+    return manifest
@@ -0,0 +1,599 @@
+# -*- coding: utf-8 -*-
+"""Storage of catalogs safe for concurrent access.
+
+Two interchangeable backends are available: <TsvCatalog> keeps
+every profile in a json-file listed in a tab-separated catalog,
+<SqliteCatalog> keeps the whole catalog in a single SQLite database.
+Use <open_catalog> to pick the backend by the catalog's file extension.
+"""
+
+from contextlib import contextmanager
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+
+from lib.errors import CatalogError
+
+
+LOG = logging.getLogger(__name__)
+# file extensions of catalogs saved as SQLite database
+SQLITE_EXTENSIONS = {".db", ".sqlite", ".sqlite3"}
+
+
+class FileLock:
+    """Inter-process lock based on the exclusive creation of a file.
+
+    The lock is reentrant within a thread, so methods holding
+    the lock can call each other. The lock file contains the
+    process id of its holder; a lock left behind by a process that
+    no longer runs (e.g. because it was killed) is broken on POSIX
+    systems.
+
+    Args:
+        path(str): Filename of the lock file.
+        timeout(float): Seconds to wait for the lock before
+            a CatalogError is raised.
+    """
+    _held = threading.local()  # maps lock files held by the current thread to a counter
+
+    def __init__(self, path, timeout=30.0):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+
+    def __enter__(self):
+        held = self._held.__dict__
+        if held.get(self.path):
+            held[self.path] += 1
+            return self
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_stale():
+                    LOG.warning(f"Broke the lock '{self.path}' left behind "
+                                "by a process that no longer runs.")
+                    try:
+                        os.remove(self.path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if time.monotonic() > deadline:
+                    raise CatalogError(f"Could not acquire the lock '{self.path}'. Delete "
+                                       "the file if no other process is using the catalog.")
+                time.sleep(0.05)
+            else:
+                os.write(fd, str(os.getpid()).encode('utf-8'))
+                os.close(fd)
+                held[self.path] = 1
+                return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        held = self._held.__dict__
+        held[self.path] -= 1
+        if held[self.path] == 0:
+            del held[self.path]
+            os.remove(self.path)
+
+    def _is_stale(self):
+        """Whether the process holding the lock no longer runs."""
+        if os.name != 'posix':
+            # os.kill would terminate the process on Windows
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file_in:
+                pid = int(file_in.read())
+        except (OSError, ValueError):
+            # already released, or the holder hasn't written its id yet
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            # e.g. the process belongs to another user
+            return False
+        return False
+
+
+@contextmanager
+def atomic_write(goal, mode='w', encoding='utf-8'):
+    """Open a temporary file that replaces <goal> once it is closed.
+
+    Readers therefore either see the old or the new content
+    of the file, but never a partially written one. If an
+    exception occurs, <goal> stays untouched. The new file keeps
+    the permissions of <goal>, or gets the ones of a newly created
+    file if <goal> doesn't exist yet.
+    """
+    directory = os.path.dirname(os.path.abspath(goal))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(goal))
+    try:
+        with open(fd, mode, encoding=None if 'b' in mode else encoding) as file_out:
+            yield file_out
+            file_out.flush()
+            os.fsync(file_out.fileno())
+        # mkstemp creates files readable by the owner only
+        os.chmod(tmp, _permissions(goal))
+        os.replace(tmp, goal)
+    except BaseException:
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _permissions(filename):
+    """Permission bits of a file, or those a new file would be created with."""
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class TsvCatalog:
+    """Catalog saved as lines of the form <author>\t<pretrained model json-filename> .
+
+    Additions and removals are not written into the catalog file
+    itself but appended to a journal file (<catalog>.journal) with
+    lines of the form +\t<author>\t<filename> or -\t<author> .
+    Once the journal grows longer than <compact_after> lines, it is
+    merged into the catalog file, which is replaced atomically.
+    The feature weights of the catalog are saved as a json-object
+    in a separate file (<catalog>.weights.json). All accesses are
+    guarded by a lock file (<catalog>.lock), so several processes
+    can share the catalog.
+
+    Args:
+        path(str): Filename of the catalog.
+        compact_after(int): Maximum number of journal lines.
+    """
+    def __init__(self, path, compact_after=64):
+        self.path = path
+        self.compact_after = compact_after
+        self.journal = path + ".journal"
+        self.weights = path + ".weights.json"
+        self.lock = FileLock(path + ".lock")
+
+    def exists(self):
+        """Whether the catalog file exists."""
+        return os.path.isfile(self.path)
+
+    def create(self):
+        """Create an empty catalog."""
+        with self.lock:
+            with atomic_write(self.path):
+                pass
+
+    def read(self):
+        """Read the catalog including the changes in the journal.
+
+        Returns:
+            list<tuple>: Pairs of the location of an entry (e.g. 'line 3')
+                and its columns. Malformed lines are included as well.
+        """
+        with self.lock:
+            entries = dict()  # maps the locations of the entries to their columns
+            locations = dict()  # maps author names to the locations of their entries
+            with open(self.path, 'r', encoding='utf-8') as file_in:
+                for ln, line in enumerate(file_in, 1):
+                    columns = line.rstrip().split('\t')
+                    entries[f"line {ln}"] = columns
+                    locations.setdefault(columns[0], []).append(f"line {ln}")
+            for ln, (op, *columns) in enumerate(self._read_journal(), 1):
+                # an entry is removed/replaced wherever it was added before
+                for location in locations.pop(columns[0], []):
+                    del entries[location]
+                if op == '+':
+                    entries[f"journal line {ln}"] = columns
+                    locations[columns[0]] = [f"journal line {ln}"]
+            return list(entries.items())
+
+    def authors(self):
+        """Names of all authors in the catalog."""
+        return {columns[0] for _, columns in self.read() if len(columns) == 2}
+
+    def load(self, filename, model):
+        """Load a saved profile.
+
+        Filenames written with backslashes as separator
+        (e.g. on Windows) are resolved on other systems as well.
+
+        Args:
+            filename(str): Filename the profile has been saved under.
+            model(type): Class of the profile, providing <read_json>.
+
+        Returns:
+            AuthorModel: Loaded author profile.
+        """
+        if not os.path.isfile(filename) and os.sep != '\\':
+            converted = filename.replace('\\', os.sep)
+            if os.path.isfile(converted):
+                filename = converted
+        return model.read_json(filename)
+
+    def add(self, author, profile):
+        """Save a profile and add it to the catalog.
+
+        The profile is saved next to the catalog under the
+        name of its author, a number is appended if such a
+        file already exists.
+
+        Args:
+            author(str): Name of the author.
+            profile(AuthorModel): Trained author profile.
+
+        Returns:
+            str: Filename the profile has been saved under.
+        """
+        with self.lock:
+            if author in self.authors():
+                raise CatalogError(f"An entry for '{author}' already exists.")
+            filename = self._save(author, profile)
+            self._append_journal(f"+\t{author}\t{filename}\n")
+            return filename
+
+    def add_many(self, entries):
+        """Save several profiles and add them to the catalog at once.
+
+        Either all or none of the profiles are added: the catalog
+        file including the new entries replaces the old one atomically
+        and the journal is merged into it on the way.
+
+        Args:
+            entries(iterable<tuple>): Pairs of author name and profile.
+
+        Returns:
+            list<str>: Filenames the profiles have been saved under.
+        """
+        entries = list(entries)
+        with self.lock:
+            authors = self.authors()
+            for author, _ in entries:
+                if author in authors:
+                    raise CatalogError(f"An entry for '{author}' already exists.")
+                authors.add(author)
+            filenames = []
+            try:
+                for author, profile in entries:
+                    filenames.append(self._save(author, profile))
+                columns = [columns for _, columns in self.read()]
+                columns.extend([author, filename]
+                               for (author, _), filename in zip(entries, filenames))
+                with atomic_write(self.path) as file_out:
+                    for line in columns:
+                        file_out.write('\t'.join(line) + '\n')
+            except BaseException:
+                for filename in filenames:
+                    os.remove(filename)
+                raise
+            if os.path.isfile(self.journal):
+                os.remove(self.journal)
+            return filenames
+
+    def remove(self, author, filename):
+        """Remove an author and its saved profile from the catalog.
+
+        Args:
+            author(str): Name of the author.
+            filename(str): Filename the profile has been saved under.
+        """
+        with self.lock:
+            self._append_journal(f"-\t{author}\n")
+            if os.path.isfile(filename):
+                os.remove(filename)
+            else:
+                LOG.warning(f"The pretrained model '{filename}' "
+                            "of the deleted author couldn't be removed.")
+
+    def compact(self):
+        """Merge the journal into the catalog file."""
+        with self.lock:
+            entries = self.read()
+            with atomic_write(self.path) as file_out:
+                for _, columns in entries:
+                    file_out.write('\t'.join(columns) + '\n')
+            if os.path.isfile(self.journal):
+                os.remove(self.journal)
+
+    def read_weights(self):
+        """Load the feature weights saved with the catalog.
+
+        Returns:
+            Optional[dict]: Maps features to their weight,
+                None if no weights have been saved.
+        """
+        with self.lock:
+            if not os.path.isfile(self.weights):
+                return None
+            with open(self.weights, 'r', encoding='utf-8') as file_in:
+                return json.load(file_in)
+
+    def write_weights(self, weights):
+        """Save the feature weights with the catalog.
+
+        Args:
+            weights(dict): Maps features to their weight.
+        """
+        with self.lock:
+            with atomic_write(self.weights) as file_out:
+                json.dump(weights, file_out, ensure_ascii=False, indent=2)
+
+    def destroy(self):
+        """Delete the catalog file, its journal and its weights."""
+        with self.lock:
+            if os.path.isfile(self.journal):
+                os.remove(self.journal)
+            if os.path.isfile(self.weights):
+                os.remove(self.weights)
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+            else:
+                LOG.warning(f"Catalog file '{self.path}' could not be deleted.")
+
+#################
+# private methods
+#################
+
+    def _save(self, author, profile):
+        """Save a profile next to the catalog under a new filename."""
+        filepath = os.path.join(os.path.dirname(self.path), author)
+        if os.path.isfile(filepath + ".json"):
+            i = 2
+            while os.path.isfile(filepath + f"({i}).json"):
+                i += 1
+            filepath = filepath + f"({i})"
+        profile.write_json(filepath + ".json")
+        return filepath + ".json"
+
+    def _read_journal(self):
+        """Split the journal into its columns."""
+        if not os.path.isfile(self.journal):
+            return []
+        with open(self.journal, 'r', encoding='utf-8') as file_in:
+            lines = [line.rstrip('\n').split('\t') for line in file_in]
+        # a line might be incomplete if a process was killed while writing it
+        return [line for line in lines if (line[0] == '+' and len(line) == 3)
+                or (line[0] == '-' and len(line) == 2)]
+
+    def _append_journal(self, line):
+        """Append a line to the journal and compact it if it got too long."""
+        if os.path.isfile(self.journal) and os.path.getsize(self.journal) > 0:
+            with open(self.journal, 'rb') as file_in:
+                file_in.seek(-1, os.SEEK_END)
+                if file_in.read(1) != b'\n':
+                    line = '\n' + line  # terminate a line left incomplete by a killed process
+        with open(self.journal, 'a', encoding='utf-8') as file_out:
+            file_out.write(line)
+            file_out.flush()
+            os.fsync(file_out.fileno())
+        if len(self._read_journal()) >= self.compact_after:
+            self.compact()
+
+
+class SqliteCatalog:
+    """Catalog saved as a single SQLite database.
+
+    Every profile is stored as rows of the form
+    (profile, category, feature, count), the categories being
+    numbered in the order of <AuthorModel.to_list>. An index over
+    the features allows to query e.g. all authors using a word.
+    Every change is a single transaction, so the database is never
+    left with a partially written profile and several processes can
+    share the catalog. Entries are referenced by the author's name.
+    The feature weights of the catalog are kept in a table of settings.
+
+    Args:
+        path(str): Filename of the database.
+        timeout(float): Seconds to wait for another process
+            to finish its transaction.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,
+            author TEXT NOT NULL UNIQUE,
+            mtld REAL NOT NULL,
+            meta TEXT);
+        CREATE TABLE IF NOT EXISTS features (
+            profile INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            category INTEGER NOT NULL,
+            feature NOT NULL,  -- no type affinity, keeps integer keys as integers
+            count INTEGER NOT NULL,
+            PRIMARY KEY (profile, category, feature)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS features_by_name ON features (category, feature);
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL);
+        """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+
+    def exists(self):
+        """Whether the database file exists."""
+        return os.path.isfile(self.path)
+
+    def create(self):
+        """Create an empty catalog."""
+        with self._connect() as connection:
+            connection.executescript(self.SCHEMA)
+
+    def read(self):
+        """List the entries of the catalog.
+
+        Returns:
+            list<tuple>: Pairs of the location of an entry (e.g. 'row 3')
+                and its columns, the author name and its reference.
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT id, author FROM profiles ORDER BY id").fetchall()
+        return [(f"row {row_id}", [author, author]) for row_id, author in rows]
+
+    def authors(self):
+        """Names of all authors in the catalog."""
+        return {columns[0] for _, columns in self.read()}
+
+    def load(self, author, model):
+        """Load a saved profile.
+
+        Args:
+            author(str): Reference of the profile, i.e. the author name.
+            model(type): Class of the profile, providing <from_list>.
+
+        Returns:
+            AuthorModel: Loaded author profile.
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT id, mtld, meta FROM profiles WHERE author = ?",
+                                     (author,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"'{self.path}' contains no profile for '{author}'.")
+            profile_id, mtld, meta = row
+            data = [dict() for _ in range(5)]
+            for category, feature, count in connection.execute(
+                    "SELECT category, feature, count FROM features WHERE profile = ?",
+                    (profile_id,)):
+                data[category][feature] = count
+        data.append(mtld)
+        if meta is not None:
+            data.append(json.loads(meta))
+        return model.from_list(data)
+
+    def add(self, author, profile):
+        """Save a profile and add it to the catalog.
+
+        Args:
+            author(str): Name of the author.
+            profile(AuthorModel): Trained author profile.
+
+        Returns:
+            str: Reference of the profile, i.e. the author name.
+        """
+        return self.add_many([(author, profile)])[0]
+
+    def add_many(self, entries):
+        """Save several profiles in a single transaction.
+
+        Either all or none of the profiles are added.
+
+        Args:
+            entries(list<tuple>): Pairs of author name and profile.
+
+        Returns:
+            list<str>: References of the profiles, i.e. the author names.
+        """
+        with self._connect() as connection:
+            for author, profile in entries:
+                data = profile.to_list()
+                meta = json.dumps(data[6]) if len(data) == 7 else None
+                try:
+                    cursor = connection.execute(
+                        "INSERT INTO profiles (author, mtld, meta) VALUES (?, ?, ?)",
+                        (author, data[5], meta))
+                except sqlite3.IntegrityError:
+                    raise CatalogError(f"An entry for '{author}' already exists.")
+                connection.executemany(
+                    "INSERT INTO features VALUES (?, ?, ?, ?)",
+                    ((cursor.lastrowid, category, feature, count)
+                     for category, distr in enumerate(data[:5])
+                     for feature, count in distr.items()))
+        return [author for author, _ in entries]
+
+    def remove(self, author, reference):
+        """Remove an author and its saved profile from the catalog.
+
+        Args:
+            author(str): Name of the author.
+            reference(str): Reference of the profile, i.e. the author name.
+        """
+        with self._connect() as connection:
+            removed = connection.execute("DELETE FROM profiles WHERE author = ?",
+                                         (reference,)).rowcount
+        if not removed:
+            LOG.warning(f"The pretrained model of the deleted author '{author}' "
+                        "couldn't be removed.")
+
+    def compact(self):
+        """Free the space of removed profiles."""
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            connection.execute("VACUUM")
+        finally:
+            connection.close()
+
+    def read_weights(self):
+        """Load the feature weights saved with the catalog.
+
+        Returns:
+            Optional[dict]: Maps features to their weight,
+                None if no weights have been saved.
+        """
+        with self._connect() as connection:
+            # databases created before settings existed lack the table
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                                  "AND name = 'settings'").fetchone() is None:
+                return None
+            row = connection.execute("SELECT value FROM settings WHERE name = 'weights'"
+                                     ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def write_weights(self, weights):
+        """Save the feature weights with the catalog.
+
+        Args:
+            weights(dict): Maps features to their weight.
+        """
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS settings "
+                               "(name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            connection.execute("INSERT OR REPLACE INTO settings VALUES ('weights', ?)",
+                               (json.dumps(weights, ensure_ascii=False),))
+
+    def destroy(self):
+        """Delete the database file."""
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        else:
+            LOG.warning(f"Catalog file '{self.path}' could not be deleted.")
+
+#################
+# private methods
+#################
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection running a single transaction.
+
+        The transaction is committed if no exception occurs,
+        otherwise it is rolled back.
+        """
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            connection.execute("PRAGMA foreign_keys = ON")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+def open_catalog(path):
+    """Choose the storage backend by the file extension of a catalog.
+
+    Args:
+        path(str): Filename of the catalog. Files ending on
+            .db, .sqlite or .sqlite3 are SQLite databases,
+            all others tab-separated catalogs.
+
+    Returns:
+        TsvCatalog|SqliteCatalog: Storage of the catalog.
+    """
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        return SqliteCatalog(path)
+    return TsvCatalog(path)
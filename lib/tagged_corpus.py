@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Persisted results of tokenization, pos tagging and lemmatization.
+
+A tagged corpus is a directory holding one file per tagged text and
+a vocabulary shared by all of them. Each file consists of a json
+header line followed by four columns of integer ids:
+    - offsets: index of the first token of every sentence,
+      followed by the total number of tokens
+    - tokens, tags, lemmas: position of the token, its pos tag
+      and its lemma in the vocabulary
+Profiles can be rebuilt from these columns without tagging the
+text again, e.g. after changing the list of frequent words.
+"""
+
+from array import array
+import hashlib
+import json
+import os
+
+from lib.storage import FileLock, atomic_write
+
+
+VOCABULARY = "vocabulary.txt"
+COLUMNS = ("offsets", "tokens", "tags", "lemmas")
+
+
+class TaggedText:
+    """Tokens, pos tags and lemmas of a text as columns of ids.
+
+    Attributes:
+        words(list<str>): Vocabulary the ids refer to.
+        offsets(array): Index of the first token of every
+            sentence, followed by the total number of tokens.
+        tokens(array)
+        tags(array)
+        lemmas(array)
+    """
+    def __init__(self, words, offsets, tokens, tags, lemmas):
+        self.words = words
+        self.offsets = offsets
+        self.tokens = tokens
+        self.tags = tags
+        self.lemmas = lemmas
+
+    def __len__(self):
+        """Number of sentences."""
+        return len(self.offsets) - 1
+
+
+class TaggedCorpus:
+    """Directory of tagged texts sharing one vocabulary.
+
+    The vocabulary only ever grows, so the ids of texts tagged
+    earlier stay valid. Several processes can add texts to
+    the same directory at the same time.
+
+    Args:
+        directory(str): Created if it does not exist yet.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.words = []
+        self._ids = dict()  # maps words to their position in the vocabulary
+        self._lock = FileLock(os.path.join(directory, VOCABULARY + ".lock"))
+        self._load_vocabulary()
+
+    def get(self, source):
+        """Load the tagged version of a text.
+
+        Args:
+            source(str): Path to the text.
+
+        Returns:
+            Optional[TaggedText]: None if the text has not been
+                tagged yet or has been changed since.
+        """
+        path = self._path(source)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(source)
+        with open(path, 'rb') as file_in:
+            header = json.loads(file_in.readline())
+            if (header["size"], header["mtime_ns"], header["itemsize"]) \
+                    != (stat.st_size, stat.st_mtime_ns, array('L').itemsize):
+                return None
+            columns = []
+            for name in COLUMNS:
+                column = array('L')
+                column.fromfile(file_in, header[name])
+                columns.append(column)
+        if header["vocabulary"] > len(self.words):  # added by another process
+            self._load_vocabulary()
+        return TaggedText(self.words, *columns)
+
+    def record(self, source, sentences):
+        """Pass sentences through while saving them as tagged version of a text.
+
+        Args:
+            source(str): Path to the text the sentences belong to.
+            sentences(iterable): Every sentence of the text as list of
+                items with the attributes text, tag and lemma,
+                e.g. as yielded by <AuthorModel._nlp>.
+
+        Yields:
+            The sentences unchanged. The tagged text is only saved
+            once all of them have been consumed.
+        """
+        stat = os.stat(source)  # taken first, so changes while tagging are noticed
+        local = dict()  # shared ids are only assigned once the text is complete
+        offsets = array('L', [0])
+        tokens, tags, lemmas = array('L'), array('L'), array('L')
+        for sent in sentences:
+            for word in sent:
+                tokens.append(local.setdefault(word.text, len(local)))
+                tags.append(local.setdefault(word.tag, len(local)))
+                lemmas.append(local.setdefault(word.lemma, len(local)))
+            offsets.append(len(tokens))
+            yield sent
+        with self._lock:
+            self._load_vocabulary()
+            new = [word for word in local if word not in self._ids]
+            if new:
+                for word in new:
+                    self._ids[word] = len(self.words)
+                    self.words.append(word)
+                with atomic_write(os.path.join(self.directory, VOCABULARY)) as file_out:
+                    file_out.writelines(word + '\n' for word in self.words)
+            vocabulary = len(self.words)
+        # local ids are the positions in <local>, which keeps the insertion order
+        shared = array('L', (self._ids[word] for word in local))
+        for column in (tokens, tags, lemmas):
+            column[:] = array('L', map(shared.__getitem__, column))
+        header = {"source": os.path.abspath(source), "size": stat.st_size,
+                  "mtime_ns": stat.st_mtime_ns, "itemsize": array('L').itemsize,
+                  "vocabulary": vocabulary, "offsets": len(offsets), "tokens": len(tokens),
+                  "tags": len(tags), "lemmas": len(lemmas)}
+        with atomic_write(self._path(source), 'wb') as file_out:
+            file_out.write(json.dumps(header).encode('utf-8') + b'\n')
+            for column in (offsets, tokens, tags, lemmas):
+                column.tofile(file_out)
+
+#################
+# private methods
+#################
+
+    def _path(self, source):
+        """Filename of the tagged version of a text."""
+        digest = hashlib.sha1(os.path.abspath(source).encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self.directory, f"{os.path.basename(source)}.{digest}.tagged")
+
+    def _load_vocabulary(self):
+        """Read in the vocabulary as saved by all processes so far."""
+        path = os.path.join(self.directory, VOCABULARY)
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as file_in:
+                # a new list, so texts loaded before keep a consistent vocabulary
+                self.words = [word.rstrip('\n') for word in file_in]
+            self._ids = {word: i for i, word in enumerate(self.words)}
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Search for the feature weights of the distance on cached distances.
+
+The weighted manhattan distance of <AuthorIdent._simil> is a sum over
+the features. When only a few weights are tuned, the distance of a text
+to a profile splits into a fixed part, summed up over all other features,
+and one unweighted term per tuned feature. Both are computed once for all
+texts and profiles; the distances for any weight vector are then a single
+matrix product and thousands of weight vectors are evaluated in seconds,
+without extracting features or comparing vectors again.
+"""
+
+import itertools
+
+import numpy as np
+
+from lib.author_model import is_pruned, project
+from lib.feature_matrix import FeatureMatrix, feature_columns, manhattan
+
+
+class DistanceCache:
+    """Distances of texts to profiles split up by the tuned features.
+
+    Args:
+        known(list<dict>): Normalized feature vectors of the profiles.
+        unknown(list<dict>): Normalized feature vectors of the texts.
+        tuned(list<str>): Features whose weights are tuned.
+        weights(dict): Weights of all other features,
+            defaulting to 1 for features not included.
+
+    Attributes:
+        tuned(list<str>): Features whose weights are tuned.
+        fixed(numpy.ndarray): Distance of every text (first axis) to every
+            profile (second axis) over all features not tuned.
+        terms(numpy.ndarray): Unweighted absolute difference of every
+            text (first axis) and profile (second axis) in every
+            tuned feature (third axis).
+    """
+    # number of distances held in memory at a time
+    MAX_ELEMENTS = 2**22
+
+    def __init__(self, known, unknown, tuned, weights):
+        self.tuned = list(tuned)
+        columns = feature_columns(known + unknown)
+        for feature in self.tuned:
+            columns.setdefault(feature, len(columns))
+        vectors, texts = known, unknown
+        known = FeatureMatrix(known, columns)
+        unknown = FeatureMatrix(unknown, columns)
+        indices = [columns[feature] for feature in self.tuned]
+        fixed_weights = known.weights(weights)
+        fixed_weights[indices] = 0
+        self.fixed = manhattan(known, unknown, fixed_weights)
+        self.terms = np.abs(unknown.values[:, indices][:, np.newaxis, :]
+                            - known.values[:, indices][np.newaxis, :, :])
+        # the texts are compared to pruned profiles on the kept features only
+        for p, vector in enumerate(vectors):
+            if is_pruned(vector):
+                projected = FeatureMatrix([project(text, vector) for text in texts], columns)
+                self.fixed[:, p] = np.abs(projected.values - known.values[p]) @ fixed_weights
+                self.terms[:, p] = np.abs(projected.values[:, indices]
+                                          - known.values[p, indices])
+
+    def predictions(self, weights):
+        """Closest profile of every text for several weight vectors.
+
+        Args:
+            weights(numpy.ndarray): One row per weight vector,
+                one column per tuned feature.
+
+        Returns:
+            numpy.ndarray: Index of the closest profile for every
+                weight vector (first axis) and text (second axis).
+                Of several equally close profiles the first is chosen,
+                like <AuthorIdent._rank> does.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=float))
+        closest = np.empty((len(weights), len(self.fixed)), dtype=int)
+        step = max(1, self.MAX_ELEMENTS // max(1, self.fixed.size))
+        for start in range(0, len(weights), step):
+            distances = self.fixed + np.einsum("upk,wk->wup", self.terms,
+                                               weights[start:start+step])
+            closest[start:start+step] = distances.argmin(axis=2)
+        return closest
+
+    def accuracy(self, weights, gold):
+        """Fraction of correctly classified texts for several weight vectors.
+
+        Args:
+            weights(numpy.ndarray): See <predictions>.
+            gold(list<int>): Index of the true profile of every text.
+
+        Returns:
+            numpy.ndarray: Accuracy of every weight vector.
+        """
+        return (self.predictions(weights) == np.asarray(gold)).mean(axis=1)
+
+
+def grid(values):
+    """Weight vectors of a grid search.
+
+    Args:
+        values(list<list<float>>): Candidate weights of every tuned feature.
+
+    Returns:
+        numpy.ndarray: Every combination of the candidates, one per row.
+    """
+    return np.array(list(itertools.product(*values)), dtype=float).reshape(-1, len(values))
+
+
+def random_weights(center, n, spread=10.0, seed=0):
+    """Weight vectors of a random search.
+
+    Every weight is drawn log-uniformly between <center>/<spread>
+    and <center>*<spread>, weights of 0 are drawn around 1 instead.
+
+    Args:
+        center(list<float>): Weight of every tuned feature
+            around which is searched.
+        n(int): Number of weight vectors.
+        spread(float): Factor by which the weights deviate at most.
+        seed(int): Seed of the random generator.
+
+    Returns:
+        numpy.ndarray: One weight vector per row.
+    """
+    center = np.asarray(center, dtype=float)
+    center = np.where(center > 0, center, 1.0)
+    exponents = np.random.RandomState(seed).uniform(-1, 1, (n, len(center)))
+    return center * spread**exponents
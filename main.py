@@ -17,8 +17,13 @@ import logging.config
 import os
 import sys
 
-from lib.author_ident import AuthorIdent
-from lib.author_model import AuthorModel
+from lib.author_ident import METRICS, AuthorIdent, read_manifest
+from lib.author_model import FEATURES, AuthorModel
+from lib.errors import log_exception
+from lib.instrumentation import ENV_VAR, TIMER
+from lib.progress import TqdmProgress, set_progress
+from lib.sharding import ShardedAuthorIdent
+from lib.storage import open_catalog
 
 
 LOG = logging.getLogger(__name__)
@@ -37,23 +42,80 @@ def configure_parser():
         description="Manage author profiles and perform authorship attribution.",
         epilog="Source files need to be preprocessed, containing "
                "one sentence per line and a space between tokens.")
+    parser.add_argument('--authors', nargs='+', metavar="AUTHOR",
+                        help="Use with --catalog to load only the profiles "
+                             "of the given authors.")
     parser.add_argument('--catalog', nargs=1, metavar="CATALOG",
                         help="Path to a file containing lines of the form "
-                             r"<author>\t<pretrained model json-filename> .")
+                             r"<author>\t<pretrained model json-filename> "
+                             "or to a SQLite database ending on .db, .sqlite or .sqlite3 .")
+    parser.add_argument('--chunk-size', type=int, default=500, metavar="N",
+                        help="Use with --early-exit to compare the text read so far "
+                             "to the profiles after every N sentences. Default is 500.")
     parser.add_argument('--classify', nargs=1, metavar="SOURCE",
                         help="Return the most likely author for the given text.")
     parser.add_argument("--destroy", action="store_true",
                         help="Delete a catalog and its content.")
+    parser.add_argument('--early-exit', type=float, metavar="MARGIN",
+                        help="Use with --classify to stop reading the source as soon "
+                             "as the best match leads the runner-up by MARGIN "
+                             "(relative difference, e.g. 0.1) in several consecutive "
+                             "comparisons (see --patience). Can't be combined with "
+                             "--max-tokens, --sample-rate or --jobs.")
+    parser.add_argument('--features', nargs='+', choices=FEATURES, metavar="FAMILY",
+                        help="Use with --train or --train-manifest to only extract "
+                             f"the given feature families ({', '.join(FEATURES)}).")
     parser.add_argument('--forget', nargs=1, metavar="AUTHOR",
                         help="Delete class from classifier.")
+    parser.add_argument('--jobs', type=int, default=1, metavar="N",
+                        help="Use with --train, --train-manifest or --classify to "
+                             "extract features with N processes. Default is 1.")
+    parser.add_argument('--max-tokens', type=int, metavar="N",
+                        help="Use with --train, --train-manifest or --classify to process "
+                             "at most N tokens per file, sampled evenly from the whole file.")
+    parser.add_argument('--metric', choices=METRICS, default="manhattan",
+                        help="Use with --classify to compare the profiles with the weighted "
+                             "manhattan distance (default), Burrows' Delta, the manhattan "
+                             "distance of z-scores or Cosine Delta. The z-scores are taken "
+                             "over all loaded profiles. Can't be combined with --shards.")
+    parser.add_argument('--min-count', type=int, metavar="N",
+                        help="Use with --train or --train-manifest to drop pos trigrams, "
+                             "frequent words and punctuation marks observed less than N times.")
+    parser.add_argument('--patience', type=int, default=3, metavar="N",
+                        help="Use with --early-exit to stop once the same author has led "
+                             "by MARGIN in N consecutive comparisons. Default is 3.")
     parser.add_argument('--preprocess', nargs=2, metavar=("FILENAME", "GOAL"),
                         help="Preprocess a raw txt-file.")
+    parser.add_argument('--sample-rate', type=float, metavar="RATE",
+                        help="Use with --train, --train-manifest or --classify to process "
+                             "only the given fraction of sentences per file.")
+    parser.add_argument('--shards', type=int, metavar="N",
+                        help="Use with --catalog to distribute the profiles over "
+                             "N worker processes.")
+    parser.add_argument('--tagged', metavar="DIRECTORY",
+                        help="Use with --train or --train-manifest to save the tagged texts "
+                             "in DIRECTORY and reuse them instead of tagging them again.")
     parser.add_argument('--test', help="Run all unittests.", action="store_true")
+    parser.add_argument('--timings', metavar="FILENAME",
+                        help="Measure the time spent per processing stage and save it to "
+                             "FILENAME, as json if it ends on .json and in the Prometheus "
+                             f"text format otherwise. Can also be set with ${ENV_VAR}.")
+    parser.add_argument('--top-k', type=int, metavar="K",
+                        help="Use with --train or --train-manifest to keep only the K most "
+                             "frequent pos trigrams, frequent words and punctuation marks.")
     parser.add_argument('--train', nargs=2, metavar=("AUTHOR", "SOURCE"),
                         help="Add new class to classifier.")
+    parser.add_argument('--train-manifest', nargs=1, metavar="MANIFEST",
+                        help="Add all classes listed in MANIFEST (lines of the form "
+                             r"<author>\t<source> or json objects in a .jsonl-file) "
+                             "to the classifier at once.")
     parser.add_argument('--verbosity', type=int, choices=[0, 1, 2], default=1,
                         help="Adjust the amount of output (0=errors, 1=warnings "
                              "and above, 2=info and above). Default is 1.")
+    parser.add_argument('--weights', nargs=1, metavar="FILENAME",
+                        help="Use with --catalog to save the feature weights of the distance "
+                             "given in FILENAME (a json object mapping features to weights, "
+                             "e.g. created by scripts/tune_weights.py) with the catalog.")
     return parser
 
 
@@ -66,6 +128,7 @@ def configure_logging(verbosity):
         logging.config.dictConfig(setting)
 
 
+@log_exception(LOG)
 def execute_commands(args):
     """Access the addressed methods from AuthorModel and AuthorIdent."""
     # test target
@@ -77,23 +140,51 @@ def execute_commands(args):
     if args.preprocess:
         AuthorModel.preprocess(*args.preprocess)
     if args.catalog:
-        try:
-            classifier = AuthorIdent(*args.catalog)
-        except FileNotFoundError:
+        storage = open_catalog(*args.catalog)
+        if not storage.exists():
             answer = None
             while answer not in {'y', 'n'}:
                 answer = input("Catalog not found. Do you want to create the catalog? y/n\n")
                 if answer == 'y':
                     LOG.info(f"Create new classifier with the catalog '{args.catalog[0]}'...")
-                    with open(*args.catalog, 'w', encoding='utf-8'):
-                        pass
+                    storage.create()
                 elif answer == 'n':
                     return
+        if args.shards:
+            if args.metric != "manhattan":
+                parser.error("--metric can't be combined with --shards.")
+            classifier = ShardedAuthorIdent(*args.catalog, shards=args.shards,
+                                            authors=args.authors)
+        else:
+            classifier = AuthorIdent(*args.catalog, authors=args.authors, metric=args.metric)
+    if args.weights:  # before classifying, so the new weights are already used
+        if not args.catalog:
+            parser.error("--weights requires --catalog.")
+        else:
+            with open(*args.weights, 'r', encoding='utf-8') as file_in:
+                classifier.set_weights(json.load(file_in))
     if args.classify:
         if not args.catalog:
             parser.error("--classify requires --catalog.")
+        elif args.early_exit is not None:
+            # the text is read sequentially in a single process
+            for option, value in [("--max-tokens", args.max_tokens),
+                                  ("--sample-rate", args.sample_rate)]:
+                if value is not None:
+                    parser.error(f"--early-exit can't be combined with {option}.")
+            if args.jobs != 1:
+                parser.error("--early-exit can't be combined with --jobs.")
+            result, consumed = classifier.classify_early_exit(*args.classify,
+                                                              margin=args.early_exit,
+                                                              chunk_size=args.chunk_size,
+                                                              patience=args.patience)
+            LOG.info(f"{args.classify[0]} classified as '{result}' "
+                     f"after reading {consumed:.2%} of the text.")
+            if args.verbosity < 2:
+                print(result)
         else:
-            result = classifier.classify(*args.classify)
+            result = classifier.classify(*args.classify, max_tokens=args.max_tokens,
+                                         sample_rate=args.sample_rate, jobs=args.jobs)
             LOG.info(f"{args.classify[0]} classified as '{result}'.")
             if args.verbosity < 2:
                 print(result)
@@ -111,7 +202,20 @@ def execute_commands(args):
         if not args.catalog:
             parser.error("--train requires --catalog.")
         else:
-            classifier.train(*args.train)
+            classifier.train(*args.train, max_tokens=args.max_tokens,
+                             sample_rate=args.sample_rate, top_k=args.top_k,
+                             min_count=args.min_count, jobs=args.jobs,
+                             tagged=args.tagged, features=args.features)
+    if args.train_manifest:
+        if not args.catalog:
+            parser.error("--train-manifest requires --catalog.")
+        else:
+            classifier.train_many(read_manifest(*args.train_manifest),
+                                  max_tokens=args.max_tokens, sample_rate=args.sample_rate,
+                                  top_k=args.top_k, min_count=args.min_count, jobs=args.jobs,
+                                  tagged=args.tagged, features=args.features)
+    if args.catalog and args.shards:
+        classifier.close()
 
 
 if __name__ == "__main__":
@@ -121,4 +225,18 @@ if __name__ == "__main__":
     else:
         args = parser.parse_args()
         configure_logging(args.verbosity)
+        if sys.stderr.isatty():  # no progress bars in logs of batch jobs
+            set_progress(TqdmProgress())
+        timings = args.timings or os.environ.get(ENV_VAR)
+        TIMER.enabled = bool(timings)
         execute_commands(args)
+        if timings:
+            report = TIMER.report()
+            for stage, stats in report["stages"].items():
+                LOG.info(f"{stage}: {stats['wall_seconds']:.3f}s wall, "
+                         f"{stats['cpu_seconds']:.3f}s cpu, {stats['tokens']} tokens")
+            for cache, stats in report["caches"].items():
+                if stats["hit_rate"] is not None:
+                    LOG.info(f"{cache} cache: {stats['hit_rate']:.2%} of "
+                             f"{stats['hits'] + stats['misses']} lookups hit")
+            TIMER.write(timings)
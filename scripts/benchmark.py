@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""Measure the speed of the project's hot paths."""
+
+import argparse
+import datetime
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# in order to access module from sister directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from lib.author_ident import AuthorIdent
+from lib.author_model import AuthorModel, FREQ_WRDS
+from lib.distribution import Distribution
+from lib.mtld import mtld
+from lib.storage import TsvCatalog
+
+
+LOG = logging.getLogger(__name__)
+LOG.setLevel("INFO")
+LOG.addHandler(logging.StreamHandler())
+# the project's own logging would distort the measurements
+logging.getLogger("lib").setLevel(logging.CRITICAL)
+
+# profile the synthetic catalog profiles are derived from
+PROFILE = os.path.join(ROOT, "data", "Charles Dickens.json")
+PUNCTUATION = ['.', ';', ',', '?', '!']
+# number of tokens of the text classified by the classification benchmarks
+CLASSIFY_SIZE = 2000
+
+
+def synthetic_corpus(goal, size, seed=0):
+    """Write a preprocessed text with a Zipf-like vocabulary.
+
+    The most frequent words are taken from the list of frequent
+    words the features are extracted for, followed by made-up
+    words of varying length.
+
+    Args:
+        goal(str): Location/name for the text.
+        size(int): Number of tokens.
+        seed(int): Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    with open(FREQ_WRDS, 'r', encoding='utf-8') as file_in:
+        vocab = [wrd.rstrip() for wrd in file_in]
+    vocab += ["".join(rng.choice("etaoinshrdlucmfwyp") for _ in range(rng.randint(2, 12)))
+              for _ in range(20000)]
+    weights = [1/rank for rank in range(1, len(vocab) + 1)]
+    with open(goal, 'w', encoding='utf-8') as file_out:
+        written = 0
+        while written < size:
+            sent = rng.choices(vocab, weights, k=rng.randint(3, 40))
+            for _ in range(len(sent)//8):
+                sent.insert(rng.randrange(1, len(sent)), ',')
+            sent.append(rng.choice(PUNCTUATION))
+            sent = sent[:size - written]
+            file_out.write(' '.join(sent) + '\n')
+            written += len(sent)
+
+
+def sampled_corpus(goal, size, corpus, seed=0):
+    """Write a text made up of sentences sampled from preprocessed files.
+
+    Args:
+        goal(str): Location/name for the text.
+        size(int): Number of tokens.
+        corpus(str): Directory containing preprocessed files,
+            e.g. the training directory created by split_corpus.py .
+        seed(int): Seed of the random generator.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for root, _, files in os.walk(corpus):
+        for file in files:
+            with open(os.path.join(root, file), 'r', encoding='utf-8') as file_in:
+                lines.extend(line for line in file_in if line.strip())
+    if not lines:
+        raise FileNotFoundError(f"'{corpus}' contains no sentences.")
+    with open(goal, 'w', encoding='utf-8') as file_out:
+        written = 0
+        while written < size:
+            sent = rng.choice(lines).split()[:size - written]
+            file_out.write(' '.join(sent) + '\n')
+            written += len(sent)
+
+
+def synthetic_profile(profile, rng):
+    """Derive a new profile by randomly changing the counts of another one."""
+    data = [dict(distr) for distr in profile.to_list()[:5]] + [profile.mtld]
+    for i, distr in enumerate(data[:5]):
+        for feature in list(distr):
+            # only pos trigrams and frequent words are numerous enough to drop some of them
+            if i in {2, 3} and rng.random() < 0.1:
+                del distr[feature]
+            else:
+                distr[feature] = max(1, round(distr[feature]*rng.lognormvariate(0, 0.5)))
+    data[5] *= rng.uniform(0.8, 1.2)
+    return AuthorModel.from_list(data)
+
+
+def measure(func, repeat):
+    """Call a function several times and time each call.
+
+    Returns:
+        list<float>: Seconds taken by each call.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+def run_benchmarks(size, repeat, catalog_sizes, corpus=None, only=None):
+    """Run all benchmarks on corpora and catalogs of the given sizes.
+
+    Benchmarks relying on nltk data that is not installed are skipped.
+
+    Args:
+        size(int): Number of tokens of the benchmark text.
+        repeat(int): Number of runs per benchmark.
+        catalog_sizes(list<int>): Numbers of profiles in
+            the catalogs the classification is timed for, both as
+            a whole (classify_*) and the ranking of the profiles
+            only (rank_*).
+        corpus(Optional[str]): Directory of preprocessed files to
+            sample the benchmark text from instead of generating it.
+        only(Optional[list<str>]): Names (or prefixes of names)
+            of the benchmarks to run.
+
+    Returns:
+        dict: Maps benchmark names to their results.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        text = os.path.join(tmp_dir, "text.txt")
+        # shorter text to classify, the same for all catalog sizes
+        unknown = os.path.join(tmp_dir, "unknown.txt")
+        if corpus is None:
+            synthetic_corpus(text, size)
+            synthetic_corpus(unknown, CLASSIFY_SIZE, seed=1)
+        else:
+            sampled_corpus(text, size, corpus)
+            sampled_corpus(unknown, CLASSIFY_SIZE, corpus, seed=1)
+        with open(text, 'r', encoding='utf-8') as file_in:
+            tokens = file_in.read().split()
+        profile = AuthorModel.read_json(PROFILE)
+        vector = profile.normalized_feature_vector()
+
+        def count():
+            distr = Distribution()
+            for token in tokens:
+                distr[token] += 1
+
+        def nlp():
+            for _ in AuthorModel._nlp(text):
+                pass
+
+        benchmarks = [  # triples of name, function and number of processed items
+            ("mtld", lambda: mtld(tokens), len(tokens)),
+            ("distribution_counting", count, len(tokens)),
+            ("nlp", nlp, len(tokens)),
+            ("extract_features", lambda: AuthorModel.train(text), len(tokens)),
+            ("write_json", lambda: profile.write_json(os.path.join(tmp_dir, "profile.json")), 1),
+            ("read_json", lambda: AuthorModel.read_json(PROFILE), 1),
+            ("normalized_feature_vector", profile.normalized_feature_vector, 1),
+        ]
+        for n in catalog_sizes:
+            classifier = _classifier(tmp_dir, profile, vector, n)
+            benchmarks.append((f"classify_{n}_profiles",
+                               functools.partial(classifier.classify, unknown), 1))
+            benchmarks.append((f"rank_{n}_profiles",
+                               functools.partial(classifier._rank, vector, 1), 1))
+        results = dict()
+        for name, func, items in benchmarks:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            try:
+                runs = measure(func, repeat)
+            except LookupError:
+                LOG.warning(f"Skipped '{name}'; the required nltk data is not installed.")
+                continue
+            median = statistics.median(runs)
+            results[name] = {"seconds": median, "best": min(runs), "runs": len(runs),
+                             "items": items, "per_second": items/median}
+            LOG.info(f"{name:<28}{median*1000:>12.2f} ms{items/median:>16.0f} items/s")
+        return results
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def compare(baseline, current, threshold=0.1):
+    """Flag benchmarks that got slower than in an earlier run.
+
+    Args:
+        baseline(dict): Results of the earlier run.
+        current(dict): Results of the current run.
+        threshold(float): Relative slowdown from which
+            on a benchmark counts as regressed.
+
+    Returns:
+        list<str>: Names of the regressed benchmarks.
+    """
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            LOG.info(f"{name:<28}{'new':>12}")
+            continue
+        change = result["seconds"]/baseline[name]["seconds"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        LOG.info(f"{name:<28}{change:>+12.1%}{flag}")
+    for name in baseline:
+        if name not in current:
+            LOG.info(f"{name:<28}{'missing':>12}")
+    return regressions
+
+
+#################
+# private methods
+#################
+
+def _classifier(tmp_dir, profile, vector, n):
+    """Create a classifier for n profiles.
+
+    The classifier has already ranked its profiles once,
+    so its index isn't built while a benchmark is timed.
+    """
+    catalog = os.path.join(tmp_dir, f"catalog_{n}.csv")
+    TsvCatalog(catalog).create()
+    classifier = AuthorIdent(catalog)
+    rng = random.Random(n)
+    # the profiles are only held in memory, saving them would take longer than the benchmark
+    for i in range(n):
+        classifier.profiles[f"author{i}"] = synthetic_profile(profile, rng)
+        classifier.catalog_content[f"author{i}"] = None
+    classifier._rank(vector, 1)
+    return classifier
+
+
+def _commit():
+    """Hash of the checked out commit, None outside of a git repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the speed of the project's hot paths.")
+    parser.add_argument("--output", metavar="FILENAME",
+                        help="Save the results as json-file, e.g. to compare later commits to.")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Compare the results to a json-file of an earlier run and exit "
+                             "with status 1 if any benchmark got slower.")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative slowdown counting as regression. Default is 0.1.")
+    parser.add_argument("--size", type=int, default=50000, metavar="N",
+                        help="Number of tokens of the benchmark text. Default is 50000.")
+    parser.add_argument("--repeat", type=int, default=5, metavar="N",
+                        help="Number of runs per benchmark. Default is 5.")
+    parser.add_argument("--catalog-sizes", type=int, nargs='+', default=[10, 50, 200],
+                        metavar="N", help="Numbers of profiles to time the classification "
+                                          "for. Default is 10 50 200.")
+    parser.add_argument("--corpus", metavar="DIRECTORY",
+                        help="Sample the benchmark text from the preprocessed files "
+                             "in DIRECTORY instead of generating it.")
+    parser.add_argument("--only", nargs='+', metavar="NAME",
+                        help="Only run the benchmarks whose names start with NAME.")
+    args = parser.parse_args()
+    results = run_benchmarks(args.size, args.repeat, args.catalog_sizes, args.corpus, args.only)
+    report = {"meta": {"commit": _commit(),
+                       "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "size": args.size,
+                       "corpus": args.corpus},
+              "results": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file_out:
+            json.dump(report, file_out, indent=4)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file_in:
+            baseline = json.load(file_in)
+        regressions = compare(baseline["results"], results, args.threshold)
+        if regressions:
+            LOG.warning(f"{len(regressions)} benchmark(s) got slower: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Estimate the accuracy by cross-validation on the training set."""
+
+import argparse
+import logging
+import os
+import sys
+
+# in order to access module from sister directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from lib.author_ident import read_manifest
+from lib.author_model import FEATURES
+from lib.cross_validation import cross_validate, fold_accuracy
+
+
+LOG = logging.getLogger(__name__)
+LOG.setLevel("INFO")
+LOG.addHandler(logging.StreamHandler())
+
+
+def labeled_sources(source):
+    """Pairs of author name and source.
+
+    Args:
+        source(str): Directory containing folders named like the
+            authors (e.g. 'corpus/training') or a manifest as read
+            by <lib.author_ident.read_manifest>.
+    """
+    if os.path.isfile(source):
+        return read_manifest(source)
+    return [(author, os.path.join(source, author)) for author in sorted(os.listdir(source))
+            if os.path.isdir(os.path.join(source, author))]
+
+
+def evaluate_folds(source, filename, folds=10, seed=0, **options):
+    """Cross-validate the classifier and save the classification of every file.
+
+    Accuracies per fold and in total are given out to the commandline,
+    while a csv-file is created that contains the classified files
+    together with their fold, their gold standard and the predicted class.
+
+    Args:
+        source(str): See <labeled_sources>.
+        filename(str): Name of the csv-file.
+        folds(Optional[int]): Number of folds, None for leave-one-out.
+        seed(int): Seed for distributing the files over the folds.
+        options: Passed on to <lib.cross_validation.cross_validate>.
+    """
+    predictions = cross_validate(labeled_sources(source), folds=folds, seed=seed, **options)
+    with open(filename, 'w', encoding='utf-8') as eval_file:
+        eval_file.write("fold\tfile_id\tgold\tprediction\n")
+        for p in predictions:
+            eval_file.write(f"{p.fold}\t{os.path.basename(p.file)}\t{p.gold}\t{p.prediction}\n")
+    # folds whose files were all skipped have no accuracy
+    accuracies = {fold: fold_accuracy(predictions, fold)
+                  for fold in sorted({p.fold for p in predictions})}
+    if folds is not None:
+        for fold, accuracy in accuracies.items():
+            LOG.info("Accuracy of fold {}: {:.2%}".format(fold, accuracy))
+        LOG.info("Mean Accuracy of the folds: {:.2%}".format(
+            sum(accuracies.values())/len(accuracies)))
+    LOG.info("Total Accuracy: {:.2%}".format(fold_accuracy(predictions)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate the accuracy by cross-validation "
+                                                 "without training the profiles per fold.")
+    parser.add_argument("source", metavar="SOURCE",
+                        help="Directory containing a folder per author (e.g. the 'training' "
+                             "folder created by splitting the data) or a manifest file.")
+    parser.add_argument("filename", metavar="FILENAME", help="Where to save the results.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--folds", type=int, default=10, metavar="K",
+                       help="Number of folds. Default is 10.")
+    group.add_argument("--leave-one-out", action="store_true",
+                       help="Classify every file with the profiles of all other files.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for distributing the files over the folds.")
+    parser.add_argument("--features", nargs='+', choices=FEATURES, metavar="FAMILY",
+                        help="Only extract the given feature families.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Extract features with N processes.")
+    parser.add_argument("--max-tokens", type=int, metavar="N",
+                        help="Process at most N tokens per file.")
+    parser.add_argument("--sample-rate", type=float, metavar="RATE",
+                        help="Process only the given fraction of sentences per file.")
+    parser.add_argument("--tagged", metavar="DIRECTORY",
+                        help="Save the tagged texts in DIRECTORY and reuse them.")
+    args = parser.parse_args()
+    evaluate_folds(args.source, args.filename, None if args.leave_one_out else args.folds,
+                   args.seed, max_tokens=args.max_tokens, sample_rate=args.sample_rate,
+                   jobs=args.jobs, tagged=args.tagged, features=args.features)
@@ -10,6 +10,7 @@
 # Windows 8
 """Calculate the accuracy over the test set."""
 
+import argparse
 import logging
 import os
 import sys
@@ -20,7 +21,7 @@ from tqdm import tqdm
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT)
 
-from lib.author_ident import AuthorIdent
+from lib.author_ident import METRICS, AuthorIdent
 
 
 LOG = logging.getLogger(__name__)
@@ -28,13 +29,18 @@ LOG.setLevel("INFO")
 LOG.addHandler(logging.StreamHandler())
 
 
-def evaluate(catalog, filename, test_dir):
+def evaluate(catalog, filename, test_dir, top_k=None, min_count=None, metric="manhattan"):
     """Evaluate the accuracy of a trained system.
 
     Accuracies for the whole system and single authors are given
     out to the commandline, while a csv-file is created that
     contains classified files together with their gold standard
     and the predicted class.
+    If <top_k> or <min_count> are given, the loaded profiles are
+    pruned (see AuthorModel.prune) before the evaluation, which
+    allows to assess the effect of pruning without retraining.
+    The test files are compared to every pruned profile on the
+    features kept by it, like texts classified with a pruned catalog.
 
     Args:
         catalog(str): Path to a catalog file created
@@ -43,17 +49,37 @@ def evaluate(catalog, filename, test_dir):
         test_dir(str): Path to a directory (i.e. called 'test')
             that contains folders named like the classes the
             given classifier is trained for that contain
-            files belonging to this class.
+            files belonging to this class. Files rejected by
+            AuthorIdent.check are skipped.
+        top_k(Optional[int]): Number of most frequent features
+            to keep per category.
+        min_count(Optional[int]): Minimum count of a feature to be kept.
+        metric(str): Distance between profiles, see <AuthorIdent>.
     """
     with open(filename, 'w', encoding='utf-8') as eval_file:
         eval_file.write("file_id\tgold\tprediction\n")
-        classifer = AuthorIdent(catalog)
+        classifer = AuthorIdent(catalog, metric=metric)
+        if top_k is not None or min_count is not None:
+            before = sum(len(pr.normalized_feature_vector()) for pr in classifer.profiles.values())
+            for profile in classifer.profiles.values():
+                profile.prune(top_k, min_count)
+            after = sum(len(pr.normalized_feature_vector()) for pr in classifer.profiles.values())
+            LOG.info(f"Pruned profiles (top_k={top_k}, min_count={min_count}) "
+                     f"from {before} to {after} features in total.")
+        # texts that can't be classified are reported at once instead of failing midway
+        rejected = classifer.check(os.path.join(test_dir, author, file)
+                                   for author in os.listdir(test_dir)
+                                   for file in os.listdir(os.path.join(test_dir, author)))
+        for source, reasons in rejected.items():
+            LOG.warning(f"Skipped '{source}': {' '.join(reasons)}")
         correct = 0
         total = 0
         for author in tqdm(os.listdir(test_dir), leave=False):
             correct_author = 0
             total_author = 0
-            for file in tqdm(os.listdir(os.path.join("corpus", "test", author)), leave=False):
+            for file in tqdm(os.listdir(os.path.join(test_dir, author)), leave=False):
+                if os.path.join(test_dir, author, file) in rejected:
+                    continue
                 result = classifer.classify(os.path.join(test_dir, author, file))
                 if result == author:
                     correct += 1
@@ -61,19 +87,28 @@ def evaluate(catalog, filename, test_dir):
                 total += 1
                 total_author += 1
                 eval_file.write(f"{file}\t{author}\t{result}\n")
-            LOG.info("Accuracy for {}: {:.2%}".format(author, correct_author/total_author))
-        LOG.info("Total Accuracy: {:.2%}".format(correct/total))
+            if total_author:
+                LOG.info("Accuracy for {}: {:.2%}".format(author, correct_author/total_author))
+        if rejected:
+            LOG.info(f"Skipped {len(rejected)} inappropriate file(s).")
+        if total:
+            LOG.info("Total Accuracy: {:.2%}".format(correct/total))
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        LOG.error("Wrong number of commandline arguments.\n")
-        LOG.info("Synopsis:")
-        LOG.info("$ python scripts\\evaluate.py CATALOG FILENAME TEST_DIRECTORY\n")
-        LOG.info("CATALOG         Path to the csv-file containing lines of the\n"
-                 "                form <author>\\t<pretrained model JSON-filepath>\n"
-                 "                created by AuthorIdent.")
-        LOG.info("FILENAME        Where to save the results.")
-        LOG.info("TEST_DIRECTORY  Path to the 'test' folder created by splitting the data.")
-    else:
-        evaluate(*sys.argv[1:])
+    parser = argparse.ArgumentParser(description="Calculate the accuracy over the test set.")
+    parser.add_argument("catalog", metavar="CATALOG",
+                        help="Path to the csv-file containing lines of the form "
+                             r"<author>\t<pretrained model JSON-filepath> created by AuthorIdent.")
+    parser.add_argument("filename", metavar="FILENAME", help="Where to save the results.")
+    parser.add_argument("test_dir", metavar="TEST_DIRECTORY",
+                        help="Path to the 'test' folder created by splitting the data.")
+    parser.add_argument("--top-k", type=int, metavar="K",
+                        help="Prune the profiles to the K most frequent pos trigrams, "
+                             "frequent words and punctuation marks before evaluating.")
+    parser.add_argument("--min-count", type=int, metavar="N",
+                        help="Prune features observed less than N times before evaluating.")
+    parser.add_argument("--metric", choices=METRICS, default="manhattan",
+                        help="Distance between the profiles. Default is manhattan.")
+    args = parser.parse_args()
+    evaluate(args.catalog, args.filename, args.test_dir, args.top_k, args.min_count, args.metric)
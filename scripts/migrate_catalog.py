@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Copy all profiles of a catalog into a catalog of another format."""
+
+import argparse
+import logging
+import os
+import sys
+
+# in order to access module from sister directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from lib.author_model import AuthorModel
+from lib.storage import open_catalog
+
+
+LOG = logging.getLogger(__name__)
+LOG.setLevel("INFO")
+LOG.addHandler(logging.StreamHandler())
+
+
+def migrate(source, goal):
+    """Copy all profiles from one catalog into another.
+
+    The backend of both catalogs is chosen by their file
+    extension (see storage.open_catalog), e.g. a tab-separated
+    catalog with its json-files can be moved into a SQLite
+    database by passing a goal ending on .db . Entries of the
+    source catalog that can't be loaded are skipped.
+    The source catalog is left untouched.
+
+    Args:
+        source(str): Path to an existing catalog.
+        goal(str): Path to the new catalog. It is created if it
+            doesn't exist yet and must not contain any of the
+            source's authors.
+
+    Returns:
+        int: Number of copied profiles.
+    """
+    source_storage = open_catalog(source)
+    if not source_storage.exists():
+        raise FileNotFoundError(f"The catalog '{source}' does not exist.")
+    entries = []
+    for location, columns in source_storage.read():
+        if len(columns) != 2:
+            LOG.warning(f"Skipped {location}; missing column.")
+            continue
+        author, reference = columns
+        try:
+            entries.append((author, source_storage.load(reference, AuthorModel)))
+        except FileNotFoundError:
+            LOG.warning(f"Skipped {location}; could not open '{reference}'.")
+    goal_storage = open_catalog(goal)
+    if not goal_storage.exists():
+        goal_storage.create()
+    goal_storage.add_many(entries)
+    LOG.info(f"Copied {len(entries)} profiles from '{source}' to '{goal}'.")
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Copy all profiles of a catalog into a catalog of another format.")
+    parser.add_argument("source", metavar="SOURCE", help="Path to the existing catalog.")
+    parser.add_argument("goal", metavar="GOAL",
+                        help="Path to the new catalog, e.g. ending on .db to "
+                             "create a SQLite database.")
+    args = parser.parse_args()
+    migrate(args.source, args.goal)
@@ -10,9 +10,12 @@
 # Windows 8
 """Split and preprocess the Gutenberg corpus content."""
 
+import argparse
 import json
 import logging
+import multiprocessing
 import os
+import shutil
 import sys
 
 from tqdm import tqdm
@@ -22,6 +25,7 @@ ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(ROOT)
 
 from lib.author_model import AuthorModel
+from lib.split_planner import REMAINDER, plan_split, read_manifest, write_manifest
 
 
 LOG = logging.getLogger(__name__)
@@ -31,75 +35,114 @@ LOG.addHandler(logging.StreamHandler())
 with open(os.path.join(ROOT, "data", "author_config.json"), 'r', encoding='utf-8') as file_in:
     AUTHORS = json.load(file_in)
 
+CORPUS = "corpus"
+# split plan, written before any book is preprocessed
+MANIFEST = os.path.join(CORPUS, "manifest.json")
+# books being preprocessed, kept apart from the author folders read for training
+PARTIAL = os.path.join(CORPUS, ".partial")
 
-# function to minimize: difference between sum of subset and goal value
-# as this problem is NP-complete we reduce it by looking only at sums of
-# slices (=consecutive values)
-def opt_slice(array, goal):
-    best_slice = (float("inf"), None, None)
-    for start in range(len(array)):
-        for end in range(start, len(array)):
-            diff = abs(sum(array[start:end + 1]) - goal)
-            if diff < best_slice[0]:
-                best_slice = (diff, start, end + 1)
-    return best_slice[1:]
-
-
-# filter relevant authors, split them into the three parts
-# validation, test and training and preprocess them
-def preprocess_gutenberg(source):
-    # create directories
-    os.mkdir("corpus")
-    os.mkdir(os.path.join("corpus", "test"))
-    os.mkdir(os.path.join("corpus", "training"))
-    # os.mkdir(os.path.join("corpus", "validation"))
 
+# filter relevant authors and assign their books
+# to the parts validation, test and training
+def plan_gutenberg(source, validation=0.1, test=0.2, subset_sum=False, keep_validation=False):
     # create mapping of each author to their books
     data = {author: [] for author in AUTHORS}
     for filename in os.listdir(os.path.join(source, "txt")):
         author, *title = filename.split("___")
         if author in data:
             data[author].append(filename)
-    for author in tqdm(data):
+    books = []
+    for author in data:
         if len(data[author]) < 3:
-            LOG.warning(f"\n'{author}' skipped. Make sure to include at least 3 books per author.")
+            LOG.warning(f"'{author}' skipped. Make sure to include at least 3 books per author.")
             continue
-        os.mkdir(os.path.join("corpus", "test", author))
-        os.mkdir(os.path.join("corpus", "training", author))
-        # os.mkdir(os.path.join("corpus", "validation", author))
-        books = sorted(data[author])
-        sizes = [os.path.getsize(os.path.join(source, "txt", book)) for book in books]
-        val = opt_slice(sizes, sum(sizes)*0.1)
+        titles = sorted(data[author])
+        sizes = [os.path.getsize(os.path.join(source, "txt", book)) for book in titles]
         # books included in the validation set can not be included in the test set
-        # their size is set to zero for them not to be used to get any closer to goal value
-        test = opt_slice(
-            sizes[:val[0]] + [0]*(val[1]-val[0]) + sizes[val[1]:],
-            sum(sizes)*0.2
-        )
-        for i, book in enumerate(tqdm(books, leave=False)):
-            if i in range(*val):
+        parts = plan_split(sizes, [("validation", validation), ("test", test)], subset_sum)
+        books.extend({"author": author, "book": book, "part": part}
+                     for book, part in zip(titles, parts))
+    return {"source": os.path.abspath(source),
+            "ratios": {"validation": validation, "test": test},
+            "subset_sum": subset_sum,
+            # the validation books are held out, but not needed by the project
+            "preprocess": ["validation", "test", REMAINDER] if keep_validation
+                          else ["test", REMAINDER],
+            "books": books}
+
+
+# preprocess all books of the plan not preprocessed yet
+def preprocess_manifest(manifest, jobs=1):
+    # books left unfinished by an interrupted run are started over
+    shutil.rmtree(PARTIAL, ignore_errors=True)
+    os.makedirs(PARTIAL)
+    todo = []
+    for entry in manifest["books"]:
+        if entry["part"] not in manifest["preprocess"]:
+            continue
+        goal = os.path.join(CORPUS, entry["part"], entry["author"], entry["book"])
+        # earlier versions kept unfinished books next to the finished ones
+        if os.path.isfile(goal + ".part"):
+            os.remove(goal + ".part")
+        if not os.path.isfile(goal):
+            os.makedirs(os.path.dirname(goal), exist_ok=True)
+            todo.append((os.path.join(manifest["source"], "txt", entry["book"]), goal))
+    LOG.info(f"{len(todo)} books left to preprocess.")
+    if jobs > 1:
+        with multiprocessing.Pool(jobs) as pool:
+            for _ in tqdm(pool.imap_unordered(preprocess_book, todo), total=len(todo)):
                 pass
-                # AuthorModel.preprocess(os.path.join(source, "txt", book),
-                #                        os.path.join("corpus", "validation", author, book))
-            elif i in range(*test):
-                AuthorModel.preprocess(os.path.join(source, "txt", books[i]),
-                                       os.path.join("corpus", "test", author, book))
-            else:
-                AuthorModel.preprocess(os.path.join(source, "txt", book),
-                                       os.path.join("corpus", "training", author, book))
+    else:
+        for job in tqdm(todo):
+            preprocess_book(job)
+    os.rmdir(PARTIAL)
+
+
+# a book only gets its final name once it is completely preprocessed,
+# so an interrupted run can be resumed
+def preprocess_book(job):
+    source, goal = job
+    partial = os.path.join(PARTIAL, os.path.basename(goal))
+    AuthorModel.preprocess(source, partial)
+    os.replace(partial, goal)
 
 
 if __name__ == "__main__":
-    if os.path.isdir("corpus"):
+    parser = argparse.ArgumentParser(
+        description="Split and preprocess the Gutenberg corpus content. An interrupted "
+                    f"run is resumed from the plan in '{MANIFEST}'.")
+    parser.add_argument("source", nargs='?', metavar="PATH_TO_UNZIPPED_GUTENBERG")
+    parser.add_argument("--validation", type=float, default=0.1, metavar="RATIO",
+                        help="Fraction of each author's text held out for validation. "
+                             "Default is 0.1.")
+    parser.add_argument("--test", type=float, default=0.2, metavar="RATIO",
+                        help="Fraction of each author's text used for testing. "
+                             "Default is 0.2.")
+    parser.add_argument("--subset-sum", action="store_true",
+                        help="Choose any books for validation and test instead of "
+                             "consecutive ones, which gets closer to the ratios.")
+    parser.add_argument("--keep-validation", action="store_true",
+                        help="Preprocess the validation books as well.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Number of books preprocessed in parallel. Default is 1.")
+    args = parser.parse_args()
+    if os.path.isfile(MANIFEST):
+        LOG.info(f"Resume the split planned in '{MANIFEST}'.")
+        preprocess_manifest(read_manifest(MANIFEST), args.jobs)
+    elif os.path.isdir(CORPUS):
         LOG.error("The preprocessed splitted corpus is already available.")
         LOG.info("Delete the folder 'corpus' or rename it to start over.")
+    elif args.source is None:
+        LOG.error("Please pass the path to your unzipped Gutenberg folder.\n")
+        LOG.info("Synopsis:")
+        LOG.info("$ python scripts\\split_corpus.py PATH_TO_UNZIPPED_GUTENBERG")
+    elif not os.path.isdir(args.source):
+        raise FileNotFoundError(f"'{args.source}' matches no path to a directory.")
+    elif not (0 <= args.validation and 0 <= args.test and args.validation + args.test < 1):
+        parser.error("The ratios of validation and test have to add up to less than 1.")
     else:
-        if len(sys.argv) < 2:
-            LOG.error("Please pass the path to your unzipped Gutenberg folder.\n")
-            LOG.info("Synopsis:")
-            LOG.info("$ python scripts\\split_corpus.py PATH_TO_UNZIPPED_GUTENBERG")
-        else:
-            if os.path.isdir(sys.argv[1]):
-                preprocess_gutenberg(sys.argv[1])
-            else:
-                raise FileNotFoundError(f"'{sys.argv[1]}' matches no path to a directory.")
+        manifest = plan_gutenberg(args.source, args.validation, args.test,
+                                  args.subset_sum, args.keep_validation)
+        os.mkdir(CORPUS)
+        write_manifest(MANIFEST, manifest)
+        preprocess_manifest(manifest, args.jobs)
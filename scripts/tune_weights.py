@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Tune the feature weights of the distance on a held-out set."""
+
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+
+# in order to access module from sister directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from lib.author_ident import AuthorIdent
+from lib.author_model import AuthorModel
+from lib.weight_tuning import DistanceCache, grid, random_weights
+
+
+LOG = logging.getLogger(__name__)
+LOG.setLevel("INFO")
+LOG.addHandler(logging.StreamHandler())
+
+
+def labeled_vectors(classifier, test_dir, max_tokens=None, sample_rate=None, jobs=1):
+    """Authors and feature vectors of the files of a test directory.
+
+    Files of authors the classifier isn't trained for and files
+    rejected by <AuthorIdent.check> are skipped. All other files
+    are processed in a single run.
+
+    Returns:
+        tuple: List of the author of every file and
+            list of the normalized feature vector of every file.
+    """
+    files = []
+    for author in sorted(os.listdir(test_dir)):
+        if not os.path.isdir(os.path.join(test_dir, author)):
+            continue
+        if author not in classifier.profiles:
+            LOG.warning(f"Skipped the files of '{author}', who is not in the catalog.")
+            continue
+        files.extend((author, os.path.join(test_dir, author, file))
+                     for file in sorted(os.listdir(os.path.join(test_dir, author))))
+    rejected = classifier.check(file for _, file in files)
+    for source, reasons in rejected.items():
+        LOG.warning(f"Skipped '{source}': {' '.join(reasons)}")
+    files = [(author, file) for author, file in files if file not in rejected]
+    if not files:
+        raise ValueError(f"'{test_dir}' contains no files to tune the weights on.")
+    parts = AuthorModel.train_many({file: [file] for _, file in files}, max_tokens=max_tokens,
+                                   sample_rate=sample_rate, jobs=jobs,
+                                   features=classifier._catalog_features())
+    return ([author for author, _ in files],
+            [parts[file].normalized_feature_vector() for _, file in files])
+
+
+def tune_weights(catalog, test_dir, values=None, tuned=None, n=100, spread=10.0, seed=0,
+                 filename=None, save=False, max_tokens=None, sample_rate=None, jobs=1):
+    """Find the feature weights classifying the most test files correctly.
+
+    The files are processed and compared to the profiles a single
+    time, every weight vector is then evaluated on the cached
+    distances (see <lib.weight_tuning.DistanceCache>). The current
+    weights of the catalog are always evaluated first and are kept
+    unless other weights achieve a higher accuracy.
+
+    Args:
+        catalog(str): Path to a catalog created by AuthorIdent.
+        test_dir(str): Path to a directory (e.g. called 'validation')
+            that contains folders named like the authors of the catalog
+            that contain files belonging to this author.
+        values(Optional[dict]): Maps every tuned feature to its candidate
+            weights, which are searched exhaustively. If not given,
+            <n> random weight vectors are searched instead.
+        tuned(Optional[list<str>]): Features tuned by the random search,
+            by default all features weighted by the catalog.
+        n(int): Number of weight vectors of the random search.
+        spread(float): Factor by which the weights of the random
+            search deviate at most from the current weights.
+        seed(int): Seed of the random search.
+        filename(Optional[str]): csv-file the accuracy of
+            every evaluated weight vector is saved to.
+        save(bool): Whether to save the best weights with the catalog.
+        max_tokens(Optional[int]): Maximum number of tokens
+            to be processed per file.
+        sample_rate(Optional[float]): Fraction of sentences
+            to be processed per file.
+        jobs(int): Number of processes extracting features.
+
+    Returns:
+        dict: Best weights of all features.
+    """
+    classifier = AuthorIdent(catalog)
+    if values is not None:
+        tuned = list(values)
+        candidates = grid([values[feature] for feature in tuned])
+    else:
+        tuned = list(classifier.weights) if tuned is None else list(tuned)
+        candidates = random_weights([classifier.weights.get(feature, 1) for feature in tuned],
+                                    n, spread, seed)
+    current = [classifier.weights.get(feature, 1) for feature in tuned]
+    candidates = np.vstack([current, candidates])
+    authors = list(classifier.profiles)
+    gold, unknown = labeled_vectors(classifier, test_dir, max_tokens, sample_rate, jobs)
+    cache = DistanceCache([classifier.profiles[author].normalized_feature_vector()
+                           for author in authors],
+                          unknown, tuned, classifier.weights)
+    accuracies = cache.accuracy(candidates, [authors.index(author) for author in gold])
+    if filename is not None:
+        with open(filename, 'w', encoding='utf-8') as eval_file:
+            eval_file.write('\t'.join(tuned + ["accuracy"]) + '\n')
+            for weights, accuracy in zip(candidates, accuracies):
+                eval_file.write('\t'.join(f"{value:g}" for value in weights)
+                                + f"\t{accuracy}\n")
+    best = int(accuracies.argmax())
+    LOG.info(f"Evaluated {len(candidates)} weight vectors on {len(gold)} files.")
+    LOG.info("Accuracy with the current weights: {:.2%}".format(accuracies[0]))
+    LOG.info("Best Accuracy: {:.2%}".format(accuracies[best]))
+    weights = dict(classifier.weights)
+    weights.update((feature, float(value)) for feature, value in zip(tuned, candidates[best]))
+    for feature in tuned:
+        LOG.info(f"{feature}: {weights[feature]:g}")
+    if save and best != 0:
+        classifier.set_weights(weights)
+    return weights
+
+
+def parse_grid(specifications):
+    """Read the candidate weights of a grid search.
+
+    Args:
+        specifications(list<str>): Strings of the form FEATURE=V1,V2,...
+
+    Returns:
+        dict: Maps every feature to its candidate weights.
+    """
+    values = dict()
+    for specification in specifications:
+        feature, sep, numbers = specification.rpartition('=')
+        if not sep or not feature:
+            raise ValueError(f"'{specification}' is not of the form FEATURE=V1,V2,... .")
+        values[feature] = [float(number) for number in numbers.split(',')]
+    return values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the feature weights of the distance "
+                                                 "on files held out from training.")
+    parser.add_argument("catalog", metavar="CATALOG",
+                        help="Path to the catalog whose weights are tuned.")
+    parser.add_argument("test_dir", metavar="TEST_DIRECTORY",
+                        help="Path to the 'validation' folder created by splitting the data.")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--grid", nargs='+', metavar="FEATURE=V1,V2",
+                       help="Search all combinations of the given weights, e.g. "
+                            "'<mtld_score>=0.005,0.01,0.02'.")
+    group.add_argument("--random", type=int, default=100, metavar="N",
+                       help="Search N random weight vectors around the current "
+                            "weights. This is the default with N=100.")
+    parser.add_argument("--tune", nargs='+', metavar="FEATURE",
+                        help="Use with --random to tune only the given features. "
+                             "Default are all features weighted by the catalog.")
+    parser.add_argument("--spread", type=float, default=10.0,
+                        help="Use with --random to deviate at most by this "
+                             "factor from the current weights. Default is 10.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random search.")
+    parser.add_argument("--output", metavar="FILENAME",
+                        help="Save the accuracy of every weight vector to FILENAME.")
+    parser.add_argument("--save", action="store_true",
+                        help="Save the best weights with the catalog.")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="Extract features with N processes.")
+    parser.add_argument("--max-tokens", type=int, metavar="N",
+                        help="Process at most N tokens per file.")
+    parser.add_argument("--sample-rate", type=float, metavar="RATE",
+                        help="Process only the given fraction of sentences per file.")
+    args = parser.parse_args()
+    tune_weights(args.catalog, args.test_dir,
+                 values=None if args.grid is None else parse_grid(args.grid),
+                 tuned=args.tune, n=args.random, spread=args.spread, seed=args.seed,
+                 filename=args.output, save=args.save, max_tokens=args.max_tokens,
+                 sample_rate=args.sample_rate, jobs=args.jobs)
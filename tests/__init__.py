@@ -15,7 +15,21 @@ import unittest
 from tests.mtld_unittest import *
 from tests.author_model_unittest import *
 from tests.author_ident_unittest import *
+from tests.cross_validation_unittest import *
 from tests.distribution_unittest import *
+from tests.errors_unittest import *
+from tests.feature_matrix_unittest import *
+from tests.import_time_unittest import *
+from tests.instrumentation_unittest import *
+from tests.metrics_unittest import *
+from tests.preflight_unittest import *
+from tests.profile_index_unittest import *
+from tests.progress_unittest import *
+from tests.sharding_unittest import *
+from tests.split_planner_unittest import *
+from tests.storage_unittest import *
+from tests.tagged_corpus_unittest import *
+from tests.weight_tuning_unittest import *
 
 
 def main(verbosity):
@@ -23,15 +37,41 @@ def main(verbosity):
     project_suite = unittest.TestSuite()
     project_suite.addTest(unittest.makeSuite(AccuracyTestCase))
     project_suite.addTest(unittest.makeSuite(ClassifyTestCase))
+    project_suite.addTest(unittest.makeSuite(CrossValidationTestCase))
     project_suite.addTest(unittest.makeSuite(DistributionTestCase))
     project_suite.addTest(unittest.makeSuite(FeatureExtractionDirectoryTestCase))
     project_suite.addTest(unittest.makeSuite(FeatureExtractionFileTestCase))
+    project_suite.addTest(unittest.makeSuite(FeatureFamiliesTestCase))
+    project_suite.addTest(unittest.makeSuite(FeatureMatrixTestCase))
     project_suite.addTest(unittest.makeSuite(ForgetTestCase))
+    project_suite.addTest(unittest.makeSuite(ImportTimeTestCase))
     project_suite.addTest(unittest.makeSuite(InitTestCase))
+    project_suite.addTest(unittest.makeSuite(InvertedIndexTestCase))
     project_suite.addTest(unittest.makeSuite(IntegerDistributionTestCase))
     project_suite.addTest(unittest.makeSuite(IOInteractionTestCase))
+    project_suite.addTest(unittest.makeSuite(LogExceptionTestCase))
+    project_suite.addTest(unittest.makeSuite(MetricTestCase))
     project_suite.addTest(unittest.makeSuite(MtldTestCase))
+    project_suite.addTest(unittest.makeSuite(ParallelExtractionTestCase))
+    project_suite.addTest(unittest.makeSuite(PreflightTestCase))
+    project_suite.addTest(unittest.makeSuite(ProfileMatrixTestCase))
+    project_suite.addTest(unittest.makeSuite(ProgressTestCase))
+    project_suite.addTest(unittest.makeSuite(PruningIndexTestCase))
+    project_suite.addTest(unittest.makeSuite(PruningTestCase))
+    project_suite.addTest(unittest.makeSuite(ReadManifestTestCase))
+    project_suite.addTest(unittest.makeSuite(SamplingTestCase))
+    project_suite.addTest(unittest.makeSuite(ShardingTestCase))
+    project_suite.addTest(unittest.makeSuite(SplitPlannerTestCase))
+    project_suite.addTest(unittest.makeSuite(SqliteCatalogTestCase))
+    project_suite.addTest(unittest.makeSuite(StageTimerTestCase))
+    project_suite.addTest(unittest.makeSuite(TaggedCorpusTestCase))
+    project_suite.addTest(unittest.makeSuite(TaggingCacheTestCase))
+    project_suite.addTest(unittest.makeSuite(TrainingManyProfilesTestCase))
+    project_suite.addTest(unittest.makeSuite(TrainManyTestCase))
     project_suite.addTest(unittest.makeSuite(TrainTestCase))
+    project_suite.addTest(unittest.makeSuite(TsvCatalogTestCase))
+    project_suite.addTest(unittest.makeSuite(WeightsTestCase))
+    project_suite.addTest(unittest.makeSuite(WeightTuningTestCase))
 
     project_runner = unittest.TextTestRunner(verbosity=verbosity)
     project_runner.run(project_suite)
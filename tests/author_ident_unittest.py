@@ -10,13 +10,17 @@
 # Windows 8
 """author_ident.py testcases."""
 
+import json
 import logging
 import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock  # to prevent dependencies on the AuthorModel class
 
-from lib.author_ident import AuthorIdent, LOG
+from lib.author_ident import AuthorIdent, LOG, WEIGHTS, read_manifest
 from lib.errors import CatalogError
+from lib.storage import TsvCatalog
 
 
 LOG.setLevel(logging.CRITICAL)
@@ -44,13 +48,71 @@ class ClassifyTestCase(unittest.TestCase):
 
     @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
                 catalog_content={"author1": "author1.json", "author2": "author2.json"},
-                autospec=True)
+                weights=WEIGHTS, metric="manhattan", _postings=None, autospec=True)
     @mock.patch("lib.author_ident.AuthorModel", autospec=True)
     def test_returned_best_match(self, mock_author_model, mock_author_ident):
         mock_author_ident.profiles = {"author1": mock_author_model, "author2": mock_author_model}
         mock_author_ident._simil.side_effect = [2.5, 1.6]
+        mock_author_ident._rank.side_effect = (
+            lambda *args: AuthorIdent._rank(mock_author_ident, *args))
         self.assertEqual(AuthorIdent.classify(mock_author_ident, ""), "author2")
 
+    @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
+                catalog_content={"author1": "author1.json", "author2": "author2.json"},
+                autospec=True)
+    def test_profiles_with_different_features(self, mock_author_ident):
+        mock_author_ident.profiles = {"author1": mock.Mock(features=("word_len",)),
+                                      "author2": mock.Mock(features=("word_len", "mtld"))}
+        mock_author_ident._profile_features.side_effect = (
+            lambda: AuthorIdent._profile_features(mock_author_ident))
+        with self.assertRaises(CatalogError):
+            AuthorIdent._catalog_features(mock_author_ident)
+
+    @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
+                catalog_content={"author1": "author1.json", "author2": "author2.json"},
+                autospec=True)
+    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
+    def test_unknown_text_with_catalog_features(self, mock_author_model, mock_author_ident):
+        mock_author_ident._catalog_features.return_value = ("word_len", "punctuation")
+        mock_author_ident._rank.return_value = [(1.0, "author1")]
+        AuthorIdent.classify(mock_author_ident, "")
+        self.assertEqual(mock_author_model.train.call_args[1]["features"],
+                         ("word_len", "punctuation"))
+
+    @mock.patch("lib.author_ident.AuthorIdent", autospec=True)
+    def test_rejected_texts_reported_at_once(self, mock_author_ident):
+        mock_author_ident._catalog_features.return_value = None
+        short_file = os.path.join("tests", "data", "short_file.txt")
+        frozen = os.path.join("tests", "data", "frozen")
+        rejected = AuthorIdent.check(mock_author_ident, [short_file, frozen])
+        self.assertEqual(list(rejected), [short_file])
+
+    @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
+                catalog_content={"author1": "author1.json", "author2": "author2.json"},
+                autospec=True)
+    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
+    def test_early_exit_after_stable_lead(self, mock_author_model, mock_author_ident):
+        steps = [(mock_author_model, 0.1 * i) for i in range(1, 11)]
+        mock_author_model.train_stepwise.return_value = iter(steps)
+        mock_author_ident._rank.side_effect = [[(1.0, "author1"), (1.05, "author2")],
+                                               [(1.0, "author2"), (2.0, "author1")],
+                                               [(1.0, "author2"), (2.0, "author1")],
+                                               [(1.0, "author2"), (2.0, "author1")]]
+        result = AuthorIdent.classify_early_exit(mock_author_ident, "", margin=0.1, patience=3)
+        self.assertEqual(result, ("author2", 0.4))
+
+    @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
+                catalog_content={"author1": "author1.json", "author2": "author2.json"},
+                autospec=True)
+    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
+    def test_early_exit_reading_whole_text(self, mock_author_model, mock_author_ident):
+        mock_author_model.train_stepwise.return_value = iter([(mock_author_model, 0.5),
+                                                              (mock_author_model, 1.0)])
+        mock_author_ident._rank.side_effect = [[(1.0, "author1"), (1.05, "author2")],
+                                               [(1.0, "author2"), (1.01, "author1")]]
+        result = AuthorIdent.classify_early_exit(mock_author_ident, "", margin=0.1)
+        self.assertEqual(result, ("author2", 1.0))
+
     @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
                 catalog_content={}, autospec=True)
     def test_too_small_catalog(self, mock_author_ident):
@@ -60,28 +122,22 @@ class ClassifyTestCase(unittest.TestCase):
 
 class ForgetTestCase(unittest.TestCase):
     @classmethod
-    @mock.patch("lib.author_ident.os")
     @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
                 catalog_content={"author1": "author1.json", "author2": "author2.json"},
-                profiles={"author1": {}, "author2": {}}, autospec=True)
-    def setUpClass(cls, mock_author_ident, mock_os):
+                profiles={"author1": {}, "author2": {}},
+                storage=mock.create_autospec(TsvCatalog, instance=True), autospec=True)
+    def setUpClass(cls, mock_author_ident):
         # prevent file system from being touched
-        with mock.patch('lib.author_ident.open', mock.mock_open()) as filesys_mock:
-            cls.filesys_mock = filesys_mock
-            cls.mock_author_ident = mock_author_ident
-            cls.mock_os = mock_os
-            AuthorIdent.forget(cls.mock_author_ident, "author1")
+        cls.mock_author_ident = mock_author_ident
+        AuthorIdent.forget(cls.mock_author_ident, "author1")
 
     def test_catalog_file_updated(self):
-        self.filesys_mock().write.assert_called_once()
+        self.mock_author_ident.storage.remove.assert_called_once_with("author1", "author1.json")
 
     def test_deleting_a_not_existing_author(self):
         with self.assertRaises(CatalogError):
             AuthorIdent.forget(self.mock_author_ident, "author3")
 
-    def test_profile_file_deleted(self):
-        self.mock_os.remove.assert_called_with("author1.json")
-
     def test_variable_catalog_content_updated(self):
         self.assertEqual(self.mock_author_ident.catalog_content, {"author2": "author2.json"})
 
@@ -112,6 +168,32 @@ class InitTestCase(unittest.TestCase):
         self.assertIn(msg1, logger.output)
         self.assertIn(msg2, logger.output)
 
+    def test_profiles_with_forward_mtld_reported(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        with open(os.path.join("tests", "data", "elsa.json"), 'r', encoding='utf-8') as file_in:
+            data = json.load(file_in)
+        with open(os.path.join(tmp_dir, "anna.json"), 'w', encoding='utf-8') as file_out:
+            json.dump(data[:6], file_out)  # trained before the reverse pass was added
+        catalog = os.path.join(tmp_dir, "catalog.csv")
+        with open(catalog, 'w', encoding='utf-8') as file_out:
+            file_out.write(f"elsa\t{os.path.join('tests', 'data', 'elsa.json')}\n")
+            file_out.write(f"anna\t{os.path.join(tmp_dir, 'anna.json')}\n")
+        with self.assertLogs(LOG, level='INFO') as logger:
+            AuthorIdent(catalog)
+        self.assertIn(f"WARNING:lib.author_ident:1 profiles of '{catalog}' only carry the "
+                      "forward mtld score, while texts are scored in both directions. "
+                      "Retrain them for comparable scores.", logger.output)
+        self.assertIn("INFO:lib.author_ident:Profiles with the forward mtld score: anna",
+                      logger.output)
+
+    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
+    def test_loading_selected_authors_only(self, mock_author_model):
+        classifier = AuthorIdent(os.path.join("tests", "data", "frozen_catalog.csv"),
+                                 authors=["anna"])
+        self.assertEqual(classifier.profiles, {})
+        mock_author_model.read_json.assert_not_called()
+
     def test_variable_catalog_content_instantiated(self):
         self.assertEqual(self.classifier.catalog_content,
                          {"elsa": "tests/data/elsa.json"})
@@ -120,41 +202,131 @@ class InitTestCase(unittest.TestCase):
         self.assertIn("elsa", self.classifier.profiles)
 
 
+class WeightsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalog = os.path.join(self.tmp_dir, "catalog.csv")
+        with open(self.catalog, 'w', encoding='utf-8') as file_out:
+            file_out.write(f"elsa\t{os.path.join('tests', 'data', 'elsa.json')}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_default_weights(self):
+        self.assertEqual(AuthorIdent(self.catalog).weights, WEIGHTS)
+
+    def test_weights_saved_with_catalog(self):
+        AuthorIdent(self.catalog).set_weights({"<mtld_score>": 0.5})
+        self.assertEqual(AuthorIdent(self.catalog).weights, {"<mtld_score>": 0.5})
+
+    def test_invalid_weights(self):
+        classifier = AuthorIdent(self.catalog)
+        for weights in [{"<mtld_score>": -1}, {"<mtld_score>": "1"}, [0.5]]:
+            with self.assertRaises(ValueError):
+                classifier.set_weights(weights)
+        self.assertEqual(AuthorIdent(self.catalog).weights, WEIGHTS)
+
+    def test_weights_used_in_distance(self):
+        self.assertEqual(AuthorIdent._simil({'i': 0.5, "<mtld_score>": 50},
+                                            {'i': 0.8, "<stdev_word_len>": 1.5},
+                                            weights={'i': 0, "<mtld_score>": 0.02}), 2.5)
+
+
+class MetricTestCase(unittest.TestCase):
+    def setUp(self):
+        # three profiles, one of them with a noticeably different punctuation
+        self.tmp_dir = tempfile.mkdtemp()
+        elsa = os.path.join("tests", "data", "elsa.json")
+        self.catalog = os.path.join(self.tmp_dir, "catalog.csv")
+        with open(self.catalog, 'w', encoding='utf-8') as file_out:
+            file_out.write(f"elsa\t{elsa}\nolaf\t{elsa}\n")
+        self.anna = AuthorIdent(self.catalog).profiles["elsa"]
+        self.anna.punctuation_distr.distr[","] = 50
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            AuthorIdent(self.catalog, metric="euclidean")
+
+    def test_trained_and_forgotten_authors_ranked(self):
+        vector = self.anna.normalized_feature_vector()
+        for metric in ["manhattan", "delta", "zscore", "cosine"]:
+            classifier = AuthorIdent(self.catalog, metric=metric)
+            # statistics are taken from the catalog and updated afterwards
+            self.assertEqual(len(classifier._rank(vector)), 2)
+            classifier.storage = mock.create_autospec(TsvCatalog, instance=True)
+            with mock.patch("lib.author_ident.AuthorModel.train", return_value=self.anna):
+                classifier.train("anna", "anna.txt")
+            self.assertEqual(classifier._rank(vector, 1)[0][1], "anna")
+            classifier.forget("elsa")
+            self.assertEqual([author for _, author in classifier._rank(vector)],
+                             ["anna", "olaf"])
+
+
+class DestroyTestCase(unittest.TestCase):
+    def test_profiles_of_authors_not_loaded_deleted(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            catalog = os.path.join(tmp_dir, "catalog.csv")
+            with open(catalog, 'w', encoding='utf-8') as file_out:
+                for author in ["a0", "a1", "a2"]:
+                    shutil.copy(os.path.join("tests", "data", "elsa.json"),
+                                os.path.join(tmp_dir, f"{author}.json"))
+                    file_out.write(f"{author}\t{os.path.join(tmp_dir, author + '.json')}\n")
+            AuthorIdent(catalog, authors=["a0"]).destroy()
+            self.assertEqual(os.listdir(tmp_dir), [])
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class PrunedCatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        # elsa's profile is pruned, anna's only differs in her punctuation
+        self.tmp_dir = tempfile.mkdtemp()
+        self.catalog = os.path.join(self.tmp_dir, "catalog.csv")
+        with open(self.catalog, 'w', encoding='utf-8') as file_out:
+            for author in ["anna", "elsa"]:
+                file_out.write(f"{author}\t{os.path.join('tests', 'data', 'elsa.json')}\n")
+        profiles = AuthorIdent(self.catalog).profiles
+        self.vector = profiles["elsa"].normalized_feature_vector()
+        profiles["elsa"].prune(top_k=3)
+        profiles["anna"].punctuation_distr.distr[","] += 1
+        with open(self.catalog, 'w', encoding='utf-8') as file_out:
+            for author in ["anna", "elsa"]:
+                profiles[author].write_json(os.path.join(self.tmp_dir, author + ".json"))
+                file_out.write(f"{author}\t{os.path.join(self.tmp_dir, author + '.json')}\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_training_text_closest_to_pruned_profile(self):
+        for metric in ["manhattan", "delta", "zscore", "cosine"]:
+            best, author = AuthorIdent(self.catalog, metric=metric)._rank(self.vector, 1)[0]
+            self.assertEqual(author, "elsa")
+            self.assertAlmostEqual(best, 0)
+
+
 class TrainTestCase(unittest.TestCase):
     @classmethod
     @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
                 catalog_content={"author1": "author1.json"},
-                profiles={"author1": {}}, autospec=True)
+                profiles={"author1": {}},
+                storage=mock.create_autospec(TsvCatalog, instance=True), autospec=True)
     @mock.patch("lib.author_ident.AuthorModel", autospec=True)
     def setUpClass(cls, mock_author_model, mock_author_ident):
         # mock AuthorModel methods
         mock_author_model.train.return_value = mock_author_model
-        mock_author_model.write_json.return_value = mock_author_model
         # prevent file system from being touched
-        with mock.patch('lib.author_ident.open', mock.mock_open()) as filesys_mock:
-            cls.filesys_mock = filesys_mock
-            cls.mock_author_model = mock_author_model
-            cls.mock_author_ident = mock_author_ident
-            AuthorIdent.train(cls.mock_author_ident, "author2", "author2.txt")
+        mock_author_ident.storage.add.return_value = "author2.json"
+        cls.mock_author_model = mock_author_model
+        cls.mock_author_ident = mock_author_ident
+        AuthorIdent.train(cls.mock_author_ident, "author2", "author2.txt")
 
     def test_catalog_file_updated(self):
-        self.filesys_mock().write.assert_called_with("author2\tauthor2.json\n")
-
-    def test_profile_file_created(self):
-        self.mock_author_model.write_json.assert_called_with("author2.json")
-
-    @mock.patch("lib.author_ident.AuthorIdent",
-                catalog=os.path.join("tests", "data", "frozen.txt"),
-                catalog_content={"anna": os.path.join("tests", "data", "anna.json")},
-                profiles={"anna": {}}, autospec=True)
-    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
-    def test_training_with_filename_exists_as_json(self, mock_author_model, mock_author_ident):
-        mock_author_model.train.return_value = mock_author_model
-        mock_author_model.write_json.return_value = mock_author_model
-        with mock.patch('lib.author_ident.open', mock.mock_open()) as filesys_mock:
-            AuthorIdent.train(mock_author_ident, "elsa", "elsa.txt")
-        self.assertEqual(mock_author_ident.catalog_content["elsa"],
-                         os.path.join("tests", "data", "elsa(2).json"))
+        self.mock_author_ident.storage.add.assert_called_once_with("author2",
+                                                                   self.mock_author_model)
 
     def test_training_for_an_existing_author(self):
         with self.assertRaises(CatalogError):
@@ -166,3 +338,68 @@ class TrainTestCase(unittest.TestCase):
 
     def test_variable_profiles_updated(self):
         self.assertEqual(list(self.mock_author_ident.profiles.keys()), ["author1", "author2"])
+
+
+class TrainManyTestCase(unittest.TestCase):
+    @classmethod
+    @mock.patch("lib.author_ident.AuthorIdent", catalog="catalog.txt",
+                catalog_content={"author1": "author1.json"},
+                profiles={"author1": {}},
+                storage=mock.create_autospec(TsvCatalog, instance=True), autospec=True)
+    @mock.patch("lib.author_ident.AuthorModel", autospec=True)
+    def setUpClass(cls, mock_author_model, mock_author_ident):
+        mock_author_model.train_many.side_effect = (
+            lambda sources, **kwargs: {author: mock_author_model for author in sources})
+        # prevent file system from being touched
+        mock_author_ident.storage.add_many.return_value = ["author2.json", "author3.json"]
+        cls.mock_author_model = mock_author_model
+        cls.mock_author_ident = mock_author_ident
+        cls.added = AuthorIdent.train_many(cls.mock_author_ident,
+                                           [("author2", "a.txt"), ("author3", "b.txt"),
+                                            ("author2", "c.txt")])
+
+    def test_sources_of_an_author_combined(self):
+        self.assertEqual(self.mock_author_model.train_many.call_args[0][0],
+                         {"author2": ["a.txt", "c.txt"], "author3": ["b.txt"]})
+
+    def test_catalog_updated_at_once(self):
+        self.mock_author_ident.storage.add_many.assert_called_once_with(
+            [("author2", self.mock_author_model), ("author3", self.mock_author_model)])
+        self.assertEqual(self.added, ["author2", "author3"])
+        self.assertEqual(self.mock_author_ident.catalog_content,
+                         {"author1": "author1.json", "author2": "author2.json",
+                          "author3": "author3.json"})
+
+    def test_training_for_an_existing_author(self):
+        with self.assertRaises(CatalogError):
+            AuthorIdent.train_many(self.mock_author_ident,
+                                   [("author4", "d.txt"), ("author1", "e.txt")])
+
+
+class ReadManifestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_tsv_manifest(self):
+        path = self._manifest("manifest.tsv", "elsa\tlet_it_go.txt\n\nanna\tfrozen\n")
+        self.assertEqual(read_manifest(path), [("elsa", "let_it_go.txt"), ("anna", "frozen")])
+
+    def test_jsonl_manifest(self):
+        path = self._manifest("manifest.jsonl", '{"author": "elsa", "source": "frozen"}\n')
+        self.assertEqual(read_manifest(path), [("elsa", "frozen")])
+
+    def test_malformed_lines(self):
+        for name, content in [("manifest.tsv", "elsa\n"),
+                              ("manifest.jsonl", '{"author": "elsa"}\n'),
+                              ("manifest.jsonl", "elsa\tfrozen\n")]:
+            with self.assertRaises(ValueError):
+                read_manifest(self._manifest(name, content))
+
+    def _manifest(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding='utf-8') as file_out:
+            file_out.write(content)
+        return path
@@ -14,10 +14,15 @@ import json
 import logging
 import os
 import re
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
-from lib.author_model import AuthorModel, LOG
-from lib.errors import ScarceDataError
+from lib import author_model
+from lib.author_model import AuthorModel, FEATURES, LOG, OTHER, project
+from lib.errors import RejectedInputError, ScarceDataError
+from lib.instrumentation import StageTimer
 
 
 LOG.setLevel(logging.CRITICAL)
@@ -32,6 +37,8 @@ class IOInteractionTestCase(unittest.TestCase):
 
     def test_preprocessing_a_folder(self):
         result = True
+        # removed even if preprocessing fails halfway
+        self.addCleanup(shutil.rmtree, os.path.join("tests", "data", "temp"), ignore_errors=True)
         AuthorModel.preprocess(os.path.join("tests", "data", "raw_data"),
                                os.path.join("tests", "data", "temp"))
         for file in os.listdir(os.path.join("tests", "data", "raw_data")):
@@ -65,6 +72,14 @@ class IOInteractionTestCase(unittest.TestCase):
         self.assertEqual(str(exc.exception),
                          "The loaded array has to contain a number at last position.")
 
+    def test_reading_in_profile_metadata(self):
+        profile = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json"))
+        profile.meta = {"seed": 0, "sampled_tokens": 20}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profile.write_json(os.path.join(tmp_dir, "elsa.json"))
+            loaded = AuthorModel.read_json(os.path.join(tmp_dir, "elsa.json"))
+        self.assertEqual(loaded.meta, {"seed": 0, "sampled_tokens": 20})
+
     def test_training_on_directory_without_files(self):
         with self.assertRaises(FileNotFoundError):
             AuthorModel.train(os.path.join("tests", "data", "dir_without_files"))
@@ -122,3 +137,227 @@ class FeatureExtractionDirectoryTestCase(unittest.TestCase):
 
     def test_word_length_mean(self):
         self.assertAlmostEqual(self.features["<mean_word_len>"], 3.6449, places=4)
+
+
+class SamplingTestCase(unittest.TestCase):
+    filename = os.path.join("tests", "data", "frozen", "let_it_go_frozen.txt")
+
+    def test_sample_deterministic_for_seed(self):
+        sample1 = AuthorModel()._sample_lines(self.filename, sample_rate=0.5, seed=3)
+        sample2 = AuthorModel()._sample_lines(self.filename, sample_rate=0.5, seed=3)
+        self.assertEqual(sample1, sample2)
+
+    def test_sample_rate(self):
+        lines = AuthorModel()._sample_lines(self.filename, sample_rate=1/3)
+        self.assertEqual(sum(lines), 3)
+
+    def test_sample_size_recorded(self):
+        profile = AuthorModel()
+        lines = profile._sample_lines(self.filename, sample_rate=1/3)
+        self.assertEqual(profile.meta["sampled_sentences"], sum(lines))
+        self.assertEqual(profile.meta["total_sentences"], 9)
+
+    def test_sample_within_token_budget(self):
+        profile = AuthorModel()
+        profile._sample_lines(self.filename, max_tokens=20)
+        self.assertLessEqual(profile.meta["sampled_tokens"], 20)
+
+    def test_sample_spread_over_file(self):
+        lines = AuthorModel()._sample_lines(self.filename, sample_rate=1/3)
+        self.assertTrue(any(lines[:3]) and any(lines[-3:]))
+
+    def test_no_sample_needed(self):
+        self.assertIsNone(AuthorModel()._sample_lines(self.filename, max_tokens=10**6))
+
+
+class FeatureFamiliesTestCase(unittest.TestCase):
+    filename = os.path.join("tests", "data", "frozen", "let_it_go_frozen.txt")
+
+    @mock.patch("nltk.pos_tag")
+    def test_tagging_skipped(self, pos_tag):
+        profile = AuthorModel.train(self.filename, features=["word_len", "punctuation"])
+        pos_tag.assert_not_called()
+        self.assertEqual(profile.pos_trigram_distr.total, 0)
+
+    def test_only_selected_features_in_vector(self):
+        vector = AuthorModel.train(self.filename, features=["sent_len"]).normalized_feature_vector()
+        self.assertEqual({key for key in vector if not re.match(r"<s\d+>$", key)},
+                         {"<mean_sent_len>", "<stdev_sent_len>"})
+
+    def test_features_saved_with_profile(self):
+        profile = AuthorModel.train(self.filename, features=["mtld", "word_len"])
+        self.assertEqual(AuthorModel.from_list(profile.to_list()).features, ("word_len", "mtld"))
+
+    def test_all_features_by_default(self):
+        self.assertEqual(AuthorModel().features, FEATURES)
+        self.assertNotIn("features", AuthorModel.read_json(
+            os.path.join("tests", "data", "elsa.json")).meta)
+
+    def test_mtld_variant_saved_with_profile(self):
+        profile = AuthorModel.train(self.filename, features=["mtld", "word_len"])
+        self.assertEqual(AuthorModel.from_list(profile.to_list()).mtld_variant, "bidirectional")
+        self.assertIsNone(AuthorModel.train(self.filename, features=["word_len"]).mtld_variant)
+
+    def test_profile_without_mtld_variant_forward_only(self):
+        data = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json")).to_list()
+        self.assertEqual(AuthorModel.from_list(data[:6]).mtld_variant, "forward")
+
+    def test_unknown_feature_family(self):
+        with self.assertRaises(ValueError):
+            AuthorModel.train(self.filename, features=["word_len", "rhymes"])
+
+
+class ParallelExtractionTestCase(unittest.TestCase):
+    filename = os.path.join("tests", "data", "frozen", "let_it_go_frozen.txt")
+
+    @mock.patch("lib.author_model.MIN_CHUNK_SIZE", 1)
+    def test_chunks_end_on_line_breaks(self):
+        with open(self.filename, 'rb') as file_in:
+            content = file_in.read()
+        ranges = AuthorModel._chunk_ranges(self.filename, 4)
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual((ranges[0][0], ranges[-1][1]), (0, len(content)))
+        for (_, end, _), (start, _, first) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(content[start-1:start], b"\n")
+            self.assertEqual(content[:start].count(b"\n"), first)
+
+    def test_small_file_not_split(self):
+        self.assertEqual(len(AuthorModel._chunk_ranges(self.filename, 4)), 1)
+
+    @mock.patch("lib.author_model.MIN_CHUNK_SIZE", 1)
+    def test_same_profile_as_single_process(self):
+        self.assertEqual(AuthorModel.train(self.filename, jobs=3),
+                         AuthorModel.train(self.filename))
+
+    @mock.patch("lib.author_model.MIN_CHUNK_SIZE", 1)
+    def test_same_sample_as_single_process(self):
+        self.assertEqual(AuthorModel.train(self.filename, sample_rate=0.5, jobs=3),
+                         AuthorModel.train(self.filename, sample_rate=0.5))
+
+
+@mock.patch("lib.author_model.AuthorModel._get_lemma", lambda word, tag: word.lower())
+@mock.patch("nltk.pos_tag", side_effect=lambda tokens: [(t, "NN") for t in tokens])
+class TaggingCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        author_model._TAG_CACHE.clear()
+        fd, self.filename = tempfile.mkstemp(suffix=".txt")
+        with open(fd, 'w', encoding='utf-8') as file_out:
+            file_out.write("`` No . ''\nHe left .\n`` No . ''\n`` No . ''\n")
+
+    def tearDown(self):
+        author_model._TAG_CACHE.clear()
+        os.remove(self.filename)
+
+    def test_repeated_sentence_tagged_once(self, pos_tag):
+        sentences = list(AuthorModel._nlp(self.filename))
+        self.assertEqual(pos_tag.call_count, 2)
+        self.assertEqual(sentences[0], sentences[2])
+
+    def test_cache_shared_by_files(self, pos_tag):
+        list(AuthorModel._nlp(self.filename))
+        list(AuthorModel._nlp(self.filename))
+        self.assertEqual(pos_tag.call_count, 2)
+
+    @mock.patch("lib.author_model.TAG_CACHE_SIZE", 1)
+    def test_cache_bounded(self, pos_tag):
+        list(AuthorModel._nlp(self.filename))
+        self.assertEqual(len(author_model._TAG_CACHE), 1)
+        self.assertEqual(pos_tag.call_count, 3)
+
+    def test_hit_rate_reported(self, pos_tag):
+        with mock.patch("lib.author_model.TIMER", StageTimer(enabled=True)) as timer:
+            list(AuthorModel._nlp(self.filename))
+        self.assertEqual(timer.report()["caches"]["tagging"]["hit_rate"], 0.5)
+
+    def test_hit_rate_logged_without_timer(self, pos_tag):
+        profile = AuthorModel()
+        profile._select_features(["pos_trigram"])
+        with self.assertLogs(author_model.LOG, "INFO") as logs:
+            profile._extract_features([self.filename])
+        self.assertIn("Tagging cache: 2 of 4 sentences tagged before (50.00%).",
+                      [record.getMessage() for record in logs.records])
+
+
+class TrainingManyProfilesTestCase(unittest.TestCase):
+    # without pos trigrams and frequent words nothing is tagged
+    features = ["word_len", "sent_len", "punctuation", "mtld"]
+    frozen = os.path.join("tests", "data", "frozen")
+    sources = {"frozen": [os.path.join(frozen, "let_it_go_frozen.txt"),
+                          os.path.join(frozen, "into_the_unknown_frozen.txt")],
+               "dickens": [os.path.join("tests", "data", "preprocessed_data",
+                                        "charles_dickens.txt")]}
+
+    def test_same_profiles_as_trained_one_by_one(self):
+        profiles = AuthorModel.train_many(self.sources, sample_rate=0.5,
+                                          features=self.features)
+        self.assertEqual(profiles["frozen"],
+                         AuthorModel.train(self.frozen, sample_rate=0.5, features=self.features))
+        self.assertEqual(profiles["dickens"],
+                         AuthorModel.train(self.sources["dickens"][0], sample_rate=0.5,
+                                           features=self.features))
+
+    def test_same_profiles_with_several_jobs(self):
+        self.assertEqual(AuthorModel.train_many(self.sources, jobs=2, features=self.features),
+                         AuthorModel.train_many(self.sources, features=self.features))
+
+    def test_timings_of_workers_reported(self):
+        tokens = []
+        for jobs in [1, 2]:
+            with mock.patch("lib.author_model.TIMER", StageTimer(enabled=True)) as timer:
+                AuthorModel.train_many(self.sources, jobs=jobs, features=self.features)
+            tokens.append(timer.report()["stages"]["counting"]["tokens"])
+        self.assertGreater(tokens[0], 0)
+        self.assertEqual(tokens[1], tokens[0])
+
+    @mock.patch.object(AuthorModel, "_nlp")
+    def test_all_rejected_sources_reported(self, mock_nlp):
+        short_file = os.path.join("tests", "data", "short_file.txt")
+        sources = dict(self.sources, short1=[short_file], short2=[short_file])
+        with self.assertRaises(RejectedInputError) as context:
+            AuthorModel.train_many(sources, jobs=2)
+        self.assertEqual(list(context.exception.rejected), ["short1", "short2"])
+        mock_nlp.assert_not_called()
+
+
+class PruningTestCase(unittest.TestCase):
+    def setUp(self):
+        self.profile = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json"))
+        self.original = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json"))
+
+    def test_top_k_features_kept(self):
+        self.profile.prune(top_k=5)
+        self.assertEqual(len(self.profile.pos_trigram_distr), 6)
+
+    def test_total_unchanged(self):
+        self.profile.prune(top_k=5)
+        self.assertEqual(self.profile.pos_trigram_distr.total,
+                         self.original.pos_trigram_distr.total)
+
+    def test_relative_frequency_of_kept_features_unchanged(self):
+        self.profile.prune(min_count=2)
+        pruned = self.profile.normalized_feature_vector()
+        original = self.original.normalized_feature_vector()
+        self.assertEqual({key: original[key] for key in pruned if key not in OTHER.values()},
+                         {key: pruned[key] for key in pruned if key not in OTHER.values()})
+
+    def test_dropped_mass_summarized(self):
+        self.profile.prune(min_count=2)
+        dropped = sum(count for count in self.original.pos_trigram_distr.values() if count < 2)
+        self.assertEqual(self.profile.pos_trigram_distr[OTHER["pos_trigram_distr"]], dropped)
+
+    def test_text_projected_onto_kept_features(self):
+        self.profile.prune(top_k=3)
+        pruned = self.profile.normalized_feature_vector()
+        projected = project(self.original.normalized_feature_vector(), pruned)
+        self.assertEqual(projected.keys(), pruned.keys())
+        for feature, value in pruned.items():
+            self.assertAlmostEqual(projected[feature], value)
+
+    def test_text_not_projected_onto_unpruned_profile(self):
+        vector = self.original.normalized_feature_vector()
+        self.assertIs(project(vector, vector), vector)
+
+    def test_pruning_recorded(self):
+        self.profile.prune(top_k=5)
+        self.assertEqual(self.profile.meta["pruning"], {"top_k": 5, "min_count": None})
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""cross_validation.py testcases."""
+
+from collections import Counter
+import copy
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.author_ident import AuthorIdent
+from lib.author_model import AuthorModel
+from lib.cross_validation import LOG, assign_folds, cross_validate, fold_accuracy
+
+
+LOG.setLevel(logging.CRITICAL)
+# without pos trigrams and frequent words nothing is tagged
+FEATURES = ["word_len", "sent_len", "punctuation", "mtld"]
+FROZEN = os.path.join("tests", "data", "frozen")
+PREPROCESSED = os.path.join("tests", "data", "preprocessed_data")
+
+
+class CrossValidationTestCase(unittest.TestCase):
+    sources = [("elsa", os.path.join(FROZEN, "let_it_go_frozen.txt")),
+               ("elsa", os.path.join(PREPROCESSED, "charles_dickens.txt")),
+               ("anna", os.path.join(FROZEN, "into_the_unknown_frozen.txt")),
+               ("anna", os.path.join(PREPROCESSED, "charlotte_mary_yonge.txt"))]
+
+    def test_folds_balanced_per_author(self):
+        labels = ["a"]*7 + ["b"]*5
+        fold_of = assign_folds(labels, 3, seed=1)
+        self.assertEqual(sorted(Counter(fold_of).values()), [4, 4, 4])
+        for label in "ab":
+            counts = Counter(f for f, l in zip(fold_of, labels) if l == label)
+            self.assertLessEqual(max(counts.values()) - min(counts.values()), 1)
+
+    def test_too_many_folds(self):
+        with self.assertRaises(ValueError):
+            assign_folds(["a", "b"], 3)
+
+    def test_subtracted_counts_same_as_retrained(self):
+        files = [file for _, file in self.sources]
+        parts = AuthorModel.train_many({file: [file] for file in files}, features=FEATURES)
+        profile = copy.deepcopy(parts[files[0]])
+        for file in files[1:]:
+            profile._add(parts[file])
+        profile._subtract(parts[files[1]])
+        profile.mtld = (parts[files[0]].mtld + parts[files[2]].mtld + parts[files[3]].mtld)/3
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            for file in files[:1] + files[2:]:
+                shutil.copy(file, tmp_dir)
+            expected = AuthorModel.train(tmp_dir, features=FEATURES)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(profile.word_len_distr.distr, expected.word_len_distr.distr)
+        self.assertEqual(profile.punctuation_distr.distr, expected.punctuation_distr.distr)
+        self.assertAlmostEqual(profile.mtld, expected.mtld)
+
+    def test_leave_one_out_same_as_retraining(self):
+        predictions = cross_validate(self.sources, folds=None, features=FEATURES)
+        self.assertEqual(len(predictions), 4)
+        for prediction in predictions:
+            vectors = dict()
+            for author in ["elsa", "anna"]:
+                rest = [file for a, file in self.sources
+                        if a == author and file != prediction.file]
+                vectors[author] = AuthorModel.train(rest[0], features=FEATURES) \
+                    .normalized_feature_vector()
+            unknown = AuthorModel.train(prediction.file, features=FEATURES) \
+                .normalized_feature_vector()
+            expected = min(vectors, key=lambda a: AuthorIdent._simil(vectors[a], unknown))
+            self.assertEqual(prediction.prediction, expected)
+
+    def test_author_without_profile_skipped(self):
+        sources = self.sources + [("olaf", os.path.join(FROZEN, "let_it_go_frozen.txt"))]
+        with self.assertLogs(LOG, "WARNING") as logs:
+            predictions = cross_validate(sources, folds=None, features=FEATURES)
+        self.assertEqual(len(predictions), 4)
+        self.assertNotIn("olaf", [p.gold for p in predictions])
+        self.assertEqual(len(logs.records), 1)
+
+    def test_fold_accuracy(self):
+        predictions = cross_validate(self.sources, folds=2, features=FEATURES)
+        self.assertEqual(sorted(p.fold for p in predictions), [0, 0, 1, 1])
+        self.assertAlmostEqual(fold_accuracy(predictions),
+                               (fold_accuracy(predictions, 0) + fold_accuracy(predictions, 1))/2)
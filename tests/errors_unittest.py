@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""errors.py testcases."""
+
+import logging
+import unittest
+
+from lib.distribution import Distribution
+from lib.errors import log_exception, summarize
+
+
+LOG = logging.getLogger("tests.errors")
+
+
+@log_exception(LOG)
+def inner(distr):
+    raise ValueError("inner failed")
+
+
+@log_exception(LOG)
+def outer(distr):
+    return inner(distr)
+
+
+class LogExceptionTestCase(unittest.TestCase):
+    def test_exception_logged_once(self):
+        with self.assertLogs(LOG, level='ERROR') as logger:
+            with self.assertRaises(ValueError):
+                outer(Distribution("abc"))
+        self.assertEqual(len(logger.output), 1)
+        self.assertIn("Calling inner(<Distribution of length 3>)...", logger.output[0])
+
+    def test_long_arguments_truncated(self):
+        self.assertLessEqual(len(summarize("a"*10**6)), 80)
+        self.assertLessEqual(len(summarize(list(range(10**6)))), 80)
+
+    def test_objects_only_named(self):
+        self.assertEqual(summarize([Distribution("abc")]), "[<Distribution of length 3>]")
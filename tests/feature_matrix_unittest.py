@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""feature_matrix.py testcases."""
+
+import unittest
+
+from lib.author_ident import AuthorIdent, WEIGHTS
+from lib.feature_matrix import FeatureMatrix, feature_columns, manhattan
+
+
+KNOWN = [{"a": 0.5, "b": 0.5, "<mtld_score>": 40.0},
+         {"a": 0.2, "c": 0.8, "<mtld_score>": 70.0}]
+UNKNOWN = [{"a": 0.4, "d": 0.6, "<mtld_score>": 55.0},
+           {"c": 1.0}]
+
+
+class FeatureMatrixTestCase(unittest.TestCase):
+    def test_columns_in_order_of_occurrence(self):
+        self.assertEqual(list(feature_columns(KNOWN + UNKNOWN)),
+                         ["a", "b", "<mtld_score>", "c", "d"])
+
+    def test_missing_features_zero(self):
+        matrix = FeatureMatrix(UNKNOWN, feature_columns(KNOWN + UNKNOWN))
+        self.assertEqual(matrix.values.tolist(), [[0.4, 0, 55.0, 0, 0.6], [0, 0, 0, 1.0, 0]])
+
+    def test_weights_per_column(self):
+        matrix = FeatureMatrix(KNOWN)
+        self.assertEqual(matrix.weights({"<mtld_score>": 0.01, "z": 5}).tolist(),
+                         [1, 1, 0.01, 1])
+
+    def test_same_distances_as_simil(self):
+        columns = feature_columns(KNOWN + UNKNOWN)
+        known = FeatureMatrix(KNOWN, columns)
+        distances = manhattan(known, FeatureMatrix(UNKNOWN, columns), known.weights(WEIGHTS))
+        for i, unknown in enumerate(UNKNOWN):
+            for j, profile in enumerate(KNOWN):
+                self.assertAlmostEqual(distances[i, j], AuthorIdent._simil(profile, unknown))
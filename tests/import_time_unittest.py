@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Import time regression testcases."""
+
+import os
+import subprocess
+import sys
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# packages only needed for feature extraction and plotting
+HEAVY_PACKAGES = {"matplotlib", "nltk", "numpy", "tqdm"}
+# seconds importing main.py may take at most
+IMPORT_BUDGET = 0.2
+
+
+def import_times(module):
+    """Import a module in a fresh interpreter.
+
+    Returns:
+        dict: Maps the names of all imported modules
+            to their cumulative import time in seconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    times = dict()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():  # skip the header
+                times[name.strip()] = int(cumulative)/10**6
+    return times
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_heavy_packages_not_imported_by_cli(self):
+        packages = {module.split('.')[0] for module in import_times("main")}
+        self.assertEqual(packages & HEAVY_PACKAGES, set())
+
+    def test_plotting_not_imported_with_distributions(self):
+        packages = {module.split('.')[0] for module in import_times("lib.distribution")}
+        self.assertNotIn("matplotlib", packages)
+
+    def test_cli_imported_within_budget(self):
+        # the fastest of several runs, the first one might have to compile the modules
+        self.assertLess(min(import_times("main")["main"] for _ in range(3)), IMPORT_BUDGET)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""instrumentation.py testcases."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.instrumentation import StageTimer
+
+
+class StageTimerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.timer = StageTimer(enabled=True)
+
+    def test_nothing_recorded_while_disabled(self):
+        timer = StageTimer()
+        with timer.stage("counting", 3) as stage:
+            stage.add_tokens(2)
+        timer.cache("tagging", hits=1)
+        self.assertEqual(timer.report(), {"stages": {}, "caches": {}})
+
+    def test_iterable_unchanged_while_disabled(self):
+        lines = ["a b\n", "c\n"]
+        self.assertIs(StageTimer().iterate(lines, "read"), lines)
+
+    def test_calls_and_tokens_added_up(self):
+        for tokens in [3, 4]:
+            with self.timer.stage("counting", tokens) as stage:
+                stage.add_tokens(1)
+        report = self.timer.report()["stages"]["counting"]
+        self.assertEqual((report["calls"], report["tokens"]), (2, 9))
+
+    def test_iterated_items_unchanged(self):
+        self.assertEqual(list(self.timer.iterate(["a b\n", "c\n"], "read")), ["a b\n", "c\n"])
+        self.assertIn("read", self.timer.report()["stages"])
+
+    def test_cache_hit_rate(self):
+        self.timer.cache("tagging", hits=3)
+        self.timer.cache("tagging", misses=1)
+        self.assertEqual(self.timer.report()["caches"]["tagging"]["hit_rate"], 0.75)
+
+    def test_measurements_of_other_timer_merged(self):
+        worker = StageTimer(enabled=True)
+        for timer in [self.timer, worker]:
+            with timer.stage("counting", 3):
+                pass
+            timer.cache("tagging", hits=1)
+        self.timer.merge(worker.collect())
+        report = self.timer.report()
+        self.assertEqual((report["stages"]["counting"]["calls"],
+                          report["stages"]["counting"]["tokens"]), (2, 6))
+        self.assertEqual(report["caches"]["tagging"]["hits"], 2)
+        self.assertEqual(worker.report(), {"stages": {}, "caches": {}})
+
+    def test_prometheus_format(self):
+        with self.timer.stage("scoring"):
+            pass
+        self.assertIn('authorship_stage_calls_total{stage="scoring"} 1',
+                      self.timer.to_prometheus().splitlines())
+
+    def test_written_as_json(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            with self.timer.stage("scoring"):
+                pass
+            goal = os.path.join(tmp_dir, "timings.json")
+            self.timer.write(goal)
+            with open(goal, 'r', encoding='utf-8') as file_in:
+                self.assertEqual(json.load(file_in)["stages"]["scoring"]["calls"], 1)
+        finally:
+            shutil.rmtree(tmp_dir)
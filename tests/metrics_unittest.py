@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""metrics.py testcases."""
+
+import unittest
+
+import numpy as np
+
+from lib.metrics import ProfileMatrix, cosine, delta, zscore_manhattan
+
+
+PROFILES = {"anna": {"a": 0.5, "b": 0.5, "<mtld_score>": 40.0},
+            "elsa": {"a": 0.2, "c": 0.8, "<mtld_score>": 70.0},
+            "olaf": {"a": 0.3, "b": 0.1, "c": 0.6, "<mtld_score>": 40.0}}
+UNKNOWN = {"a": 0.4, "c": 0.6, "d": 1.0, "<mtld_score>": 55.0}
+
+
+class ProfileMatrixTestCase(unittest.TestCase):
+    def setUp(self):
+        self.matrix = ProfileMatrix()
+        for author, vector in PROFILES.items():
+            self.matrix.add(author, vector)
+
+    def test_statistics(self):
+        features, mean, deviation = self.matrix.statistics()
+        self.assertEqual(features, ["a", "b", "<mtld_score>", "c"])
+        values = np.array([[0.5, 0.5, 40, 0], [0.2, 0, 70, 0.8], [0.3, 0.1, 40, 0.6]])
+        self.assertTrue(np.allclose(mean, values.mean(axis=0)))
+        self.assertTrue(np.allclose(deviation, values.std(axis=0, ddof=1)))
+
+    def test_statistics_updated_on_removal(self):
+        self.matrix.distances(UNKNOWN, "zscore")
+        self.matrix.remove("elsa")
+        rebuilt = ProfileMatrix()
+        rebuilt.add("anna", PROFILES["anna"])
+        rebuilt.add("olaf", PROFILES["olaf"])
+        for metric in ["delta", "zscore", "cosine"]:
+            self.assertTrue(np.allclose(self.matrix.distances(UNKNOWN, metric),
+                                        rebuilt.distances(UNKNOWN, metric)))
+
+    def test_zscore_distances(self):
+        features, mean, deviation = self.matrix.statistics()
+        unknown = (np.array([UNKNOWN.get(f, 0) for f in features]) - mean) / deviation
+        for i, vector in enumerate(PROFILES.values()):
+            known = (np.array([vector.get(f, 0) for f in features]) - mean) / deviation
+            self.assertAlmostEqual(self.matrix.distances(UNKNOWN, "zscore")[i],
+                                   np.abs(known - unknown).sum())
+
+    def test_delta_without_summary_statistics(self):
+        matrix = ProfileMatrix()
+        matrix.add("anna", {"a": 0.5, "<mtld_score>": 40.0})
+        matrix.add("elsa", {"a": 0.3, "<mtld_score>": 70.0})
+        # only "a" is compared, its z-scores are 1/sqrt(2) and -1/sqrt(2)
+        self.assertTrue(np.allclose(matrix.distances({"a": 0.5, "<mtld_score>": 70.0}, "delta"),
+                                    [0, 2 ** 0.5]))
+
+    def test_constant_features_ignored(self):
+        matrix = ProfileMatrix()
+        matrix.add("anna", {"a": 0.5, "b": 0.5})
+        matrix.add("elsa", {"a": 0.3, "b": 0.5})
+        self.assertTrue(np.allclose(matrix.distances({"a": 0.5, "b": 0.9}, "zscore"),
+                                    [0, 2 ** 0.5]))
+
+    def test_metrics(self):
+        profiles = np.array([[1.0, 0.0], [-1.0, 2.0], [0.0, 0.0]])
+        unknown = np.array([1.0, 1.0])
+        self.assertEqual(delta(profiles, unknown).tolist(), [0.5, 1.5, 1.0])
+        self.assertEqual(zscore_manhattan(profiles, unknown).tolist(), [1.0, 3.0, 2.0])
+        self.assertTrue(np.allclose(cosine(profiles, unknown),
+                                    [1 - 2 ** -0.5, 1 - 1 / 10 ** 0.5, 1]))
@@ -14,20 +14,51 @@ import os
 import unittest
 
 from lib.errors import ScarceDataError
-from lib.mtld import mtld, LOG
+from lib.mtld import Mtld, mtld, LOG
 
 
 LOG.setLevel(logging.CRITICAL)
 
 
 class MtldTestCase(unittest.TestCase):
+    def test_accumulator_with_spilled_chunks(self):
+        filename = os.path.join("tests", "data", "frozen", "let_it_go_frozen.txt")
+        accumulator = Mtld(chunk_size=7)
+        with open(filename, encoding='utf-8') as resource:
+            for line in resource:
+                accumulator.update(line.split())
+        self.assertAlmostEqual(accumulator.score(), 49.2634, places=4,
+                               msg="Calculated score(left) different from expected(right).")
+        accumulator.close()
+
+    def test_accumulator_scored_repeatedly(self):
+        accumulator = Mtld(chunk_size=2)
+        accumulator.update("the people for the".split())
+        accumulator.score()
+        accumulator.update(["people"])
+        self.assertEqual(accumulator.score(), 5,
+                         msg="Calculated score(left) different from expected(right).")
+        accumulator.close()
+
+    def test_forward_score_without_reverse_pass(self):
+        accumulator = Mtld(chunk_size=2)
+        accumulator.update("the people for the".split())
+        # 4 tokens and the incomplete segment (1 - 3/4)/(1 - 0.72)
+        self.assertAlmostEqual(accumulator.forward_score(), 4/(0.25/0.28),
+                               msg="Calculated score(left) different from expected(right).")
+        accumulator.update(["people"])
+        # a palindrome has the same score in both directions
+        self.assertEqual(accumulator.forward_score(), accumulator.score(),
+                         msg="Calculated score(left) different from expected(right).")
+        accumulator.close()
+
     def test_on_generator(self):
         def get_words():
             filename = os.path.join("tests", "data", "frozen", "let_it_go_frozen.txt")
             with open(filename, encoding='utf-8') as resource:
                 for word in resource.read().split():
                     yield word
-        self.assertAlmostEqual(mtld(get_words()), 53.9259, places=4,
+        self.assertAlmostEqual(mtld(get_words()), 49.2634, places=4,
                                msg="Calculated score(left) different from expected(right).")
 
     def test_on_longer_text_with_several_segments(self):
@@ -36,6 +67,11 @@ class MtldTestCase(unittest.TestCase):
             self.assertAlmostEqual(mtld(resource.read().split()), 49.2634, places=4,
                                    msg="Calculated score(left) different from expected(right).")
 
+    def test_several_thresholds_in_one_pass(self):
+        seq = "the boy and the other boy went to a garden to play".split()
+        scores = mtld(seq, ttr_threshold=(0.5, 0.72))
+        self.assertEqual(scores, [mtld(seq, ttr_threshold=0.5), mtld(seq)])
+
     def test_sequence_splitted_into_segments_with_no_rest(self):
         mtld_score = mtld("the people for the people".split())
         self.assertEqual(mtld_score, 5,
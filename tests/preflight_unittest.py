@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""preflight.py testcases."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from lib.author_model import AuthorModel, FEATURES, PUNCTUATION
+from lib.errors import RejectedInputError, ScarceDataError
+from lib.preflight import TextStats, problems, scan
+
+
+class PreflightTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_counts(self):
+        path = self._text("a.txt", b"The dog barks .\n\nA dog , a cat !\n")
+        self.assertEqual(scan(path, PUNCTUATION), TextStats(3, 10, 7, 3, True, None))
+
+    def test_no_repetition(self):
+        path = self._text("a.txt", b"One two three .\nFour five !\n")
+        self.assertFalse(scan(path, PUNCTUATION).repeated)
+
+    def test_invalid_utf8(self):
+        path = self._text("a.txt", b"A dog .\nA \xff cat .\n")
+        self.assertEqual(scan(path, PUNCTUATION).invalid_line, 2)
+        self.assertEqual(len(problems([(path, scan(path, PUNCTUATION))], FEATURES)), 1)
+
+    def test_appropriate_text(self):
+        stats = TextStats(2, 10, 8, 2, True, None)
+        self.assertEqual(problems([("a.txt", stats)], FEATURES), [])
+
+    def test_all_problems_reported(self):
+        stats = TextStats(1, 3, 3, 0, True, None)
+        self.assertEqual(len(problems([("a.txt", stats)], FEATURES)), 2)
+
+    def test_only_chosen_features_checked(self):
+        stats = TextStats(1, 3, 3, 0, False, None)
+        self.assertEqual(problems([("a.txt", stats)], ("word_len", "sent_len")), [])
+
+    def test_trigrams_counted_per_file(self):
+        stats = TextStats(1, 3, 2, 1, True, None)
+        self.assertEqual(len(problems([("a.txt", stats)], ("pos_trigram",))), 1)
+        self.assertEqual(problems([("a.txt", stats), ("b.txt", stats)], ("pos_trigram",)), [])
+
+    @mock.patch.object(AuthorModel, "_nlp")
+    def test_rejected_before_tagging(self, mock_nlp):
+        source = os.path.join("tests", "data", "short_file.txt")
+        with self.assertRaises(RejectedInputError) as context:
+            AuthorModel.train(source)
+        self.assertIsInstance(context.exception, ScarceDataError)
+        self.assertIn(source, context.exception.rejected)
+        mock_nlp.assert_not_called()
+
+    def test_check_directory(self):
+        self._text("a.txt", b"A dog barks .\nA cat .\n")
+        self.assertEqual(AuthorModel.check(self.tmp_dir), [])
+        self._text("b.txt", b"Only unique tokens\n")
+        self.assertEqual(len(AuthorModel.check(self.tmp_dir)), 1)
+        self.assertEqual(AuthorModel.check(self.tmp_dir, ("word_len",)), [])
+
+    def _text(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as file_out:
+            file_out.write(content)
+        return path
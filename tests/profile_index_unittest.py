@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""profile_index.py testcases."""
+
+import logging
+import random
+import unittest
+
+from lib.author_ident import AuthorIdent, WEIGHTS
+from lib.profile_index import InvertedIndex, PruningIndex, LOG
+
+
+LOG.setLevel(logging.CRITICAL)
+
+
+def random_vector(rng, features=200):
+    vector = {f"f{i}": rng.random() for i in rng.sample(range(features), features//4)}
+    total = sum(vector.values())
+    vector = {feature: value/total for feature, value in vector.items()}
+    vector["<mean_word_len>"] = rng.uniform(3, 5)
+    vector["<mtld_score>"] = rng.uniform(40, 80)
+    return vector
+
+
+class PruningIndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(42)
+        cls.vectors = {f"author{i}": random_vector(rng) for i in range(100)}
+        cls.unknowns = [random_vector(rng) for _ in range(10)]
+        cls.index = PruningIndex(AuthorIdent._simil, WEIGHTS)
+        for author, vector in cls.vectors.items():
+            cls.index.add(author, vector)
+
+    def exhaustive(self, unknown_vector, k):
+        ranking = [(AuthorIdent._simil(vector, unknown_vector), author)
+                   for author, vector in self.vectors.items()]
+        return sorted(ranking, key=lambda x: x[0])[:k]
+
+    def test_best_match_same_as_exhaustive(self):
+        for unknown_vector in self.unknowns:
+            self.assertEqual(self.index.rank(unknown_vector, 1),
+                             self.exhaustive(unknown_vector, 1))
+
+    def test_k_best_matches_same_as_exhaustive(self):
+        for unknown_vector in self.unknowns:
+            self.assertEqual(self.index.rank(unknown_vector, 5),
+                             self.exhaustive(unknown_vector, 5))
+
+    def test_ties_resolved_by_insertion_order(self):
+        index = PruningIndex(AuthorIdent._simil, WEIGHTS)
+        index.add("anna", {"a": 0.5, "b": 0.5})
+        index.add("elsa", {"a": 0.5, "b": 0.5})
+        self.assertEqual(index.rank({"a": 1.0}, 1), [(1.0, "anna")])
+
+    def test_removed_profile_not_ranked(self):
+        index = PruningIndex(AuthorIdent._simil, WEIGHTS)
+        index.add("anna", {"a": 1.0})
+        index.add("elsa", {"b": 1.0})
+        index.remove("anna")
+        self.assertEqual(index.rank({"a": 1.0}, 2), [(2.0, "elsa")])
+
+    def test_similarity_cut_short_at_bound(self):
+        diff = AuthorIdent._simil({'i': 0.5, "<mtld_score>": 50},
+                                  {'i': 0.8, "<stdev_word_len>": 1.5}, bound=0.1)
+        self.assertGreater(diff, 0.1)
+        self.assertLess(diff, 0.875)
+
+
+class InvertedIndexTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(7)
+        cls.vectors = {f"author{i}": random_vector(rng) for i in range(30)}
+        cls.vectors["copy"] = dict(cls.vectors["author3"])
+        cls.unknowns = [random_vector(rng, features=400) for _ in range(10)]
+        cls.unknowns.append(cls.vectors["author3"])
+        cls.index = InvertedIndex(AuthorIdent._simil, WEIGHTS)
+        for author, vector in cls.vectors.items():
+            cls.index.add(author, vector)
+
+    def exhaustive(self, unknown_vector, k):
+        ranking = [(AuthorIdent._simil(vector, unknown_vector), author)
+                   for author, vector in self.vectors.items()]
+        return sorted(ranking, key=lambda x: x[0])[:k]
+
+    def test_same_ranking_as_exhaustive(self):
+        for unknown_vector in self.unknowns:
+            for k in [1, 2, 5, None]:
+                self.assertEqual(self.index.rank(unknown_vector, k),
+                                 self.exhaustive(unknown_vector, k))
+
+    def test_equal_profiles_ranked_in_insertion_order(self):
+        self.assertEqual(self.index.rank(self.vectors["author3"], 2),
+                         [(0.0, "author3"), (0.0, "copy")])
+
+    def test_postings_updated_on_removal(self):
+        index = InvertedIndex(AuthorIdent._simil, WEIGHTS)
+        index.add("anna", {"a": 0.5, "b": 0.5})
+        index.add("elsa", {"b": 1.0})
+        index.remove("anna")
+        self.assertEqual(index.postings, {"b": {"elsa": 1.0}})
+        self.assertEqual((index.mass, index.size), ({"elsa": 1.0}, 1))
+        self.assertEqual(index.rank({"a": 1.0}), [(2.0, "elsa")])
+
+    def test_sparse_texts(self):
+        index = InvertedIndex(AuthorIdent._simil, WEIGHTS)
+        index.add("anna", {"a": 0.5, "b": 0.3, "c": 0.2})
+        index.add("elsa", {"a": 0.5, "d": 0.5})
+        self.assertTrue(index.is_sparse({"a": 0.5, "e": 0.5}))
+        self.assertFalse(index.is_sparse({"a": 0.5, "b": 0.2, "d": 0.3}))
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""progress.py testcases."""
+
+import unittest
+
+from lib.progress import CallbackProgress, Progress, get_progress, set_progress
+
+
+class ProgressTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.progress = CallbackProgress(lambda *args: self.calls.append(args), interval=60)
+
+    def tearDown(self):
+        set_progress(Progress())
+
+    def test_no_reports_by_default(self):
+        self.assertEqual(type(get_progress()), Progress)
+
+    def test_callback_called_when_finished(self):
+        with self.progress.task(10, "file.txt", unit="B") as task:
+            task.update(4)
+            task.update(6)
+        self.assertEqual(self.calls, [("file.txt", 10, 10)])
+
+    def test_callback_called_after_interval(self):
+        self.progress.interval = 0
+        with self.progress.task(2, "files") as task:
+            task.update()
+        self.assertEqual(self.calls, [("files", 1, 2), ("files", 1, 2)])
+
+    def test_progress_replaced(self):
+        set_progress(self.progress)
+        self.assertIs(get_progress(), self.progress)
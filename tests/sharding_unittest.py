@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""sharding.py testcases."""
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.author_ident import AuthorIdent, LOG as AUTHOR_IDENT_LOG
+from lib.author_model import AuthorModel
+from lib.errors import CatalogError
+from lib.sharding import ShardedAuthorIdent, LOG
+
+
+LOG.setLevel(logging.CRITICAL)
+
+
+class ShardingTestCase(unittest.TestCase):
+    def setUp(self):
+        # three profiles, one of them with a noticeably different punctuation
+        self.tmp_dir = tempfile.mkdtemp()
+        elsa = os.path.join("tests", "data", "elsa.json")
+        with open(elsa, 'r', encoding='utf-8') as file_in:
+            data = json.load(file_in)
+        data[4][","] = 50
+        with open(os.path.join(self.tmp_dir, "anna.json"), 'w', encoding='utf-8') as file_out:
+            json.dump(data, file_out)
+        self.catalog = os.path.join(self.tmp_dir, "catalog.csv")
+        with open(self.catalog, 'w', encoding='utf-8') as file_out:
+            for author in ["elsa", "olaf"]:
+                shutil.copy(elsa, os.path.join(self.tmp_dir, f"{author}.json"))
+                file_out.write(f"{author}\t{os.path.join(self.tmp_dir, author + '.json')}\n")
+            file_out.write(f"anna\t{os.path.join(self.tmp_dir, 'anna.json')}\n")
+        self.vector = AuthorModel.read_json(
+            os.path.join(self.tmp_dir, "anna.json")).normalized_feature_vector()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_ranking_same_as_unsharded(self):
+        expected = AuthorIdent(self.catalog)._rank(self.vector)
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            self.assertEqual(classifier._rank(self.vector), expected)
+
+    def test_best_match_only(self):
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            self.assertEqual(classifier._rank(self.vector, 1), [(0.0, "anna")])
+
+    def test_no_outdated_answers_after_failure(self):
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            with self.assertRaises(CatalogError):
+                classifier._rank({",": "not a number"})
+            self.assertEqual(classifier._rank(self.vector, 1), [(0.0, "anna")])
+            classifier.forget("anna")
+            self.assertEqual(len(classifier._rank(self.vector)), 2)
+
+    def test_pruned_profile_compared_on_kept_features(self):
+        profile = AuthorModel.read_json(os.path.join(self.tmp_dir, "anna.json"))
+        profile.prune(top_k=3)
+        profile.write_json(os.path.join(self.tmp_dir, "anna.json"))
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            best, author = classifier._rank(self.vector, 1)[0]
+        self.assertEqual(author, "anna")
+        self.assertAlmostEqual(best, 0)
+
+    def test_profiles_with_forward_mtld_reported(self):
+        with open(os.path.join(self.tmp_dir, "anna.json"), 'r', encoding='utf-8') as file_in:
+            data = json.load(file_in)
+        with open(os.path.join(self.tmp_dir, "olaf.json"), 'w', encoding='utf-8') as file_out:
+            json.dump(data[:6], file_out)  # trained before the reverse pass was added
+        with self.assertLogs(AUTHOR_IDENT_LOG, level='INFO') as logger:
+            ShardedAuthorIdent(self.catalog, shards=2).close()
+        self.assertIn("INFO:lib.author_ident:Profiles with the forward mtld score: olaf",
+                      logger.output)
+
+    def test_forgotten_author_not_ranked(self):
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            classifier.forget("anna")
+            self.assertEqual([author for _, author in classifier._rank(self.vector)],
+                             ["elsa", "olaf"])
+
+    def test_profiles_not_loaded_in_main_process(self):
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            self.assertEqual(classifier.profiles, {})
+            self.assertEqual(len(classifier.catalog_content), 3)
+
+    def test_trained_authors_handed_to_shards(self):
+        frozen = os.path.join("tests", "data", "frozen")
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            classifier.train_many([("kristoff", frozen), ("sven", frozen)],
+                                  features=["word_len", "punctuation", "mtld"])
+            self.assertEqual(classifier.profiles, {})
+            self.assertEqual(sorted(author for _, author in classifier._rank(self.vector)),
+                             ["anna", "elsa", "kristoff", "olaf", "sven"])
+
+    def test_author_removed_again_if_shard_fails(self):
+        frozen = os.path.join("tests", "data", "frozen")
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            request = classifier._request
+
+            def fail_to_add(shard, task, *args):
+                if task == "add" and args[0] == "kristoff":
+                    raise CatalogError(f"Shard {shard} failed.")
+                return request(shard, task, *args)
+
+            classifier._request = fail_to_add
+            with self.assertRaises(CatalogError):
+                classifier.train_many([("kristoff", frozen), ("sven", frozen)],
+                                      features=["word_len", "punctuation", "mtld"])
+            self.assertNotIn("kristoff", classifier.catalog_content)
+            self.assertIn("sven", classifier.catalog_content)
+            self.assertNotIn("kristoff", [line[0] for _, line in classifier.storage.read()])
+            self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, "kristoff.json")))
+            with self.assertRaises(CatalogError):
+                classifier.forget("kristoff")
+            classifier.forget("sven")
+            self.assertEqual(sorted(author for _, author in classifier._rank(self.vector)),
+                             ["anna", "elsa", "olaf"])
+
+    def test_changed_weights_used_by_shards(self):
+        before = AuthorIdent(self.catalog)._rank(self.vector)
+        with ShardedAuthorIdent(self.catalog, shards=2) as classifier:
+            classifier.set_weights({",": 100, "<mtld_score>": 5})
+            expected = AuthorIdent(self.catalog)._rank(self.vector)
+            self.assertNotEqual(expected, before)
+            self.assertEqual(classifier._rank(self.vector), expected)
+            self.assertEqual(classifier._rank(self.vector, 1), expected[:1])
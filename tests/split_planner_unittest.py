@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""split_planner.py testcases."""
+
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.split_planner import (REMAINDER, best_slice, best_subset,
+                               plan_split, read_manifest, write_manifest)
+
+
+class SplitPlannerTestCase(unittest.TestCase):
+    SIZES = [50, 10, 30, 20, 40, 70, 5]
+
+    def test_best_slice_against_all_slices(self):
+        for goal in [0, 7, 25, 60, 100, 400]:
+            start, end = best_slice(self.SIZES, goal)
+            closest = min(abs(sum(self.SIZES[i:j]) - goal)
+                          for i in range(len(self.SIZES))
+                          for j in range(i+1, len(self.SIZES)+1))
+            self.assertEqual(abs(sum(self.SIZES[start:end]) - goal), closest)
+
+    def test_best_subset_close_to_optimum(self):
+        goal = 97
+        chosen = best_subset(self.SIZES, goal)
+        closest = min(abs(sum(subset) - goal)
+                      for n in range(1, len(self.SIZES)+1)
+                      for subset in itertools.combinations(self.SIZES, n))
+        self.assertLessEqual(abs(sum(self.SIZES[i] for i in chosen) - goal),
+                             closest + 0.001*goal)
+
+    def test_parts_do_not_overlap(self):
+        parts = plan_split(self.SIZES, [("validation", 0.1), ("test", 0.2)], subset_sum=True)
+        self.assertEqual(len(parts), len(self.SIZES))
+        self.assertIn("validation", parts)
+        self.assertIn("test", parts)
+        self.assertIn(REMAINDER, parts)
+
+    def test_consecutive_parts(self):
+        parts = plan_split(self.SIZES, [("test", 0.2)])
+        indices = [i for i, part in enumerate(parts) if part == "test"]
+        self.assertEqual(indices, list(range(indices[0], indices[-1]+1)))
+
+    def test_subset_sum_closer_to_ratio(self):
+        sizes = [40, 100, 30, 100, 40]
+        goal = 0.2*sum(sizes)
+        slices = plan_split(sizes, [("test", 0.2)])
+        subsets = plan_split(sizes, [("test", 0.2)], subset_sum=True)
+        deviation = [abs(sum(s for s, p in zip(sizes, parts) if p == "test") - goal)
+                     for parts in [slices, subsets]]
+        self.assertLess(deviation[1], deviation[0])
+
+    def test_manifest_round_trip(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            manifest = {"books": [{"author": "a", "book": "a___b.txt", "part": "test"}]}
+            goal = os.path.join(tmp_dir, "manifest.json")
+            write_manifest(goal, manifest)
+            self.assertEqual(read_manifest(goal), manifest)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_no_manifest(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            goal = os.path.join(tmp_dir, "manifest.json")
+            with open(goal, 'w', encoding='utf-8') as file_out:
+                file_out.write("[]")
+            self.assertRaises(ValueError, read_manifest, goal)
+        finally:
+            shutil.rmtree(tmp_dir)
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""storage.py testcases."""
+
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from lib.author_model import AuthorModel
+from lib.errors import CatalogError
+from lib.storage import FileLock, SqliteCatalog, TsvCatalog, atomic_write, open_catalog, LOG
+
+
+LOG.setLevel(logging.CRITICAL)
+
+
+class SqliteCatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.profile = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json"))
+        self.storage = SqliteCatalog(os.path.join(self.tmp_dir, "catalog.db"))
+        self.storage.create()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_backend_chosen_by_extension(self):
+        self.assertIsInstance(open_catalog(self.storage.path), SqliteCatalog)
+        self.assertIsInstance(open_catalog("catalog.csv"), TsvCatalog)
+
+    def test_added_author_read(self):
+        self.assertEqual(self.storage.add("elsa", self.profile), "elsa")
+        self.assertEqual(self.storage.read(), [("row 1", ["elsa", "elsa"])])
+
+    def test_profile_loaded_unchanged(self):
+        self.profile.meta = {"seed": 0}
+        self.storage.add("elsa", self.profile)
+        self.assertEqual(self.storage.load("elsa", AuthorModel), self.profile)
+
+    def test_loading_a_missing_author(self):
+        with self.assertRaises(FileNotFoundError):
+            self.storage.load("elsa", AuthorModel)
+
+    def test_adding_an_existing_author(self):
+        self.storage.add("elsa", self.profile)
+        with self.assertRaises(CatalogError):
+            self.storage.add("elsa", self.profile)
+
+    def test_failing_transaction_rolled_back(self):
+        self.storage.add("elsa", self.profile)
+        with self.assertRaises(CatalogError):
+            self.storage.add_many([("anna", self.profile), ("elsa", self.profile)])
+        self.assertEqual(self.storage.authors(), {"elsa"})
+
+    def test_removed_author_not_read(self):
+        self.storage.add_many([("elsa", self.profile), ("anna", self.profile)])
+        self.storage.remove("elsa", "elsa")
+        self.assertEqual(self.storage.authors(), {"anna"})
+        self.assertEqual(self.storage.load("anna", AuthorModel), self.profile)
+
+    def test_features_of_removed_author_deleted(self):
+        self.storage.add("elsa", self.profile)
+        self.storage.remove("elsa", "elsa")
+        with self.storage._connect() as connection:
+            self.assertEqual(connection.execute("SELECT COUNT(*) FROM features").fetchone(),
+                             (0,))
+
+    def test_migrated_from_tsv_catalog(self):
+        tsv_storage = TsvCatalog(os.path.join(self.tmp_dir, "catalog.csv"))
+        tsv_storage.create()
+        tsv_storage.add_many([("elsa", self.profile), ("anna", self.profile)])
+        self.storage.add_many((author, tsv_storage.load(reference, AuthorModel))
+                              for _, (author, reference) in tsv_storage.read())
+        self.assertEqual(self.storage.authors(), {"elsa", "anna"})
+
+    def test_weights_saved(self):
+        self.assertIsNone(self.storage.read_weights())
+        self.storage.write_weights({"<mtld_score>": 0.5})
+        self.storage.write_weights({"<mtld_score>": 0.2, "i": 0})
+        self.assertEqual(self.storage.read_weights(), {"<mtld_score>": 0.2, "i": 0})
+
+    def test_weights_saved_in_database_without_settings(self):
+        with self.storage._connect() as connection:
+            connection.execute("DROP TABLE settings")
+        self.assertIsNone(self.storage.read_weights())
+        self.storage.write_weights({"<mtld_score>": 0.5})
+        self.assertEqual(self.storage.read_weights(), {"<mtld_score>": 0.5})
+
+
+class TsvCatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.profile = AuthorModel.read_json(os.path.join("tests", "data", "elsa.json"))
+        self.storage = TsvCatalog(os.path.join(self.tmp_dir, "catalog.csv"), compact_after=3)
+        self.storage.create()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_added_author_read(self):
+        filename = self.storage.add("elsa", self.profile)
+        self.assertEqual(self.storage.read(), [("journal line 1", ["elsa", filename])])
+
+    def test_adding_an_existing_author(self):
+        self.storage.add("elsa", self.profile)
+        with self.assertRaises(CatalogError):
+            self.storage.add("elsa", self.profile)
+
+    def test_failing_transaction_rolled_back(self):
+        self.storage.add("elsa", self.profile)
+        with self.assertRaises(CatalogError):
+            self.storage.add_many([("anna", self.profile), ("elsa", self.profile)])
+        self.assertEqual(self.storage.authors(), {"elsa"})
+        self.assertFalse(os.path.isfile(os.path.join(self.tmp_dir, "anna.json")))
+
+    def test_added_at_once(self):
+        self.storage.add("elsa", self.profile)
+        filenames = self.storage.add_many([("anna", self.profile), ("olaf", self.profile)])
+        self.assertFalse(os.path.isfile(self.storage.journal))
+        self.assertEqual([columns for _, columns in self.storage.read()],
+                         [["elsa", os.path.join(self.tmp_dir, "elsa.json")],
+                          ["anna", filenames[0]], ["olaf", filenames[1]]])
+
+    def test_profile_file_created(self):
+        filename = self.storage.add("elsa", self.profile)
+        self.assertEqual(AuthorModel.read_json(filename), self.profile)
+
+    def test_training_with_filename_exists_as_json(self):
+        shutil.copy(os.path.join("tests", "data", "elsa.json"), self.tmp_dir)
+        self.assertEqual(self.storage.add("elsa", self.profile),
+                         os.path.join(self.tmp_dir, "elsa(2).json"))
+
+    def test_profile_loaded_with_windows_separators(self):
+        filename = self.storage.add("elsa", self.profile)
+        self.assertEqual(self.storage.load(filename.replace(os.sep, '\\'), AuthorModel),
+                         self.profile)
+
+    def test_profile_file_deleted(self):
+        filename = self.storage.add("elsa", self.profile)
+        self.storage.remove("elsa", filename)
+        self.assertFalse(os.path.isfile(filename))
+
+    def test_removed_author_not_read(self):
+        filename = self.storage.add("elsa", self.profile)
+        self.storage.add("anna", self.profile)
+        self.storage.remove("elsa", filename)
+        self.assertEqual(self.storage.authors(), {"anna"})
+
+    def test_journal_compacted(self):
+        for author in ["elsa", "anna", "olaf"]:
+            self.storage.add(author, self.profile)
+        self.assertFalse(os.path.isfile(self.storage.journal))
+        self.assertEqual([location for location, _ in self.storage.read()],
+                         ["line 1", "line 2", "line 3"])
+
+    def test_incomplete_journal_line_ignored(self):
+        with open(self.storage.journal, 'w', encoding='utf-8') as file_out:
+            file_out.write("+\tanna")
+        self.storage.add("elsa", self.profile)
+        self.assertEqual(self.storage.authors(), {"elsa"})
+
+    def test_weights_saved(self):
+        self.assertIsNone(self.storage.read_weights())
+        self.storage.write_weights({"<mtld_score>": 0.5})
+        self.assertEqual(self.storage.read_weights(), {"<mtld_score>": 0.5})
+        self.storage.destroy()
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_lock_released(self):
+        with self.storage.lock:
+            with self.storage.lock:  # reentrant
+                pass
+            self.assertTrue(os.path.isfile(self.storage.lock.path))
+        self.assertFalse(os.path.isfile(self.storage.lock.path))
+
+    def test_lock_held_by_other_process(self):
+        with open(self.storage.lock.path, 'w', encoding='utf-8'):
+            pass
+        with self.assertRaises(CatalogError):
+            with FileLock(self.storage.lock.path, timeout=0.1):
+                pass
+
+    def test_lock_held_by_running_process(self):
+        with open(self.storage.lock.path, 'w', encoding='utf-8') as file_out:
+            file_out.write(str(os.getpid()))
+        with self.assertRaises(CatalogError):
+            with FileLock(self.storage.lock.path, timeout=0.1):
+                pass
+
+    @unittest.skipIf(os.name != "posix", "Stale locks are only broken on POSIX systems.")
+    def test_stale_lock_broken(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        with open(self.storage.lock.path, 'w', encoding='utf-8') as file_out:
+            file_out.write(str(process.pid))
+        with FileLock(self.storage.lock.path, timeout=0.1):
+            with open(self.storage.lock.path, 'r', encoding='utf-8') as file_in:
+                self.assertEqual(file_in.read(), str(os.getpid()))
+
+    def test_changes_in_journal_applied_in_order(self):
+        with open(self.storage.path, 'w', encoding='utf-8') as file_out:
+            file_out.write("elsa\telsa.json\nanna\tanna.json\nolaf\n")
+        with open(self.storage.journal, 'w', encoding='utf-8') as file_out:
+            file_out.write("-\telsa\n+\tsven\tsven.json\n+\telsa\telsa(2).json\n-\tsven\n")
+        self.assertEqual(self.storage.read(),
+                         [("line 2", ["anna", "anna.json"]), ("line 3", ["olaf"]),
+                          ("journal line 3", ["elsa", "elsa(2).json"])])
+
+    def test_atomic_write_failing(self):
+        with atomic_write(self.storage.path) as file_out:
+            file_out.write("elsa\telsa.json\n")
+        with self.assertRaises(ZeroDivisionError):
+            with atomic_write(self.storage.path) as file_out:
+                file_out.write("anna\tanna.json\n")
+                1/0
+        with open(self.storage.path, 'r', encoding='utf-8') as file_in:
+            self.assertEqual(file_in.read(), "elsa\telsa.json\n")
+        self.assertEqual(os.listdir(self.tmp_dir), ["catalog.csv"])
+
+    @unittest.skipIf(os.name == "nt", "Windows only knows the read-only flag.")
+    def test_atomic_write_keeping_permissions(self):
+        umask = os.umask(0o022)
+        try:
+            with atomic_write(self.storage.path) as file_out:
+                file_out.write("elsa\telsa.json\n")
+            self.assertEqual(stat.S_IMODE(os.stat(self.storage.path).st_mode), 0o644)
+            os.chmod(self.storage.path, 0o664)
+            with atomic_write(self.storage.path) as file_out:
+                file_out.write("anna\tanna.json\n")
+            self.assertEqual(stat.S_IMODE(os.stat(self.storage.path).st_mode), 0o664)
+        finally:
+            os.umask(umask)
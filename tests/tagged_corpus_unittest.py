@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""tagged_corpus.py testcases."""
+
+from collections import namedtuple
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.author_model import AuthorModel
+from lib.tagged_corpus import TaggedCorpus
+
+
+Item = namedtuple('Item', ['text', 'lemma', 'tag'])
+SENTENCES = [[Item("Dogs", "dog", "NNS"), Item("bark", "bark", "VBP"), Item(".", ".", ".")],
+             [],
+             [Item("A", "a", "DT"), Item("dog", "dog", "NN")]]
+
+
+class TaggedCorpusTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.corpus = TaggedCorpus(os.path.join(self.tmp_dir, "tagged"))
+        self.source = self._text("dogs.txt", "Dogs bark .\n\nA dog\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_sentences_passed_through(self):
+        self.assertEqual(list(self.corpus.record(self.source, SENTENCES)), SENTENCES)
+
+    def test_columns_restored(self):
+        list(self.corpus.record(self.source, SENTENCES))
+        text = self.corpus.get(self.source)
+        self.assertEqual(len(text), 3)
+        self.assertEqual(list(text.offsets), [0, 3, 3, 5])
+        self.assertEqual([text.words[i] for i in text.lemmas], ["dog", "bark", ".", "a", "dog"])
+        self.assertEqual([text.words[i] for i in text.tags], ["NNS", "VBP", ".", "DT", "NN"])
+
+    def test_vocabulary_shared(self):
+        list(self.corpus.record(self.source, SENTENCES))
+        other = self._text("dog.txt", "A dog\n")
+        list(TaggedCorpus(self.corpus.directory).record(other, SENTENCES[2:]))
+        text = self.corpus.get(other)
+        self.assertEqual([text.words[i] for i in text.tokens], ["A", "dog"])
+        self.assertEqual(len(set(self.corpus.words)), len(self.corpus.words))
+
+    def test_untagged_text(self):
+        self.assertIsNone(self.corpus.get(self.source))
+
+    def test_changed_text_tagged_again(self):
+        list(self.corpus.record(self.source, SENTENCES))
+        with open(self.source, 'a', encoding='utf-8') as file_out:
+            file_out.write("A cat\n")
+        self.assertIsNone(self.corpus.get(self.source))
+
+    def test_incomplete_text_not_saved(self):
+        sentences = self.corpus.record(self.source, SENTENCES)
+        next(sentences)
+        sentences.close()
+        self.assertIsNone(self.corpus.get(self.source))
+
+    def test_same_profile_as_without_tagged_corpus(self):
+        source = os.path.join("tests", "data", "frozen")
+        expected = AuthorModel.train(source)
+        AuthorModel.train(source, tagged=self.corpus.directory)
+        self.assertEqual(AuthorModel.train(source, tagged=self.corpus.directory), expected)
+        self.assertEqual(AuthorModel.train(source, sample_rate=0.5,
+                                           tagged=self.corpus.directory),
+                         AuthorModel.train(source, sample_rate=0.5))
+
+    def _text(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w', encoding='utf-8') as file_out:
+            file_out.write(content)
+        return path
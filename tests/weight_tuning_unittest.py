@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""weight_tuning.py testcases."""
+
+import unittest
+
+from lib.author_ident import AuthorIdent
+from lib.weight_tuning import DistanceCache, grid, random_weights
+
+
+KNOWN = [{"a": 0.5, "b": 0.5, "<mtld_score>": 40.0},
+         {"a": 0.2, "c": 0.8, "<mtld_score>": 70.0}]
+UNKNOWN = [{"a": 0.4, "d": 0.6, "<mtld_score>": 55.0},
+           {"c": 1.0, "<mtld_score>": 45.0}]
+
+
+class WeightTuningTestCase(unittest.TestCase):
+    def test_same_closest_profiles_as_simil(self):
+        fixed = {"a": 2, "<mtld_score>": 0.5}
+        cache = DistanceCache(KNOWN, UNKNOWN, ["<mtld_score>", "c"], fixed)
+        candidates = grid([[0, 0.01, 0.1], [0, 1, 3]])
+        predictions = cache.predictions(candidates)
+        for weights, closest in zip(candidates, predictions):
+            all_weights = {"a": 2, "<mtld_score>": weights[0], "c": weights[1]}
+            for unknown, j in zip(UNKNOWN, closest):
+                distances = [AuthorIdent._simil(known, unknown, weights=all_weights)
+                             for known in KNOWN]
+                self.assertEqual(j, distances.index(min(distances)))
+
+    def test_distances_split_up(self):
+        cache = DistanceCache(KNOWN, UNKNOWN, ["<mtld_score>", "z"], {"a": 2})
+        self.assertAlmostEqual(cache.fixed[0, 0], 0.2 + 0.5 + 0.6)
+        self.assertEqual(cache.terms[0, 0].tolist(), [15.0, 0])
+
+    def test_accuracy_per_weight_vector(self):
+        cache = DistanceCache(KNOWN, UNKNOWN, ["<mtld_score>"], {})
+        # the mtld score only decides the second text once it is weighted
+        self.assertEqual(cache.predictions([[0], [1]]).tolist(), [[0, 1], [0, 0]])
+        self.assertEqual(cache.accuracy([[0], [1]], [0, 1]).tolist(), [1.0, 0.5])
+        self.assertEqual(cache.accuracy([[0], [1]], [0, 0]).tolist(), [0.5, 1.0])
+
+    def test_texts_projected_onto_pruned_profiles(self):
+        known = [{"[a]": 0.5, "[<other>]": 0.5, "<mtld_score>": 40.0}, KNOWN[1]]
+        unknown = [{"[a]": 0.5, "[b]": 0.3, "[c]": 0.2, "<mtld_score>": 45.0}]
+        cache = DistanceCache(known, unknown, ["<mtld_score>"], {})
+        self.assertAlmostEqual(cache.fixed[0, 0], 0)
+        self.assertEqual(cache.terms[0, 0].tolist(), [5.0])
+
+    def test_grid_combinations(self):
+        self.assertEqual(grid([[1, 2], [3, 4, 5]]).shape, (6, 2))
+        self.assertEqual(grid([[1, 2]]).tolist(), [[1], [2]])
+
+    def test_random_weights_within_spread(self):
+        weights = random_weights([0.01, 0], 50, spread=10, seed=1)
+        self.assertEqual(weights.shape, (50, 2))
+        self.assertTrue(((weights[:, 0] >= 0.001) & (weights[:, 0] <= 0.1)).all())
+        self.assertTrue(((weights[:, 1] >= 0.1) & (weights[:, 1] <= 10)).all())
+        self.assertEqual(random_weights([0.01, 0], 50, seed=1).tolist(), weights.tolist())